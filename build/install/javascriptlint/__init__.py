@@ -0,0 +1,6 @@
+# vim: ts=4 sw=4 expandtab
+
+def main():
+    # Import the linter on demand so that a --client can start quickly.
+    from jsl import main
+    main()
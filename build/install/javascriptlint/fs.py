@@ -0,0 +1,46 @@
+# vim: ts=4 sw=4 expandtab
+import codecs
+import mmap
+import os
+import stat
+
+def readfile(path):
+    """ Reads a UTF-8 file without a byte order mark. A shebang line is read
+        as a blank line, so that the line numbers do not change.
+
+        Regular files are decoded straight from a memory map, and the byte
+        order mark and the shebang are skipped by starting the decode past
+        them, so the returned string is the only copy of the contents.
+    """
+    file = open(path, 'rb')
+    try:
+        info = os.fstat(file.fileno())
+        if stat.S_ISREG(info.st_mode) and info.st_size:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            data = file.read()
+    finally:
+        file.close()
+
+    try:
+        start = 0
+        if data[:len(codecs.BOM_UTF8)] == codecs.BOM_UTF8:
+            start = len(codecs.BOM_UTF8)
+
+        if data[start:start+2] == '#!':
+            idx = data.find('\n', start)
+            if idx != -1:
+                start = idx
+
+        contents, length = codecs.utf_8_decode(buffer(data, start), 'strict',
+                                               True)
+        return contents
+    finally:
+        if isinstance(data, mmap.mmap):
+            data.close()
+
+def normpath(path):
+    path = os.path.abspath(path)
+    path = os.path.normcase(path)
+    path = os.path.normpath(path)
+    return path
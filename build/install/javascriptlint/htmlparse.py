@@ -0,0 +1,338 @@
+# vim: ts=4 sw=4 expandtab
+""" Finds the script tags in an HTML page in a single pass.
+
+Only script tags, comments and marked sections (such as CDATA) are
+recognized, along with style tags, whose contents are not markup. Other
+markup is skipped as text. The tags and their attributes are read the same
+way as Python's HTMLParser reads them.
+"""
+import HTMLParser
+import re
+import string
+import unittest
+
+# What to look for outside of a script.
+_markup = re.compile(r'<(?:!--|!\[|/\s*script|(?:script|style)(?=[\t\n\r\f />]))',
+                     re.I)
+
+# HTMLParser's patterns for a start tag and its attributes.
+_starttag = re.compile(r"""
+  <(script|style)(?=[\t\n\r\f />])
+  (?:[\s/]*
+    (?:(?<=['"\s/])[^\s/>][^\s/=>]*
+      (?:\s*=+\s*
+        (?:'[^']*'
+          |"[^"]*"
+          |(?!['"])[^>\s]*
+         )
+       )?(?:\s|/(?!>))*
+     )*
+   )?
+  \s*
+""", re.I | re.VERBOSE)
+_tagname = re.compile(r'<[a-zA-Z]+(?:\s|/(?!>))*')
+_attr = re.compile(
+    r'((?<=[\'"\s/])[^\s/>][^\s/=>]*)(\s*=+\s*'
+    r'(\'[^\']*\'|"[^"]*"|(?![\'"])[^>\s]*))?(?:\s|/(?!>))*')
+
+# An end tag closes a script only if it has no attributes. Outside of a
+# script, it may have anything after the name.
+_contentend = {
+    'script': re.compile(r'</\s*script\s*>', re.I),
+    'style': re.compile(r'</\s*style\s*>', re.I),
+}
+_endtag = re.compile(r'</(?:\s*script\s*>|script[\t\n\r\f /][^>]*>)', re.I)
+
+_commentclose = re.compile(r'--\s*>')
+_sectionname = re.compile(r'<!\[\s*([a-zA-Z][-_.a-zA-Z0-9]*)?')
+_sectionclose = re.compile(r']\s*]\s*>')
+_condsectionclose = re.compile(r']\s*>')
+_sections = ('temp', 'cdata', 'ignore', 'include', 'rcdata')
+
+_unescape = HTMLParser.HTMLParser().unescape
+
+# The script tokens that can contain an end tag. A slash starts a regular
+# expression or is division, depending on the token before it.
+_jstoken = re.compile(ur'''
+    (?P<space>[^\S\n\r\u2028\u2029]+)
+  | (?P<newline>[\n\r\u2028\u2029])
+  | (?P<linecomment>(?://|<!--)[^\n\r\u2028\u2029]*)
+  | (?P<comment>/\*[\s\S]*?(?:\*/|\Z))
+  | (?P<string>'(?:[^'\\\n\r\u2028\u2029]|\\(?:\r\n|[\s\S]))*'?
+              |"(?:[^"\\\n\r\u2028\u2029]|\\(?:\r\n|[\s\S]))*"?)
+  | (?P<slash>/)
+  | (?P<word>[\w$\\]+)
+  | (?P<closer>[)\]}])
+  | (?P<increment>\+\+|--)
+  | (?P<other>.)
+''', re.UNICODE | re.VERBOSE)
+_jsregexp = re.compile(ur'''
+  /(?:[^/\\\[\n\r\u2028\u2029]
+    |\\[^\n\r\u2028\u2029]
+    |\[(?:[^\]\\\n\r\u2028\u2029]|\\[^\n\r\u2028\u2029])*\]?
+   )*/?[\w$]*
+''', re.UNICODE | re.VERBOSE)
+_jsline = re.compile(ur'[^\n\r\u2028\u2029]*', re.UNICODE)
+_jsliterals = ('string', 'comment', 'regexp')
+_jsoperators = ('case', 'delete', 'do', 'else', 'in', 'instanceof', 'new',
+                'return', 'throw', 'typeof', 'void', 'yield')
+
+def findscripttags(s):
+    """ Yields a dictionary for each script start and end tag, in order. The
+        offsets are from the start of s. A start tag has these keys:
+            type: 'start'
+            offset: the offset of the tag
+            end: the offset of the script's contents
+            attr: a dictionary of the attributes, with lowercase names
+        An end tag has a type of 'end' and an offset. A self-closing start tag
+        is followed by an end tag at the end of the start tag.
+    """
+    i = 0
+    while True:
+        match = _markup.search(s, i)
+        if not match:
+            return
+        i = match.start()
+
+        if s.startswith('<!--', i):
+            match = _commentclose.search(s, i+4)
+        elif s.startswith('<![', i):
+            name = _sectionname.match(s, i).group(1)
+            if name and name.lower() in _sections:
+                match = _sectionclose.search(s, i+3)
+            else:
+                match = _condsectionclose.search(s, i+3)
+        elif s.startswith('</', i):
+            match = _endtag.match(s, i)
+            if match:
+                yield {
+                    'type': 'end',
+                    'offset': i,
+                }
+                i = match.end()
+            else:
+                i += 2
+            continue
+        else:
+            tag, i = _readstarttag(s, i)
+            if not tag:
+                continue
+            name = tag.pop('name')
+            closed = tag.pop('closed')
+            if name == 'script':
+                yield tag
+                if closed:
+                    yield {
+                        'type': 'end',
+                        'offset': i,
+                    }
+            if closed:
+                continue
+
+            # The contents continue until the first end tag.
+            match = _contentend[name].search(s, i)
+            if not match:
+                return
+            if name == 'script':
+                yield {
+                    'type': 'end',
+                    'offset': match.start(),
+                }
+            i = match.end()
+            continue
+
+        # Skip a comment or a marked section.
+        if match:
+            i = match.end()
+        else:
+            i = _skipunterminated(s, i)
+
+def _readstarttag(s, i):
+    """ Reads the start tag at i. Returns the tag, with "name" and "closed"
+        keys, and where to continue. "closed" is True if the tag ends with
+        "/>". If there is not a complete tag at i, the tag is None.
+    """
+    match = _starttag.match(s, i)
+    name = match.group(1).lower()
+    end = match.end()
+    if s.startswith('>', end):
+        end += 1
+    elif s.startswith('/>', end):
+        end += 2
+    elif end == len(s) or s[end] in string.ascii_letters + '=/':
+        return None, _skipunterminated(s, i)
+    else:
+        return None, end
+
+    attr = {}
+    k = _tagname.match(s, i).end()
+    while k < end:
+        match = _attr.match(s, k)
+        if not match:
+            break
+        attrname, rest, value = match.group(1, 2, 3)
+        if not rest:
+            value = None
+        elif value[:1] == '\'' == value[-1:] or \
+             value[:1] == '"' == value[-1:]:
+            value = value[1:-1]
+        if value and '&' in value:
+            value = _unescape(value)
+        attr[attrname.lower()] = value
+        k = match.end()
+
+    rest = s[k:end].strip()
+    if rest not in ('>', '/>'):
+        return None, end
+    return {
+        'type': 'start',
+        'offset': i,
+        'end': end,
+        'attr': attr,
+        'name': name,
+        'closed': rest == '/>',
+    }, end
+
+def _skipunterminated(s, i):
+    """ Returns where to continue after markup at i that does not end, which
+        HTMLParser reads as text up to the next ">".
+    """
+    k = s.find('>', i+1)
+    if k != -1:
+        return k+1
+    k = s.find('<', i+1)
+    if k != -1:
+        return k
+    return i+1
+
+class ScriptScanner:
+    """ Tells where an inline script can end. It cannot end inside a string, a
+        block comment or a regular expression, so an end tag there is part of
+        the script. The script is scanned once, as far as the offsets that
+        have been checked.
+    """
+    def __init__(self, s, start):
+        self._s = s
+        self._pos = start
+        self._tokenstart = start
+        self._kind = None
+        self._regexpok = True
+        self._linestart = True
+        self._property = False
+
+    def canend(self, offset):
+        """ Returns False if offset is inside a string, a block comment or a
+            regular expression. The offsets must be checked in order.
+        """
+        while self._pos <= offset and self._pos < len(self._s):
+            self._next()
+        return not (self._kind in _jsliterals and
+                    self._tokenstart < offset < self._pos)
+
+    def _next(self):
+        s = self._s
+        pos = self._pos
+        if self._linestart and s.startswith('-->', pos):
+            # Like "<!--", this hides the rest of the line.
+            kind = 'linecomment'
+            end = _jsline.match(s, pos).end()
+        else:
+            match = _jstoken.match(s, pos)
+            kind = match.lastgroup
+            end = match.end()
+            if kind == 'slash' and self._regexpok:
+                kind = 'regexp'
+                end = _jsregexp.match(s, pos).end()
+
+        if kind == 'newline':
+            self._linestart = True
+        elif kind not in ('space', 'comment'):
+            self._linestart = False
+
+        if kind == 'word':
+            # A property name, such as "return" in "x.return", is an operand.
+            self._regexpok = not self._property and \
+                             match.group() in _jsoperators
+        elif kind == 'closer':
+            self._regexpok = match.group() == '}'
+        elif kind in ('string', 'regexp'):
+            self._regexpok = False
+        elif kind in ('slash', 'other'):
+            self._regexpok = True
+        # A postfix ++ or -- follows an operand and is followed by an
+        # operator, and a prefix one follows an operator and is followed by an
+        # operand, so either way a slash after it is read as it was before it.
+
+        if kind not in ('space', 'newline', 'comment', 'linecomment'):
+            self._property = kind == 'other' and match.group() == '.'
+
+        self._tokenstart = pos
+        self._kind = kind
+        self._pos = end
+
+class TestHTMLParse(unittest.TestCase):
+    def _findtags(self, html):
+        tags = []
+        for tag in findscripttags(html):
+            if tag['type'] == 'start':
+                tags.append(('start', html[tag['offset']:tag['end']],
+                             tag['attr']))
+            else:
+                tags.append(('end', tag['offset']))
+        return tags
+    def testConditionalComments(self):
+        html = """
+<!--[if IE]>This is Internet Explorer.<![endif]-->
+<![if !IE]>This is not Internet Explorer<![endif]>
+"""
+        list(findscripttags(html))
+    def testFindTags(self):
+        html = '<SCRIPT Type="a&amp;b>" src=x.js>' \
+               '<!--</script>\n<script/>.</script><script src="y.js"/>'
+        self.assertEquals(self._findtags(html), [
+            ('start', '<SCRIPT Type="a&amp;b>" src=x.js>',
+             {'type': 'a&b>', 'src': 'x.js'}),
+            ('end', html.index('</script>')),
+            ('start', '<script/>', {}),
+            ('end', html.index('/>.') + 2),
+            ('end', html.index('</script>', html.index('/>.'))),
+            ('start', '<script src="y.js"/>', {'src': 'y.js'}),
+            ('end', len(html)),
+        ])
+    def testSkippedMarkup(self):
+        html = '<!-- <script></script> -->' \
+               '<![CDATA[ <script></script> ]]>' \
+               '<style> <script></script> </style>' \
+               '<script >a</ script ></script x>'
+        self.assertEquals(self._findtags(html), [
+            ('start', '<script >', {}),
+            ('end', html.index('</ script >')),
+            ('end', html.index('</script x>')),
+        ])
+    def testUnterminated(self):
+        self.assertEquals(self._findtags('<script>x'), [
+            ('start', '<script>', {}),
+        ])
+        self.assertEquals(self._findtags('<!-- x > <script></script>'), [
+            ('start', '<script>', {}),
+            ('end', 17),
+        ])
+    def testScriptScanner(self):
+        def canend(script):
+            parts = script.split('|')
+            scanner = ScriptScanner(''.join(parts), 0)
+            return [scanner.canend(len(''.join(parts[:i])))
+                    for i in range(1, len(parts))]
+        self.assertEquals(canend("|'|a\\'|'|;|"), [True, False, False, True, True])
+        self.assertEquals(canend('"a|b\n|/*|*/|'), [False, True, False, True])
+        self.assertEquals(canend('// |\n<!-- |\n--> |\n|'), [True] * 4)
+        self.assertEquals(canend('a = b /|c/ |d; /|x[/|]/g|'),
+                          [True, True, False, False, True])
+        self.assertEquals(canend('f(/|x/|, (a) /|b/|c)|'),
+                          [False, True, True, True, True])
+        self.assertEquals(canend('return /|a/'), [False])
+        self.assertEquals(canend('x++ /| 2; y-- /|z/|; a = ++/|b/|'),
+                          [True, True, True, False, True])
+        self.assertEquals(canend('x.return /|2; a.in /|2|'), [True, True, True])
+        self.assertEquals(canend('x.\n// c\nreturn /|2; return /|2/|'),
+                          [True, False, True])
@@ -0,0 +1,319 @@
+#!/root/.pyenv/versions/2.7.18/bin/python
+# vim: ts=4 sw=4 expandtab
+import codecs
+import fnmatch
+import glob
+import json
+import os
+import sys
+import unittest
+from optparse import OptionParser
+
+import bench
+import cache
+import conf
+import daemon
+import htmlparse
+import jsparse
+import lint
+import output
+import timings
+import util
+import visitation
+
+_lint_results = {
+    'warnings': 0,
+    'errors': 0
+}
+
+# The state kept warm between requests by "--server".
+_server = {
+    'result_cache': None,
+}
+_confs = {}
+
+def _loadconf(path):
+    """ Returns the configuration for path (or the default configuration),
+        reusing the one loaded earlier if the file has not changed.
+    """
+    if path:
+        st = os.stat(path)
+        key = (os.path.abspath(path), st.st_mtime, st.st_size)
+    else:
+        key = None
+    if not key in _confs:
+        conf_ = conf.Conf()
+        if path:
+            conf_.loadfile(path)
+        _confs[key] = conf_
+    return _confs[key]
+
+def _serve(socket_path):
+    def handler(argv, cwd):
+        main(argv)
+    _server['result_cache'] = cache.MemoryResultCache()
+    daemon.serve(socket_path, handler)
+
+def _dump(paths):
+    for path in paths:
+        script = util.readfile(path)
+        jsparse.dump_tree(script)
+
+def _lint(paths, conf_, printpaths, jobs, threads, result_cache, file_index,
+          output_format, timings_):
+    def lint_error(path, line, col, errname, errdesc):
+        _lint_results['warnings'] = _lint_results['warnings'] + 1
+        print format_error(path, line, col, errname, errdesc)
+    def write_error(path, line, col, errname, errdesc):
+        _lint_results['warnings'] = _lint_results['warnings'] + 1
+        writer.write(path, line, col, errname, errdesc)
+    format_error = util.compile_error_format(conf_['output-format'])
+
+    # Buffer the file names and warnings.
+    stdout = sys.stdout
+    sys.stdout = util.BufferedWriter(stdout)
+    try:
+        if output_format == 'text':
+            lint.lint_files(paths, lint_error, conf=conf_,
+                            printpaths=printpaths, jobs=jobs,
+                            result_cache=result_cache, file_index=file_index,
+                            timings=timings_, threads=threads)
+        else:
+            writer = output.writers[output_format](sys.stdout)
+            writer.start()
+            lint.lint_files(paths, write_error, conf=conf_, printpaths=False,
+                            jobs=jobs, result_cache=result_cache,
+                            file_index=file_index, timings=timings_,
+                            threads=threads)
+            writer.finish()
+    finally:
+        sys.stdout.flush()
+        sys.stdout = stdout
+
+def _resolve_paths(path, recurse):
+    # Build a list of directories
+    paths = []
+
+    dir, pattern = os.path.split(path)
+    for cur_root, cur_dirs, cur_files in os.walk(dir):
+        paths.extend(os.path.join(cur_root, file) for file in \
+                     fnmatch.filter(cur_files, pattern))
+        if not recurse:
+            break
+
+    # If no files have been found, return the original path/pattern. This will
+    # force an error to be thrown if no matching files were found.
+    return paths or [path]
+
+def printlogo():
+    # TODO: Print version number.
+    print "JavaScript Lint"
+    print "Developed by Matthias Miller (http://www.JavaScriptLint.com)"
+
+def _profile_enabled(func, *args, **kwargs):
+    import tempfile
+    import hotshot
+    import hotshot.stats
+    handle, filename = tempfile.mkstemp()
+    profile = hotshot.Profile(filename)
+    profile.runcall(func, *args, **kwargs)
+    profile.close()
+    stats = hotshot.stats.load(filename)
+    stats = stats.sort_stats("time")
+    stats.print_stats()
+def _profile_disabled(func, *args, **kwargs):
+    func(*args, **kwargs)
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    _lint_results['warnings'] = 0
+    _lint_results['errors'] = 0
+
+    parser = OptionParser(usage="%prog [options] [files]")
+    add = parser.add_option
+    add("--conf", dest="conf", metavar="CONF",
+        help="set the conf file")
+    add("--profile", dest="profile", action="store_true", default=False,
+        help="turn on hotshot profiling")
+    add("--recurse", dest="recurse", action="store_true", default=False,
+        help="recursively search directories on the command line")
+    if os.name == 'nt':
+        add("--disable-wildcards", dest="wildcards", action="store_false",
+            default=True, help="do not resolve wildcards in the command line")
+    else:
+        add("--enable-wildcards", dest="wildcards", action="store_true",
+            default=False, help="resolve wildcards in the command line")
+    add("--jobs", dest="jobs", metavar="N", type="int", default=1,
+        help="lint files in N parallel processes")
+    add("--threads", dest="threads", metavar="N", type="int", default=1,
+        help="lint files in N threads, which only run in parallel while "
+             "parsing")
+    add("--cache-dir", dest="cache_dir", metavar="DIR",
+        help="reuse the results for unchanged files from DIR")
+    add("--cache-size", dest="cache_size", metavar="MB", type="int",
+        default=cache.DEFAULT_MAX_SIZE / (1024 * 1024),
+        help="limit the size of the result cache (default: %default MB)")
+    add("--incremental", dest="incremental", action="store_true",
+        default=False, help="only lint files that changed since the last "
+        "incremental run")
+    add("--index-file", dest="index_file", metavar="PATH",
+        default=".jslindex",
+        help="set the file used by --incremental (default: %default)")
+    add("--format", dest="format", metavar="FORMAT", default="text",
+        type="choice", choices=["text"] + sorted(output.writers.keys()),
+        help="write warnings as text (using output-format), ndjson or sarif; "
+             "the other formats omit the logo, file names and summary")
+    add("--timings", dest="timings", action="store_true", default=False,
+        help="print the time spent in each phase and rule to stderr")
+    add("--timings-json", dest="timings_json", metavar="PATH",
+        help="write the time spent in each phase and rule to PATH as JSON")
+    add("--benchmark", dest="benchmark", action="store_true", default=False,
+        help="time the linter on generated scripts and print the results "
+             "as JSON")
+    add("--benchmark-scale", dest="benchmark_scale", metavar="N", type="int",
+        default=1, help="multiply the size of the benchmark scripts by N")
+    add("--dump", dest="dump", action="store_true", default=False,
+        help="dump this script")
+    add("--unittest", dest="unittest", action="store_true", default=False,
+        help="run the python unittests")
+    add("--quiet", dest="verbosity", action="store_const", const=0,
+        help="minimal output")
+    add("--verbose", dest="verbosity", action="store_const", const=2,
+        help="verbose output")
+    add("--nologo", dest="printlogo", action="store_false", default=True,
+        help="suppress version information")
+    add("--nofilelisting", dest="printlisting", action="store_false",
+        default=True, help="suppress file names")
+    add("--nosummary", dest="printsummary", action="store_false", default=True,
+        help="suppress lint summary")
+    add("--help:conf", dest="showdefaultconf", action="store_true", default=False,
+        help="display the default configuration file")
+    add("--server", dest="server", action="store_true", default=False,
+        help="keep running and lint on behalf of --client")
+    add("--client", dest="client", action="store_true", default=False,
+        help="forward the command line to a running --server")
+    add("--socket", dest="socket", metavar="PATH",
+        default=daemon.default_socket_path(),
+        help="set the server socket (default: %default)")
+    parser.set_defaults(verbosity=1)
+    options, args = parser.parse_args(argv)
+
+    if not argv:
+        parser.print_help()
+        sys.exit()
+
+    if options.client:
+        if _server['result_cache']:
+            parser.error("--client cannot be used through the server")
+        sys.exit(daemon.client_main(argv))
+
+    if options.server:
+        if _server['result_cache']:
+            parser.error("the server is already running")
+        try:
+            _serve(options.socket)
+        except daemon.SocketError, err:
+            parser.error(str(err))
+        sys.exit()
+
+    if options.showdefaultconf:
+        print conf.DEFAULT_CONF
+        sys.exit()
+
+    if options.benchmark:
+        if options.benchmark_scale < 1:
+            parser.error("--benchmark-scale must be at least 1")
+        print json.dumps(bench.run(options.benchmark_scale), indent=2,
+                         separators=(',', ': '), sort_keys=True)
+        sys.exit()
+
+    if options.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if options.threads < 1:
+        parser.error("--threads must be at least 1")
+    if options.jobs > 1 and options.threads > 1:
+        parser.error("--jobs and --threads cannot be combined")
+    if options.threads > 1 and (options.timings or options.timings_json):
+        parser.error("--timings and --timings-json cannot be combined with "
+                     "--threads")
+
+    if options.format != 'text':
+        options.printlogo = False
+        options.printsummary = False
+
+    if options.printlogo:
+        printlogo()
+
+    conf_ = _loadconf(options.conf)
+
+    result_cache = _server['result_cache']
+    if options.cache_dir:
+        result_cache = cache.ResultCache(options.cache_dir,
+                                         options.cache_size * 1024 * 1024)
+
+    file_index = None
+    if options.incremental:
+        version = cache.makekey(cache.linter_version(), conf_.fingerprint())
+        file_index = cache.FileIndex(options.index_file, version)
+
+    timings_ = None
+    if options.timings or options.timings_json:
+        timings_ = timings.Timings()
+
+    profile_func = _profile_disabled
+    if options.profile:
+        profile_func = _profile_enabled
+
+    if options.unittest:
+        suite = unittest.TestSuite();
+        for module in [bench, cache, conf, daemon, htmlparse, jsparse, lint,
+                       output, timings, util, visitation]:
+            suite.addTest(unittest.findTestCases(module))
+
+        runner = unittest.TextTestRunner(verbosity=options.verbosity)
+        runner.run(suite)
+
+    paths = []
+    for recurse, path in conf_['paths']:
+        paths.extend(_resolve_paths(path, recurse))
+    for arg in args:
+        if options.wildcards:
+            paths.extend(_resolve_paths(arg, options.recurse))
+        elif options.recurse and os.path.isdir(arg):
+            paths.extend(_resolve_paths(os.path.join(arg, '*'), True))
+        else:
+            paths.append(arg)
+    if options.dump:
+        profile_func(_dump, paths)
+    else:
+        profile_func(_lint, paths, conf_, options.printlisting, options.jobs,
+                     options.threads, result_cache, file_index, options.format,
+                     timings_)
+
+    if options.printsummary:
+        print '\n%i error(s), %i warnings(s)' % (_lint_results['errors'],
+                                                 _lint_results['warnings'])
+
+    if timings_:
+        report = timings_.getreport()
+        if options.timings:
+            sys.stdout.flush()
+            sys.stderr.write(timings.format_report(report))
+        if options.timings_json:
+            f = open(options.timings_json, 'w')
+            try:
+                json.dump(report, f, indent=2, separators=(',', ': '),
+                          sort_keys=True)
+            finally:
+                f.close()
+
+    if _lint_results['errors']:
+        sys.exit(3)
+    if _lint_results['warnings']:
+        sys.exit(1)
+    sys.exit(0)
+
+if __name__ == '__main__':
+    main()
+
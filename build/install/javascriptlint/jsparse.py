@@ -0,0 +1,622 @@
+#!/root/.pyenv/versions/2.7.18/bin/python
+# vim: ts=4 sw=4 expandtab
+""" Parses a script into nodes. """
+import array
+import bisect
+import gc
+import itertools
+import re
+import threading
+import unittest
+
+import spidermonkey
+from spidermonkey import tok, op
+from util import JSVersion
+
+_tok_names = dict(zip(
+    [getattr(tok, prop) for prop in dir(tok)],
+    ['tok.%s' % prop for prop in dir(tok)]
+))
+_op_names = dict(zip(
+    [getattr(op, prop) for prop in dir(op)],
+    ['op.%s' % prop for prop in dir(op)]
+))
+
+NodePos = spidermonkey.NodePos
+
+# Threads that parse scripts need at least this much stack.
+PARSER_STACK_SIZE = spidermonkey.PARSER_STACK_SIZE
+
+# Parser contexts are expensive to create, so keep one for each version. A
+# context parses one script at a time without holding the GIL, so each thread
+# has its own.
+_parser_contexts = threading.local()
+
+def _getparsercontextkey(jsversion):
+    jsversion = jsversion or JSVersion.default()
+    return jsversion.version, jsversion.e4x
+
+def _getparsercontext(jsversion):
+    key = _getparsercontextkey(jsversion)
+    try:
+        contexts = _parser_contexts.contexts
+    except AttributeError:
+        contexts = _parser_contexts.contexts = {}
+    try:
+        return contexts[key]
+    except KeyError:
+        parser_context = spidermonkey.ParserContext(*key)
+        contexts[key] = parser_context
+        return parser_context
+
+class NodePositions:
+    " Given a string, allows [x] lookups for NodePos line and column numbers."
+    def __init__(self, text, start_pos=None):
+        # Find the length of each line and incrementally sum all of the lengths
+        # to determine the ending position of each line. Only the offsets are
+        # kept, in a compact array.
+        self._start_pos = start_pos
+        self._text = text
+        self._line_offsets = array.array('l', [0])
+        offset = 0
+        for length in map(len, text.splitlines(True)):
+            offset += length
+            self._line_offsets.append(offset)
+    def from_offset(self, offset):
+        line = bisect.bisect(self._line_offsets, offset)-1
+        return self._to_abs_pos(line, offset - self._line_offsets[line])
+    def from_offsets(self, offsets):
+        """ Converts a sorted sequence of offsets to a list of NodePos. The
+            search for each line starts at the line of the previous offset.
+        """
+        line_offsets = self._line_offsets
+        positions = []
+        line = 0
+        for offset in offsets:
+            if line_offsets[line] > offset:
+                raise ValueError, 'offsets must be sorted'
+            if line+1 < len(line_offsets) and line_offsets[line+1] <= offset:
+                line = bisect.bisect(line_offsets, offset, line+1)-1
+            positions.append(self._to_abs_pos(line, offset - line_offsets[line]))
+        return positions
+    def to_offset(self, pos):
+        line, col = self._to_rel_pos(pos)
+        offset = self._line_offsets[line] + col
+        assert offset <= self._line_offsets[line+1] # out-of-bounds col num
+        return offset
+    def text(self, start, end):
+        assert start <= end
+        start_line, start_col = self._to_rel_pos(start)
+        end_line, end_col = self._to_rel_pos(end)
+        # Slice the text directly instead of copying the lines, since this is
+        # called for every number. Columns past the end of a line stop at it.
+        offsets = self._line_offsets
+        start_offset = offsets[start_line] + \
+            min(start_col, offsets[start_line+1] - offsets[start_line])
+        end_offset = offsets[end_line] + \
+            min(end_col+1, offsets[end_line+1] - offsets[end_line])
+        return self._text[start_offset:end_offset]
+    def _to_abs_pos(self, line, col):
+        " converts a relative line and column to a NodePos "
+        if self._start_pos:
+            if line == 0:
+                col += self._start_pos.col
+            line += self._start_pos.line
+        return NodePos(line, col)
+    def _to_rel_pos(self, pos):
+        " converts a position to a (line, col) relative to self._start_pos "
+        line, col = pos.line, pos.col
+        if not self._start_pos:
+            return line, col
+        line -= self._start_pos.line
+        if line == 0:
+            col -= self._start_pos.col
+        assert line >= 0 and col >= 0 # out-of-bounds node position
+        return line, col
+
+class _Node(spidermonkey.Node):
+    # Nodes are numerous, so keep their fields in the native slots. The
+    # exit_points slot is filled in on demand by the warnings.
+    __slots__ = ('exit_points',)
+
+    def add_child(self, node):
+        if node:
+            node.node_index = len(self.kids)
+            node.parent = self
+        self.kids.append(node)
+
+    def __str__(self):
+        kind = self.kind
+        if not kind:
+            kind = '(none)'
+        return '%s>%s' % (_tok_names[kind], str(self.kids))
+
+    def is_equivalent(self, other, are_functions_equiv=False):
+        if not other:
+            return False
+
+        # Bail out for functions
+        if not are_functions_equiv:
+            if self.kind == tok.FUNCTION:
+                return False
+            if self.kind == tok.LP and self.opcode == op.CALL:
+                return False
+
+        if self.kind != other.kind:
+            return False
+        if self.opcode != other.opcode:
+            return False
+
+        # Check atoms on names, properties, and string constants
+        if self.kind in (tok.NAME, tok.DOT, tok.STRING) and self.atom != other.atom:
+            return False
+
+        # Check values on numbers
+        if self.kind == tok.NUMBER and self.dval != other.dval:
+            return False
+
+        # Compare child nodes
+        if len(self.kids) != len(other.kids):
+            return False
+        for i in range(0, len(self.kids)):
+            # Watch for dead nodes
+            if not self.kids[i]:
+                if not other.kids[i]: return True
+                else: return False
+            if not self.kids[i].is_equivalent(other.kids[i]):
+                return False
+
+        return True
+
+def isvalidversion(jsversion):
+    if jsversion is None:
+        return True
+    return spidermonkey.is_valid_version(jsversion.version)
+
+def _makecomment(script, start, end, opcode, start_pos, end_pos):
+    """ Creates a comment node for script[start:end], where end_pos is the
+        position of its last character.
+    """
+    if opcode == 'c_comment':
+        comment_text = script[start+2:end-2]
+    else:
+        comment_text = script[start+2:end]
+
+    comment_node = _Node()
+    comment_node.kind = 'COMMENT'
+    comment_node.atom = comment_text
+    comment_node.opcode = opcode
+    comment_node._start_line = start_pos.line
+    comment_node._start_col = start_pos.col
+    comment_node._end_line = end_pos.line
+    comment_node._end_col = end_pos.col
+    comment_node.parent = None
+    comment_node.kids = []
+    comment_node.node_index = None
+    return comment_node
+
+def findpossiblecomments(script, node_positions):
+    """ Returns the comments in a script that has not been parsed. This
+        includes false matches within strings and regular expressions.
+    """
+    pos = 0
+    single_line_re = r"//[^\r\n]*"
+    multi_line_re = r"/\*(.*?)\*/"
+    full_re = "(%s)|(%s)" % (single_line_re, multi_line_re)
+    comment_re = re.compile(full_re, re.DOTALL)
+
+    comments = []
+    while True:
+        match = comment_re.search(script, pos)
+        if not match:
+            return comments
+
+        if script.startswith('/*', match.start()):
+            opcode = 'c_comment'
+        else:
+            opcode = 'cpp_comment'
+        comments.append(_makecomment(script, match.start(), match.end(), opcode,
+                                     node_positions.from_offset(match.start()),
+                                     node_positions.from_offset(match.end()-1)))
+
+        # Start searching immediately after the start of the comment in case
+        # this one was within a string or a regexp.
+        pos = match.start()+1
+
+def parse(script, jsversion, error_callback, startpos=None, comments=None):
+    """ All node positions will be relative to startpos. This allows scripts
+        to be embedded in a file (for example, HTML).
+
+        If comments is a list, the parser appends a (start, end, opcode) tuple
+        for each comment, where script[start:end] is the comment.
+    """
+    def _wrapped_callback(line, col, msg):
+        error_callback(line, col, _geterrorname(msg))
+
+    startpos = startpos or NodePos(0,0)
+    jsversion = jsversion or JSVersion.default()
+    assert isvalidversion(jsversion)
+    parser_context = _getparsercontext(jsversion)
+    if comments is None:
+        return parser_context.parse(script, _Node, _wrapped_callback,
+                                    startpos.line, startpos.col)
+    return parser_context.parse(script, _Node, _wrapped_callback,
+                                startpos.line, startpos.col, comments)
+
+def parse_many(scripts, comments=False):
+    """ Parses a sequence of (script, jsversion, startpos) and returns a list
+        of (root, errors, comments), in the same order. Each error is a (line,
+        col, msg) tuple with the arguments that parse would pass to its
+        error_callback. If comments is true, each script's comments are
+        returned as a list of (start, end, opcode), as with parse; otherwise
+        they are None.
+
+        Consecutive scripts with the same version are parsed by one native
+        call, which is cheaper than calling parse for each of them.
+    """
+    results = []
+    # The trees are all kept, so collecting garbage while they are built
+    # would only traverse them again and again. The collector is left alone
+    # if other threads are running, since their parses could overlap and
+    # keep it disabled. The trees are cycles that only it can free.
+    paused = gc.isenabled() and threading.active_count() == 1
+    if paused:
+        gc.disable()
+    try:
+        for key, group in itertools.groupby(scripts, lambda script:
+                                            _getparsercontextkey(script[1])):
+            batch = []
+            jsversion = None
+            for script, jsversion, startpos in group:
+                startpos = startpos or NodePos(0,0)
+                batch.append((script, startpos.line, startpos.col))
+            assert isvalidversion(jsversion)
+            parser_context = _getparsercontext(jsversion)
+            for root, errors, comment_offsets in \
+                    parser_context.parse_many(batch, _Node, bool(comments)):
+                errors = [(line, col, _geterrorname(msg))
+                          for line, col, msg in errors]
+                results.append((root, errors, comment_offsets))
+    finally:
+        if paused:
+            gc.enable()
+    return results
+
+def _geterrorname(msg):
+    assert msg.startswith('JSMSG_')
+    return msg[6:].lower()
+
+def makecomments(script, comments, node_positions):
+    """ Returns comment nodes for the comments reported by parse. """
+    # The comments are in order and do not overlap, so their starts and ends
+    # can be converted together.
+    offsets = []
+    for start, end, opcode in comments:
+        offsets.append(start)
+        offsets.append(end-1)
+    positions = node_positions.from_offsets(offsets)
+    return [_makecomment(script, start, end, opcode,
+                         positions[2*i], positions[2*i+1])
+            for i, (start, end, opcode) in enumerate(comments)]
+
+def setnumberatoms(root_node, node_positions):
+    """ Sets the atom of each number to its text in the script. """
+    # Use an explicit stack, since the tree may be deeply nested.
+    nodes = [root_node]
+    while nodes:
+        node = nodes.pop()
+        if node.kind == tok.NUMBER:
+            node.atom = node_positions.text(node.start_pos(), node.end_pos())
+        nodes.extend(kid for kid in node.kids if kid)
+
+def findcomments(script, jsversion=None, start_pos=None):
+    """ Parses the script and returns its comments. """
+    comments = []
+    if parse(script, jsversion, lambda line, col, msg: None, start_pos,
+             comments) is None:
+        return None
+    return makecomments(script, comments, NodePositions(script, start_pos))
+
+def is_compilable_unit(script, jsversion):
+    jsversion = jsversion or JSVersion.default()
+    assert isvalidversion(jsversion)
+    return _getparsercontext(jsversion).is_compilable_unit(script)
+
+def _dump_node(node, depth=0):
+    nodes = [(node, depth)]
+    while nodes:
+        node, depth = nodes.pop()
+        if node is None:
+            print '     '*depth,
+            print '(None)'
+            print
+            continue
+
+        print '     '*depth,
+        print '%s, %s' % (_tok_names[node.kind], _op_names[node.opcode])
+        print '     '*depth,
+        print '%s - %s' % (node.start_pos(), node.end_pos())
+        if hasattr(node, 'atom'):
+            print '     '*depth,
+            print 'atom: %s' % node.atom
+        if node.no_semi:
+            print '     '*depth,
+            print '(no semicolon)'
+        print
+        nodes.extend((kid, depth+1) for kid in reversed(node.kids))
+
+def dump_tree(script):
+    def error_callback(line, col, msg):
+        print '(%i, %i): %s', (line, col, msg)
+    node = parse(script, None, error_callback)
+    _dump_node(node)
+
+class TestComments(unittest.TestCase):
+    def _test(self, script, expected_comments):
+        comments = findcomments(script)
+        encountered_comments = [node.atom for node in comments]
+        self.assertEquals(encountered_comments, list(expected_comments))
+    def testSimpleComments(self):
+        self._test('re = /\//g', ())
+        self._test('re = /\///g', ())
+        self._test('re = /\////g', ('g',))
+    def testCComments(self):
+        self._test('/*a*//*b*/', ('a', 'b'))
+        self._test('/*a\r\na*//*b\r\nb*/', ('a\r\na', 'b\r\nb'))
+        self._test('a//*b*/c', ('*b*/c',))
+        self._test('a///*b*/c', ('/*b*/c',))
+        self._test('a/*//*/;', ('//',))
+        self._test('a/*b*/+/*c*/d', ('b', 'c'))
+    def testStrings(self):
+        self._test('s = "http://example.com/*";//a', ('a',))
+        self._test("s = '/*';/*a*/s = '*/';", ('a',))
+        self._test('re = /[/*]/;//a\r\n', ('a',))
+    def testHtmlComments(self):
+        self._test('<!-- a\nb //c\n--> d', ('c',))
+    def testOffsets(self):
+        for script in (u'//a\r\nb', u'\U0001d11e;/*a*/ //b', u'\xe9;//a\u2028b'):
+            comments = []
+            parse(script, None, lambda line, col, msg: None, None, comments)
+            for start, end, opcode in comments:
+                self.assert_(script[start:end].startswith(('//', '/*')))
+                if opcode == 'c_comment':
+                    self.assert_(script[start:end].endswith('*/'))
+                else:
+                    self.assert_(not '\n' in script[start:end+1])
+
+class TestNodePositions(unittest.TestCase):
+    def _test(self, text, expected_lines, expected_cols):
+        # Get a NodePos list
+        positions = NodePositions(text)
+        positions = [positions.from_offset(i) for i in range(0, len(text))]
+        encountered_lines = ''.join([str(x.line) for x in positions])
+        encountered_cols = ''.join([str(x.col) for x in positions])
+        self.assertEquals(encountered_lines, expected_lines.replace(' ', ''))
+        self.assertEquals(encountered_cols, expected_cols.replace(' ', ''))
+    def testSimple(self):
+        self._test(
+            'abc\r\ndef\nghi\n\nj',
+            '0000 0 1111 2222 3 4',
+            '0123 4 0123 0123 0 0'
+        )
+        self._test(
+            '\rabc',
+            '0 111',
+            '0 012'
+        )
+    def testText(self):
+        pos = NodePositions('abc\r\ndef\n\nghi')
+        self.assertEquals(pos.text(NodePos(0, 0), NodePos(0, 0)), 'a')
+        self.assertEquals(pos.text(NodePos(0, 0), NodePos(0, 2)), 'abc')
+        self.assertEquals(pos.text(NodePos(0, 2), NodePos(1, 2)), 'c\r\ndef')
+        self.assertEquals(pos.text(NodePos(0, 1), NodePos(0, 9)), 'bc\r\n')
+        self.assertEquals(pos.text(NodePos(1, 5), NodePos(2, 0)), '\n')
+    def testOffset(self):
+        pos = NodePositions('abc\r\ndef\n\nghi')
+        self.assertEquals(pos.to_offset(NodePos(0, 2)), 2)
+        self.assertEquals(pos.to_offset(NodePos(1, 0)), 5)
+        self.assertEquals(pos.to_offset(NodePos(3, 1)), 11)
+    def testStartPos(self):
+        pos = NodePositions('abc\r\ndef\n\nghi', NodePos(3,4))
+        self.assertEquals(pos.to_offset(NodePos(3, 4)), 0)
+        self.assertEquals(pos.to_offset(NodePos(3, 5)), 1)
+        self.assertEquals(pos.from_offset(0), NodePos(3, 4))
+        self.assertEquals(pos.text(NodePos(3, 4), NodePos(3, 4)), 'a')
+        self.assertEquals(pos.text(NodePos(3, 4), NodePos(3, 6)), 'abc')
+        self.assertEquals(pos.text(NodePos(3, 6), NodePos(4, 2)), 'c\r\ndef')
+    def testFromOffsets(self):
+        text = 'abc\r\ndef\n\nghi'
+        for start_pos in (None, NodePos(3,4)):
+            pos = NodePositions(text, start_pos)
+            offsets = [0, 0, 2, 5, 9, 10, 13, len(text)]
+            self.assertEquals(pos.from_offsets(offsets),
+                              [pos.from_offset(i) for i in offsets])
+            self.assertEquals(pos.from_offsets([]), [])
+            self.assertRaises(ValueError, pos.from_offsets, [5, 2])
+
+class TestCompilableUnit(unittest.TestCase):
+    def test(self):
+        tests = (
+            ('var s = "', False),
+            ('bogon()', True),
+            ('int syntax_error;', True),
+            ('a /* b', False),
+            ('re = /.*', False),
+            ('{ // missing curly', False)
+        )
+        for text, expected in tests:
+            encountered = is_compilable_unit(text, JSVersion.default())
+            self.assertEquals(encountered, expected)
+        # NOTE: This seems like a bug.
+        self.assert_(is_compilable_unit("/* test", JSVersion.default()))
+
+class TestNode(unittest.TestCase):
+    def testFields(self):
+        root = parse('var a = 1;', None, lambda line, col, msg: None)
+        var = root.kids[0]
+        self.assertEquals(var.kind, tok.VAR)
+        self.assert_(var.parent is root)
+        self.assertEquals(var.node_index, 0)
+        self.assertEquals(var.kids[0].atom, 'a')
+        self.assertEquals(var.kids[0].kids[0].dval, 1)
+        self.assertRaises(AttributeError, lambda: var.atom)
+        self.assertRaises(AttributeError, lambda: setattr(var, 'bogus', 1))
+    def testPositions(self):
+        node = _Node()
+        node._start_line, node._start_col = 1, 2
+        node._end_line, node._end_col = 1, 5
+        self.assert_(node.start_pos() is node.start_pos())
+        self.assertEquals(node.start_pos(), NodePos(1, 2))
+        self.assertEquals(node.end_pos(), NodePos(1, 5))
+        node._start_col = 3
+        self.assertEquals(node.start_pos(), NodePos(1, 3))
+
+class TestParserContext(unittest.TestCase):
+    def _parse(self, script, jsversion):
+        errors = []
+        def error_callback(line, col, msg):
+            errors.append(msg)
+        root = parse(script, jsversion, error_callback)
+        return root, errors
+    def testReuse(self):
+        jsversion = JSVersion.default()
+        for i in range(3):
+            root, errors = self._parse('function f(a, b) { return a; }', jsversion)
+            self.assertEquals(errors, [])
+            self.assertEquals(root.kids[0].fn_args, (u'a', u'b'))
+            # Errors must not carry over to the next parse.
+            root, errors = self._parse('var s = "', jsversion)
+            self.assertEquals(root, None)
+            self.assertEquals(errors, ['unterminated_string'])
+        self.assert_(_getparsercontext(jsversion) is _getparsercontext(jsversion))
+    def testParseMany(self):
+        def getnodes(root):
+            nodes = []
+            stack = [root]
+            while stack:
+                node = stack.pop()
+                if node:
+                    nodes.append((node.kind, node.opcode, node.start_pos(),
+                                  node.end_pos()))
+                    stack.extend(node.kids)
+            return nodes
+        scripts = [
+            ('var a = 1; //a', None, None),
+            ('var s = "', None, NodePos(2, 3)),
+            ('let x = 1;', JSVersion('1.5', False), None),
+            ('let x = 1;', JSVersion('1.7', False), None),
+            ('/*b*/ var b;', None, NodePos(1, 0)),
+        ]
+        results = parse_many(scripts, comments=True)
+        self.assertEquals(len(results), len(scripts))
+        for (script, jsversion, startpos), (root, errors, comments) in \
+                zip(scripts, results):
+            expected_errors = []
+            expected_comments = []
+            expected_root = parse(script, jsversion,
+                                  lambda *args: expected_errors.append(args),
+                                  startpos, expected_comments)
+            self.assertEquals(errors, expected_errors)
+            self.assertEquals(comments, expected_comments)
+            self.assertEquals(getnodes(root), getnodes(expected_root))
+        self.assertEquals(results[1][1], [(2, 11, 'unterminated_string')])
+        self.assertEquals(parse_many(scripts[:1])[0][2], None)
+        self.assertEquals(parse_many([]), [])
+    def testVersions(self):
+        script = 'let x = 1;'
+        self.assertEquals(self._parse(script, JSVersion('1.7', False))[1], [])
+        self.assertEquals(self._parse(script, JSVersion('1.5', False))[1],
+                          ['semi_before_stmnt'])
+        self.assertEquals(self._parse(script, JSVersion('1.7', False))[1], [])
+    def testThreads(self):
+        jsversion = JSVersion.default()
+        script = 'function f(a) { return a + 1.5e3; }\nvar a = 1; var a = 2;\n' * 50
+        root, errors = self._parse(script, jsversion)
+        expected = (len(root.kids), errors)
+        results = []
+        contexts = []
+        def parse_script():
+            for i in range(20):
+                root, errors = self._parse(script, jsversion)
+                results.append((len(root.kids), errors))
+            contexts.append(_getparsercontext(jsversion))
+
+        stack_size = threading.stack_size(PARSER_STACK_SIZE + 1024 * 1024)
+        try:
+            threads = [threading.Thread(target=parse_script) for i in range(4)]
+        finally:
+            threading.stack_size(stack_size)
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEquals(len(results), 80)
+        self.assert_(all(result == expected for result in results))
+        self.assertEquals(len(set(contexts)), 4)
+        self.assert_(not _getparsercontext(jsversion) in contexts)
+    def testCollector(self):
+        class Collector:
+            def isenabled(self):
+                return True
+            def disable(self):
+                disabled.append(threading.current_thread())
+            def enable(self):
+                pass
+        global gc
+        disabled = []
+        real_gc = gc
+        gc = Collector()
+        try:
+            # Another thread is running, so the collector is left alone.
+            thread = threading.Thread(target=parse_many,
+                                      args=([('x;', None, None)],))
+            thread.start()
+            thread.join()
+            self.assertEquals(disabled, [])
+            if threading.active_count() == 1:
+                parse_many([('x;', None, None)])
+                self.assertEquals(disabled, [threading.current_thread()])
+        finally:
+            gc = real_gc
+
+class TestLineOffset(unittest.TestCase):
+    def testErrorPos(self):
+        def geterror(script, startpos):
+            errors = []
+            def onerror(line, col, msg):
+                errors.append((line, col, msg))
+            parse(script, None, onerror, startpos)
+            self.assertEquals(len(errors), 1)
+            return errors[0]
+        self.assertEquals(geterror(' ?', None), (0, 1, 'syntax_error'))
+        self.assertEquals(geterror('\n ?', None), (1, 1, 'syntax_error'))
+        self.assertEquals(geterror(' ?', NodePos(1,1)), (1, 2, 'syntax_error'))
+        self.assertEquals(geterror('\n ?', NodePos(1,1)), (2, 1, 'syntax_error'))
+    def testNodePos(self):
+        def getnodepos(script, startpos):
+            root = parse(script, None, None, startpos)
+            self.assertEquals(root.kind, tok.LC)
+            var, = root.kids
+            self.assertEquals(var.kind, tok.VAR)
+            return var.start_pos()
+        self.assertEquals(getnodepos('var x;', None), NodePos(0,0))
+        self.assertEquals(getnodepos(' var x;', None), NodePos(0,1))
+        self.assertEquals(getnodepos('\n\n var x;', None), NodePos(2,1))
+        self.assertEquals(getnodepos('var x;', NodePos(3,4)), NodePos(3,4))
+        self.assertEquals(getnodepos(' var x;', NodePos(3,4)), NodePos(3,5))
+        self.assertEquals(getnodepos('\n\n var x;', NodePos(3,4)), NodePos(5,1))
+    def testComments(self):
+        def testcomment(comment, startpos, expectedpos):
+            comment, = findcomments(comment, None, startpos)
+            self.assertEquals(comment.start_pos(), expectedpos)
+        for comment in ('/*comment*/', '//comment'):
+            testcomment(comment, None, NodePos(0,0))
+            testcomment(' %s' % comment, None, NodePos(0,1))
+            testcomment('\n\n %s' % comment, None, NodePos(2,1))
+            testcomment('%s' % comment, NodePos(3,4), NodePos(3,4))
+            testcomment(' %s' % comment, NodePos(3,4), NodePos(3,5))
+            testcomment('\n\n %s' % comment, NodePos(3,4), NodePos(5,1))
+
+if __name__ == '__main__':
+    unittest.main()
+
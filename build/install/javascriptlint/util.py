@@ -0,0 +1,230 @@
+# vim: ts=4 sw=4 expandtab
+import cgi
+import os.path
+import re
+import sys
+import unittest
+
+_identifier = re.compile('^[A-Za-z_$][A-Za-z0-9_$]*$')
+
+_contenttypes = (
+    'text/javascript',
+    'text/ecmascript',
+    'application/javascript',
+    'application/ecmascript',
+    'application/x-javascript',
+)
+
+class JSVersion:
+    def __init__(self, jsversion, is_e4x):
+        self.version = jsversion
+        self.e4x = is_e4x
+
+    def __eq__(self, other):
+        return self.version == other.version and \
+               self.e4x == other.e4x
+
+    def __repr__(self):
+        return 'JSVersion(%r, %r)' % (self.version, self.e4x)
+
+    @classmethod
+    def default(klass):
+        return klass('default', False)
+
+    @classmethod
+    def fromattr(klass, attr, default_version=None):
+        if attr.get('type'):
+            return klass.fromtype(attr['type'])
+        if attr.get('language'):
+            return klass.fromlanguage(attr['language'])
+        return default_version
+
+    @classmethod
+    def fromtype(klass, type_):
+        typestr, typeparms = cgi.parse_header(type_)
+        if typestr.lower() in _contenttypes:
+            jsversion = typeparms.get('version', 'default')
+            is_e4x = typeparms.get('e4x') == '1'
+            return klass(jsversion, is_e4x)
+        return None
+
+    @classmethod
+    def fromlanguage(klass, language):
+        if language.lower() in ('javascript', 'livescript', 'mocha'):
+            return klass.default()
+
+        # Simplistic parsing of javascript/x.y
+        if language.lower().startswith('javascript'):
+            language = language[len('javascript'):]
+            if language.replace('.', '').isdigit():
+                return klass(language, False)
+
+        return None
+
+def isidentifier(text):
+    return _identifier.match(text)
+
+def _encode_error_keyword(s):
+    s = s.replace('\\', '\\\\')
+    s = s.replace('"', '\\"')
+    s = s.replace("'", "\\'")
+    s = s.replace("\t", "\\t")
+    s = s.replace("\r", "\\r")
+    s = s.replace("\n", "\\n")
+    return s
+
+_errprefix = 'warning' #TODO
+
+_error_keywords = {
+    '__FILE__': lambda path, line, col, errname, errdesc: path,
+    '__FILENAME__': lambda path, line, col, errname, errdesc:
+        os.path.basename(path),
+    '__LINE__': lambda path, line, col, errname, errdesc: str(line+1),
+    '__COL__': lambda path, line, col, errname, errdesc: str(col),
+    '__ERROR__': lambda path, line, col, errname, errdesc:
+        '%s: %s' % (_errprefix, errdesc),
+    '__ERROR_NAME__': lambda path, line, col, errname, errdesc: errname,
+    '__ERROR_PREFIX__': lambda path, line, col, errname, errdesc: _errprefix,
+    '__ERROR_MSG__': lambda path, line, col, errname, errdesc: errdesc,
+    '__ERROR_MSGENC__': lambda path, line, col, errname, errdesc: errdesc,
+}
+_error_keywords_re = re.compile('|'.join(_error_keywords.keys()))
+
+_compiled_formats = {}
+
+def compile_error_format(output_format):
+    """ Returns a function that formats an error according to output_format:
+            format(path, line, col, errname, errdesc)
+    """
+    if output_format in _compiled_formats:
+        return _compiled_formats[output_format]
+
+    # If the output format starts with encode:, all of the keywords should be
+    # encoded.
+    template = output_format
+    if template.startswith('encode:'):
+        template = template[len('encode:'):]
+        encoded_keywords = _error_keywords.keys()
+    else:
+        encoded_keywords = ['__ERROR_MSGENC__']
+
+    # Turn the template into a format string with one %s per keyword. No
+    # keyword is a prefix of another, so this matches the same keywords as
+    # substituting them one at a time.
+    fmt = []
+    getters = []
+    pos = 0
+    for match in _error_keywords_re.finditer(template):
+        fmt.append(template[pos:match.start()].replace('%', '%%'))
+        fmt.append('%s')
+        getter = _error_keywords[match.group(0)]
+        if match.group(0) in encoded_keywords:
+            getter = _encoded_getter(getter)
+        getters.append(getter)
+        pos = match.end()
+    if not getters:
+        # The result does not depend on the error.
+        return lambda path, line, col, errname, errdesc: template
+    fmt.append(template[pos:].replace('%', '%%'))
+    fmt = ''.join(fmt)
+
+    def format(path, line, col, errname, errdesc):
+        return fmt % tuple([getter(path, line, col, errname, errdesc)
+                            for getter in getters])
+    _compiled_formats[output_format] = format
+    return format
+
+def _encoded_getter(getter):
+    return lambda *args: _encode_error_keyword(getter(*args))
+
+def format_error(output_format, path, line, col, errname, errdesc):
+    return compile_error_format(output_format)(path, line, col, errname,
+                                               errdesc)
+
+class BufferedWriter:
+    """ A file-like object that collects writes and passes them on to file in
+        bulk. Unicode is encoded the same way that print would encode it for
+        file.
+    """
+    def __init__(self, file, size=64*1024):
+        self._file = file
+        self._chunks = []
+        self._size = 0
+        self._limit = size
+        self.encoding = getattr(file, 'encoding', None)
+        self.softspace = 0
+    def write(self, s):
+        if isinstance(s, unicode):
+            s = s.encode(self.encoding or sys.getdefaultencoding())
+        self._chunks.append(s)
+        self._size += len(s)
+        if self._size >= self._limit:
+            self.flush()
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+    def flush(self):
+        if self._chunks:
+            self._file.write(''.join(self._chunks))
+            self._chunks = []
+            self._size = 0
+        self._file.flush()
+
+class TestUtil(unittest.TestCase):
+    def testIdentifier(self):
+        assert not isidentifier('')
+        assert not isidentifier('0a')
+        assert not isidentifier('a b')
+        assert isidentifier('a')
+        assert isidentifier('$0')
+
+    def testEncodeKeyword(self):
+        self.assertEquals(_encode_error_keyword(r'normal text'), 'normal text')
+        self.assertEquals(_encode_error_keyword(r'a\b'), r'a\\b')
+        self.assertEquals(_encode_error_keyword(r"identifier's"), r"identifier\'s")
+        self.assertEquals(_encode_error_keyword(r'"i"'), r'\"i\"')
+        self.assertEquals(_encode_error_keyword('a\tb'), r'a\tb')
+        self.assertEquals(_encode_error_keyword('a\rb'), r'a\rb')
+        self.assertEquals(_encode_error_keyword('a\nb'), r'a\nb')
+
+    def testFormattedError(self):
+        self.assertEquals(format_error('__FILE__', '__LINE__', 1, 2, 'name', 'desc'),
+                          '__LINE__')
+        self.assertEquals(format_error('__FILE__', r'c:\my\file', 1, 2, 'name', 'desc'),
+                          r'c:\my\file')
+        self.assertEquals(format_error('encode:__FILE__', r'c:\my\file', 1, 2, 'name', 'desc'),
+                          r'c:\\my\\file')
+        self.assertEquals(format_error('__ERROR_MSGENC__', r'c:\my\file', 1, 2, 'name', r'a\b'),
+                          r'a\\b')
+        self.assertEquals(format_error('encode:__ERROR_MSGENC__', r'c:\my\file', 1, 2, 'name', r'a\b'),
+                          r'a\\b')
+        self.assertEquals(format_error('%s __FILENAME__:__LINE__:__COL__ __ERROR__ '
+                                       '(__ERROR_NAME__) %d', r'/a/file', 1, 2,
+                                       'name', 'desc'),
+                          '%s file:2:2 warning: desc (name) %d')
+        self.assertEquals(format_error('encode:__ERROR_PREFIX__ __ERROR_MSG__',
+                                       'file', 1, 2, 'name', u'"\xe9"'),
+                          u'warning \\"\xe9\\"')
+        self.assertEquals(format_error('no keywords', 'file', 1, 2, 'name', 'desc'),
+                          'no keywords')
+
+    def testBufferedWriter(self):
+        chunks = []
+        class File:
+            encoding = 'utf-8'
+            def write(self, s):
+                chunks.append(s)
+            def flush(self):
+                pass
+        writer = BufferedWriter(File(), 4)
+        writer.write('ab')
+        self.assertEquals(chunks, [])
+        writer.write(u'\xe9')
+        self.assertEquals(chunks, ['ab\xc3\xa9'])
+        writer.write('c')
+        writer.flush()
+        self.assertEquals(chunks, ['ab\xc3\xa9', 'c'])
+
+if __name__ == '__main__':
+    unittest.main()
+
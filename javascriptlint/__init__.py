@@ -1,3 +1,6 @@
 # vim: ts=4 sw=4 expandtab
-from jsl import main
 
+def main():
+    # Import the linter on demand so that a --client can start quickly.
+    from jsl import main
+    main()
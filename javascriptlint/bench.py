@@ -0,0 +1,310 @@
+# vim: ts=4 sw=4 expandtab
+""" Measures the linter's throughput on generated corpora.
+
+Each corpus is generated from a fixed seed, so the same scale produces the
+same files on every run. For each corpus, the phases of linting a script are
+timed separately, along with a complete run through lint.lint_files. Where
+the platform allows, the peak memory used to lint each file is measured in a
+child process. The results are returned as a dictionary that can be saved as
+JSON and compared across commits.
+"""
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import cache
+import conf
+import fs
+import jsparse
+import lint
+import util
+import warnings
+
+_PHASES = ('read', 'parse', 'comments', 'visitors', 'scope', 'output')
+
+def _bundle(rand, scale):
+    """ Minified code. The lines are kept below 64K characters, because the
+        parser's column numbers are 16 bits.
+    """
+    lines = []
+    for i in range(20 * scale):
+        parts = []
+        for j in range(150):
+            parts.append('function f%d_%d(a,b){var c=a+%d;if(c>b){return c*2}'
+                         'for(var i=0;i<b;i++){c+=i%%3?a:b}return[c,{k:c,"s":"%d"}]}'
+                         % (i, j, rand.randint(0, 1000), j))
+        lines.append(';'.join(parts))
+    return {'bundle.js': ';\n'.join(lines) + ';\n'}
+
+def _closures(rand, scale):
+    """ Deeply nested closures. """
+    chunks = []
+    for i in range(20 * scale):
+        depth = rand.randint(10, 40)
+        chunk = []
+        for level in range(depth):
+            chunk.append('%sfunction c%d_%d(x%d) {\n%s  var y%d = x%d + %d;\n' %
+                         ('  ' * level, i, level, level, '  ' * level, level,
+                          level, rand.randint(0, 9)))
+        for level in reversed(range(depth)):
+            chunk.append('%s  return c%d_%d;\n%s}\n' %
+                         ('  ' * level, i, level, '  ' * level))
+        chunks.append(''.join(chunk))
+    return {'closures.js': ''.join(chunks)}
+
+def _switches(rand, scale):
+    """ Functions with large, nested switch statements. """
+    chunks = []
+    for i in range(20 * scale):
+        chunk = ['function s%d(a, b) {\n  switch (a) {\n' % i]
+        for case in range(40):
+            chunk.append('  case %d:\n' % case)
+            if rand.random() < 0.3:
+                chunk.append('    switch (b) {\n    case 0: return %d;\n'
+                             '    default: b++;\n    }\n' % case)
+            chunk.append('    a += %d;\n    break;\n' % rand.randint(0, 99))
+        chunk.append('  default:\n    return 0;\n  }\n  return a;\n}\n')
+        chunks.append(''.join(chunk))
+    return {'switches.js': ''.join(chunks)}
+
+def _literals(rand, scale):
+    """ Data files made of literals. """
+    rows = []
+    for i in range(2000 * scale):
+        rows.append('  {id: %d, name: "item%d", price: %.2f, tags: ["a", "b"], '
+                    'ok: %s, ratio: 0x%x}' %
+                    (i, i, rand.random() * 100, rand.choice(['true', 'false']),
+                     rand.randint(0, 0xffff)))
+    return {'literals.js': 'var data = [\n%s\n];\n' % ',\n'.join(rows)}
+
+def _html(rand, scale):
+    """ Pages with many inline scripts. """
+    files = {}
+    for page in range(5 * scale):
+        chunks = ['<html><body>\n']
+        for i in range(100):
+            chunks.append('<p>paragraph %d</p>\n<script type="text/javascript">\n'
+                          '/* script %d */\nvar p%d_%d = document.getElementById("e%d");\n'
+                          'if (p%d_%d) { p%d_%d.innerHTML = "%d"; }\n</script>\n' %
+                          (i, i, page, i, i, page, i, page, i,
+                           rand.randint(0, 1000)))
+        chunks.append('</body></html>\n')
+        files['page%d.html' % page] = ''.join(chunks)
+    return files
+
+CORPORA = (
+    ('bundle', _bundle),
+    ('closures', _closures),
+    ('switches', _switches),
+    ('literals', _literals),
+    ('html', _html),
+)
+
+def generate(dir, scale=1, seed=0):
+    """ Writes the corpora to subdirectories of dir and returns a list of
+        (name, paths).
+    """
+    corpora = []
+    for name, generator in CORPORA:
+        corpusdir = os.path.join(dir, name)
+        os.mkdir(corpusdir)
+        paths = []
+        files = generator(random.Random('%s:%i' % (name, seed)), scale)
+        for filename in sorted(files):
+            path = os.path.join(corpusdir, filename)
+            f = open(path, 'w')
+            try:
+                f.write(files[filename])
+            finally:
+                f.close()
+            paths.append(path)
+        corpora.append((name, paths))
+    return corpora
+
+class _NullFile:
+    def write(self, s):
+        pass
+    def flush(self):
+        pass
+
+def _time_phases(paths, conf_):
+    """ Lints each path one phase at a time and returns the seconds spent in
+        each phase and the number of warnings.
+    """
+    def report(node, errname, pos=None, **errargs):
+        pos = pos or node.start_pos()
+        errdesc = warnings.format_error(errname, **errargs)
+        found.append((pos.line, pos.col, errname, errdesc))
+    def parse_error(row, col, msg):
+        pass
+
+    times = dict((phase, 0.0) for phase in _PHASES)
+    found = []
+    count = 0
+    format_error = util.compile_error_format(conf_['output-format'])
+    for path in paths:
+        start = time.time()
+        contents = fs.readfile(path)
+        if path.endswith('.html'):
+            parts = [(script['pos'], script['jsversion'], script['contents'])
+                     for script in lint._findhtmlscripts(contents,
+                                                         conf_['default-version'])
+                     if script['type'] == 'inline']
+        else:
+            parts = [(None, conf_['default-version'], contents)]
+        times['read'] += time.time() - start
+
+        del found[:]
+        scope = lint.Scope()
+        for scriptpos, jsversion, script in parts:
+            start = time.time()
+            comment_offsets = []
+            root = jsparse.parse(script, jsversion, parse_error, scriptpos,
+                                 comment_offsets)
+            times['parse'] += time.time() - start
+
+            start = time.time()
+            node_positions = jsparse.NodePositions(script, scriptpos)
+            jsparse.setnumberatoms(root, node_positions)
+            jsparse.makecomments(script, comment_offsets, node_positions)
+            times['comments'] += time.time() - start
+
+            start = time.time()
+            lint._lint_node(root, lint._LintContext(scope, report))
+            times['visitors'] += time.time() - start
+
+        start = time.time()
+        scope.get_identifier_warnings()
+        times['scope'] += time.time() - start
+
+        start = time.time()
+        writer = util.BufferedWriter(_NullFile())
+        for warning in found:
+            writer.write(format_error(path, *warning) + '\n')
+        writer.flush()
+        times['output'] += time.time() - start
+        count += len(found)
+    return times, count
+
+def _time_lint(paths, conf_):
+    def lint_error(*args):
+        pass
+    start = time.time()
+    lint.lint_files(paths, lint_error, conf=conf_, printpaths=False)
+    return time.time() - start
+
+def _peak_memory(path, conf_):
+    """ Lints path in a child process and returns how far, in bytes, the
+        child's peak resident set size rose above its size at the fork.
+        Returns None if this cannot be measured on this platform.
+    """
+    if resource is None or not hasattr(os, 'fork'):
+        return None
+
+    readfd, writefd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(readfd)
+            start = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            _time_lint([path], conf_)
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            os.write(writefd, str(peak - start))
+        finally:
+            os._exit(0)
+
+    os.close(writefd)
+    output = os.fdopen(readfd).read()
+    os.waitpid(pid, 0)
+    if not output:
+        return None
+    # ru_maxrss is in bytes on Mac OS X and in kilobytes elsewhere.
+    if sys.platform == 'darwin':
+        return int(output)
+    return int(output) * 1024
+
+def run(scale=1, repeat=3, dir=None):
+    """ Generates the corpora and returns the best time of repeat runs for
+        each phase of each corpus.
+    """
+    conf_ = conf.Conf()
+    tempdir = tempfile.mkdtemp(dir=dir)
+    try:
+        results = {}
+        for name, paths in generate(tempdir, scale):
+            best = {}
+            for i in range(repeat):
+                times, count = _time_phases(paths, conf_)
+                times['lint_files'] = _time_lint(paths, conf_)
+                for phase, seconds in times.items():
+                    best[phase] = min(best.get(phase, seconds), seconds)
+            results[name] = {
+                'files': len(paths),
+                'bytes': sum(os.path.getsize(path) for path in paths),
+                'warnings': count,
+                'seconds': best,
+                'peak_memory': dict((os.path.basename(path),
+                                     _peak_memory(path, conf_))
+                                    for path in paths),
+            }
+    finally:
+        shutil.rmtree(tempdir)
+
+    return {
+        'linter_version': cache.linter_version(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'scale': scale,
+        'repeat': repeat,
+        'corpora': results,
+    }
+
+class TestBench(unittest.TestCase):
+    def testGenerate(self):
+        dirs = [tempfile.mkdtemp(), tempfile.mkdtemp()]
+        try:
+            contents = []
+            for dir in dirs:
+                corpora = generate(dir)
+                self.assertEquals([name for name, paths in corpora],
+                                  [name for name, generator in CORPORA])
+                contents.append([fs.readfile(path) for name, paths in corpora
+                                 for path in paths])
+            self.assertEquals(contents[0], contents[1])
+        finally:
+            for dir in dirs:
+                shutil.rmtree(dir)
+    def testPhases(self):
+        dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(dir, 'a.js')
+            f = open(path, 'w')
+            f.write('function f() { x = 1 }\n')
+            f.close()
+            times, count = _time_phases([path], conf.Conf())
+            self.assertEquals(sorted(times.keys()), sorted(_PHASES))
+            self.assertEquals(count, 1)
+        finally:
+            shutil.rmtree(dir)
+    def testPeakMemory(self):
+        dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(dir, 'a.js')
+            f = open(path, 'w')
+            f.write('var a = [%s];\n' % ','.join(['"%i"' % i for i in range(50000)]))
+            f.close()
+            peak = _peak_memory(path, conf.Conf())
+            if peak is not None:
+                self.assert_(peak > 0)
+        finally:
+            shutil.rmtree(dir)
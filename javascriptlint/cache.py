@@ -0,0 +1,333 @@
+# vim: ts=4 sw=4 expandtab
+""" A persistent, content-addressed store for lint results.
+
+Entries are pickled to one file per key. Writers create a temporary file in
+the cache directory and rename it into place, so concurrent writers (for
+example, several jsl processes sharing a cache) never expose a partial entry.
+Readers treat unreadable entries as misses.
+"""
+import collections
+import cPickle
+import errno
+import glob
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+DEFAULT_MAX_SIZE = 128 * 1024 * 1024
+
+_linter_version = []
+
+def linter_version():
+    """ Returns a digest of the linter's own code, so that results are not
+        shared between different versions of the linter.
+    """
+    if not _linter_version:
+        paths = sorted(glob.glob(os.path.join(os.path.dirname(__file__), '*.py')))
+        # Include the compiled parser.
+        lib = getattr(sys.modules.get('pyspidermonkey'), '__file__', None)
+        if lib:
+            paths.append(lib)
+        digest = hashlib.sha1()
+        for path in paths:
+            f = open(path, 'rb')
+            try:
+                digest.update(f.read())
+            finally:
+                f.close()
+        _linter_version.append(digest.hexdigest())
+    return _linter_version[0]
+
+def makekey(*parts):
+    """ Hashes the parts into a cache key. Unicode parts are hashed as UTF-8.
+    """
+    digest = hashlib.sha1()
+    for part in parts:
+        if isinstance(part, unicode):
+            part = part.encode('utf-8')
+        digest.update('%i:' % len(part))
+        digest.update(part)
+    return digest.hexdigest()
+
+class ResultCache:
+    def __init__(self, dir, max_size=DEFAULT_MAX_SIZE):
+        self._dir = dir
+        self._max_size = max_size
+
+    def get(self, key):
+        """ Returns the value stored for key, or None. """
+        path = self._getpath(key)
+        try:
+            f = open(path, 'rb')
+        except IOError:
+            return None
+        try:
+            try:
+                value = cPickle.load(f)
+            except Exception:
+                return None
+        finally:
+            f.close()
+
+        # Keep track of use so that trim() evicts the least recently used.
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return value
+
+    def put(self, key, value):
+        path = self._getpath(key)
+        dir = os.path.dirname(path)
+        try:
+            os.makedirs(dir)
+        except OSError, err:
+            if err.errno != errno.EEXIST:
+                raise
+
+        handle, temppath = tempfile.mkstemp(dir=dir, prefix='.tmp')
+        try:
+            f = os.fdopen(handle, 'wb')
+            try:
+                cPickle.dump(value, f, cPickle.HIGHEST_PROTOCOL)
+            finally:
+                f.close()
+            os.rename(temppath, path)
+        except:
+            _remove(temppath)
+            raise
+
+    def trim(self):
+        """ Evicts the least recently used entries until the cache is no larger
+            than its maximum size.
+        """
+        entries = []
+        total = 0
+        for path in glob.glob(os.path.join(self._dir, '??', '*')):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= self._max_size:
+                break
+            _remove(path)
+            total -= size
+
+    def _getpath(self, key):
+        return os.path.join(self._dir, key[:2], key[2:])
+
+class MemoryResultCache:
+    """ An in-memory store with the same interface as ResultCache, for a
+        long-lived process. Values are kept pickled so that callers cannot
+        modify them and so that their size is known.
+    """
+    def __init__(self, max_size=DEFAULT_MAX_SIZE):
+        self._entries = collections.OrderedDict()
+        self._size = 0
+        self._max_size = max_size
+
+    def get(self, key):
+        try:
+            data = self._entries.pop(key)
+        except KeyError:
+            return None
+        # Move the entry to the most recently used end.
+        self._entries[key] = data
+        return cPickle.loads(data)
+
+    def put(self, key, value):
+        data = cPickle.dumps(value, cPickle.HIGHEST_PROTOCOL)
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= len(old)
+        self._entries[key] = data
+        self._size += len(data)
+
+    def trim(self):
+        while self._size > self._max_size:
+            key, data = self._entries.popitem(last=False)
+            self._size -= len(data)
+
+class FileIndex:
+    """ Records what each file looked like when it was last linted, so that an
+        incremental run can replay the results for a file without reading it.
+        Each record holds the file's modification time and size, a digest of
+        its contents and the recorded value. The index is discarded when
+        version changes.
+    """
+    def __init__(self, path, version):
+        self._path = path
+        self._version = version
+        self._records = {}
+        self._updates = []
+        try:
+            f = open(path, 'rb')
+        except IOError:
+            return
+        try:
+            try:
+                version, records = cPickle.load(f)
+            except Exception:
+                return
+        finally:
+            f.close()
+        if version == self._version:
+            self._records = records
+
+    def stat(self, path):
+        """ Returns the modification time and size of path, or None. """
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_mtime, st.st_size
+
+    def get(self, path, variant, fileinfo):
+        """ Returns the value recorded for path if the file has the same
+            modification time and size, or None.
+        """
+        record = self._records.get(path)
+        if record and fileinfo and record[:2] == (fileinfo, variant):
+            return record[3]
+        return None
+
+    def getbydigest(self, path, variant, fileinfo, digest):
+        """ Returns the value recorded for path if its contents have the same
+            digest, or None. This catches files that were touched but not
+            changed.
+        """
+        record = self._records.get(path)
+        if record and record[1:3] == (variant, digest):
+            self.put(path, variant, fileinfo, digest, record[3])
+            return record[3]
+        return None
+
+    def put(self, path, variant, fileinfo, digest, value):
+        """ Records the value for path. fileinfo must be taken before the
+            file is read, so that a file that changes while it is being read
+            is linted again on the next run.
+        """
+        if fileinfo:
+            self.update(path, (fileinfo, variant, digest, value))
+
+    def update(self, path, record):
+        self._records[path] = record
+        self._updates.append((path, record))
+
+    def takeupdates(self):
+        """ Returns and forgets the records added since the last call. """
+        updates = self._updates
+        self._updates = []
+        return updates
+
+    def save(self):
+        dir = os.path.dirname(os.path.abspath(self._path))
+        handle, temppath = tempfile.mkstemp(dir=dir, prefix='.tmp')
+        try:
+            f = os.fdopen(handle, 'wb')
+            try:
+                cPickle.dump((self._version, self._records), f,
+                             cPickle.HIGHEST_PROTOCOL)
+            finally:
+                f.close()
+            os.rename(temppath, self._path)
+        except:
+            _remove(temppath)
+            raise
+        self._updates = []
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError, err:
+        if err.errno != errno.ENOENT:
+            raise
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+    def tearDown(self):
+        shutil.rmtree(self._dir)
+    def testGetPut(self):
+        cache = ResultCache(self._dir)
+        key = makekey(u'script', 'conf')
+        self.assertEquals(cache.get(key), None)
+        cache.put(key, ([('error', 1, 2, 'name', u'desc')], ['a']))
+        self.assertEquals(cache.get(key), ([('error', 1, 2, 'name', u'desc')], ['a']))
+        cache.put(key, 'replaced')
+        self.assertEquals(cache.get(key), 'replaced')
+        self.assertEquals(glob.glob(os.path.join(self._dir, '*', '.tmp*')), [])
+    def testMakeKey(self):
+        self.assertEquals(makekey(u'\xe9'), makekey(u'\xe9'.encode('utf-8')))
+        self.assertNotEquals(makekey('ab', 'c'), makekey('a', 'bc'))
+    def testCorrupt(self):
+        cache = ResultCache(self._dir)
+        key = makekey('corrupt')
+        cache.put(key, 'value')
+        f = open(cache._getpath(key), 'wb')
+        f.write('not a pickle')
+        f.close()
+        self.assertEquals(cache.get(key), None)
+    def testMemory(self):
+        cache = MemoryResultCache()
+        self.assertEquals(cache.get('a'), None)
+        cache.put('a', ['value'])
+        cache.get('a').append('modified')
+        self.assertEquals(cache.get('a'), ['value'])
+        cache.put('b', ['value'])
+        cache.get('a')
+        cache._max_size = cache._size - 1
+        cache.trim()
+        self.assertEquals(cache.get('a'), ['value'])
+        self.assertEquals(cache.get('b'), None)
+    def testTrim(self):
+        cache = ResultCache(self._dir, max_size=0)
+        keys = [makekey(str(i)) for i in range(3)]
+        for i, key in enumerate(keys):
+            cache.put(key, 'x' * 100)
+            os.utime(cache._getpath(key), (i, i))
+        size = os.path.getsize(cache._getpath(keys[0]))
+        cache._max_size = size * 2
+        cache.trim()
+        self.assertEquals(cache.get(keys[0]), None)
+        self.assertEquals(cache.get(keys[1]), 'x' * 100)
+        self.assertEquals(cache.get(keys[2]), 'x' * 100)
+    def testFileIndex(self):
+        path = os.path.join(self._dir, 'index')
+        script = os.path.join(self._dir, 'a.js')
+        f = open(script, 'w')
+        f.write('var a;')
+        f.close()
+
+        index = FileIndex(path, 'v1')
+        fileinfo = index.stat(script)
+        self.assertEquals(index.get(script, 'js', fileinfo), None)
+        index.put(script, 'js', fileinfo, makekey('var a;'), 'value')
+        index.save()
+
+        index = FileIndex(path, 'v1')
+        self.assertEquals(index.get(script, 'js', index.stat(script)), 'value')
+        self.assertEquals(index.get(script, 'html', index.stat(script)), None)
+        self.assertEquals(index.takeupdates(), [])
+
+        # Touching the file requires comparing the contents.
+        os.utime(script, (0, 0))
+        fileinfo = index.stat(script)
+        self.assertEquals(index.get(script, 'js', fileinfo), None)
+        self.assertEquals(index.getbydigest(script, 'js', fileinfo,
+                                            makekey('var b;')), None)
+        self.assertEquals(index.getbydigest(script, 'js', fileinfo,
+                                            makekey('var a;')), 'value')
+        self.assertEquals(index.get(script, 'js', fileinfo), 'value')
+        self.assertEquals(len(index.takeupdates()), 1)
+
+        self.assertEquals(FileIndex(path, 'v2').get(script, 'js', fileinfo),
+                          None)
@@ -240,6 +240,18 @@ class Conf:
             args['dir'] = dir
         setting.load(**args)
 
+    def fingerprint(self):
+        """ Returns a string that identifies the settings that can affect lint
+            results, for use in cache keys.
+        """
+        settings = []
+        for name in sorted(self._settings.keys()):
+            # The list of files does not affect the results for a file.
+            if name in ('process', 'recurse'):
+                continue
+            settings.append('%s=%r' % (name, self._settings[name].value))
+        return '\n'.join(settings)
+
     def __getitem__(self, name):
         if name == 'paths':
             name = 'process'
@@ -257,4 +269,17 @@ class TestConf(unittest.TestCase):
         for setting in settings:
             self.assertEquals(fromcode[setting], fromstr[setting],
                               'Mismatched defaults for %s' % setting)
+    def testFingerprint(self):
+        default = Conf().fingerprint()
+        conf = Conf()
+        conf.loadline('+process *.js')
+        self.assertEquals(conf.fingerprint(), default)
+        conf.loadline('-missing_semicolon')
+        self.assertNotEquals(conf.fingerprint(), default)
+        conf = Conf()
+        conf.loadline('+define window')
+        self.assertNotEquals(conf.fingerprint(), default)
+        conf = Conf()
+        conf.loadline('+default-version text/javascript;version=1.7')
+        self.assertNotEquals(conf.fingerprint(), default)
 
@@ -0,0 +1,337 @@
+# vim: ts=4 sw=4 expandtab
+""" A long-lived lint server and a thin client for it.
+
+The server listens on a Unix domain socket and runs one request at a time.
+The socket must be in a directory that only its owner can write to, and the
+client only connects to a socket that its own user owns.
+The client sends its arguments and working directory and streams back the
+output and the exit code. Every message is a frame consisting of a one-byte
+type, a four-byte length and the payload:
+    'r': the request, a JSON object with "argv", "cwd" and "encoding"
+    'o': output written to stdout
+    'e': output written to stderr
+    'x': the exit code as a decimal string; this is always the last frame
+
+This module only depends on the standard library so that the client does not
+pay for importing the linter.
+"""
+import errno
+import json
+import os
+import signal
+import socket
+import StringIO
+import stat
+import struct
+import sys
+import tempfile
+import traceback
+import unittest
+
+_HEADER = struct.Struct('>cI')
+
+class _Terminate(BaseException):
+    pass
+
+class SocketError(Exception):
+    pass
+
+def _getuid():
+    return getattr(os, 'getuid', lambda: 0)()
+
+def default_socket_path():
+    """ Returns a path in $XDG_RUNTIME_DIR if it is set, or else in a
+        jsl-<uid> directory in the temp directory, which serve() creates.
+    """
+    runtimedir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtimedir:
+        return os.path.join(runtimedir, 'jsl.sock')
+    return os.path.join(tempfile.gettempdir(), 'jsl-%i' % _getuid(),
+                        'jsl.sock')
+
+def _makesocketdir(dir):
+    """ Creates dir if it does not exist, and raises SocketError unless it is
+        a directory that belongs to this user and that no one else can write
+        to. Otherwise another user could replace the socket.
+    """
+    try:
+        os.mkdir(dir, 0700)
+    except OSError, err:
+        if err.errno != errno.EEXIST:
+            raise
+    info = os.stat(dir)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != _getuid() or \
+       info.st_mode & 022:
+        raise SocketError, '%s must be a directory that belongs to this user ' \
+                           'and that no one else can write to' % dir
+
+def _fsencoding():
+    return sys.getfilesystemencoding() or 'utf-8'
+
+def _send(sock, type_, payload):
+    sock.sendall(_HEADER.pack(type_, len(payload)) + payload)
+
+def _recvall(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise EOFError('connection closed')
+        chunks.append(chunk)
+        size -= len(chunk)
+    return ''.join(chunks)
+
+def _recv(sock):
+    type_, size = _HEADER.unpack(_recvall(sock, _HEADER.size))
+    return type_, _recvall(sock, size)
+
+class _FrameWriter:
+    """ A file-like object that forwards writes to the client. Unicode is
+        encoded the same way the client's own stream would encode it.
+    """
+    def __init__(self, sock, type_, encoding):
+        self._sock = sock
+        self._type = type_
+        self.encoding = encoding
+        self.softspace = 0
+    def write(self, s):
+        if isinstance(s, unicode):
+            s = s.encode(self.encoding or sys.getdefaultencoding())
+        if s:
+            _send(self._sock, self._type, s)
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+    def flush(self):
+        pass
+    def isatty(self):
+        return False
+
+def serve(path, handler):
+    """ Serves requests on the Unix domain socket at path until the process
+        is interrupted or terminated. For each request, calls:
+            handler(argv, cwd)
+        with sys.stdout and sys.stderr redirected to the client, and sends the
+        return value back as the exit code. Raises SocketError if the
+        socket's directory is not private to this user.
+    """
+    def terminate(signum, frame):
+        raise _Terminate()
+
+    _makesocketdir(os.path.dirname(os.path.abspath(path)))
+    try:
+        os.remove(path)
+    except OSError, err:
+        if err.errno != errno.ENOENT:
+            raise
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    oldmask = os.umask(077)
+    try:
+        server.bind(path)
+    finally:
+        os.umask(oldmask)
+    server.listen(16)
+    signal.signal(signal.SIGTERM, terminate)
+    try:
+        try:
+            while True:
+                conn, addr = server.accept()
+                try:
+                    _serve_request(conn, handler)
+                finally:
+                    conn.close()
+        except (_Terminate, KeyboardInterrupt):
+            pass
+    finally:
+        server.close()
+        os.remove(path)
+
+def _serve_request(conn, handler):
+    try:
+        type_, payload = _recv(conn)
+    except (EOFError, socket.error):
+        return
+    if type_ != 'r':
+        return
+    request = json.loads(payload)
+    fsencoding = _fsencoding()
+    argv = [arg.encode(fsencoding) for arg in request['argv']]
+    requestcwd = request['cwd'].encode(fsencoding)
+
+    stdout, stderr = sys.stdout, sys.stderr
+    cwd = os.getcwd()
+    sys.stdout = _FrameWriter(conn, 'o', request.get('encoding'))
+    sys.stderr = _FrameWriter(conn, 'e', request.get('encoding'))
+    try:
+        try:
+            os.chdir(requestcwd)
+            code = handler(argv, requestcwd)
+        except SystemExit, err:
+            code = err.code
+        except socket.error:
+            # The client went away.
+            return
+        except Exception:
+            traceback.print_exc()
+            code = 1
+    finally:
+        sys.stdout, sys.stderr = stdout, stderr
+        os.chdir(cwd)
+
+    # Mirror the interpreter's handling of sys.exit() arguments.
+    if code is None:
+        code = 0
+    elif not isinstance(code, int):
+        try:
+            _send(conn, 'e', '%s\n' % code)
+        except socket.error:
+            return
+        code = 1
+    try:
+        _send(conn, 'x', str(code))
+    except socket.error:
+        pass
+
+def client(path, argv):
+    """ Runs argv on the server at path, copies its output to this process's
+        stdout and stderr, and returns its exit code. The socket must belong
+        to this user, so that another user cannot receive the request.
+    """
+    try:
+        info = os.stat(path)
+    except OSError, err:
+        sys.stderr.write('jsl: cannot connect to server at %s: %s\n' %
+                         (path, err))
+        return 2
+    if info.st_uid != _getuid():
+        sys.stderr.write('jsl: cannot connect to server at %s: the socket '
+                         'belongs to another user\n' % path)
+        return 2
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except socket.error, err:
+        sys.stderr.write('jsl: cannot connect to server at %s: %s\n' %
+                         (path, err))
+        return 2
+
+    try:
+        _send(sock, 'r', json.dumps({
+            'argv': argv,
+            'cwd': os.getcwd(),
+            'encoding': getattr(sys.stdout, 'encoding', None),
+        }, encoding=_fsencoding()))
+        while True:
+            try:
+                type_, payload = _recv(sock)
+            except EOFError:
+                sys.stderr.write('jsl: lost connection to server\n')
+                return 2
+            if type_ == 'o':
+                sys.stdout.write(payload)
+            elif type_ == 'e':
+                sys.stderr.write(payload)
+            elif type_ == 'x':
+                sys.stdout.flush()
+                return int(payload)
+    finally:
+        sock.close()
+
+def client_main(argv):
+    """ Handles the --client command line. The --client and --socket options
+        are consumed here; all other arguments are passed to the server.
+    """
+    path = default_socket_path()
+    args = []
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg == '--client':
+            pass
+        elif arg == '--socket' and i + 1 < len(argv):
+            i += 1
+            path = argv[i]
+        elif arg.startswith('--socket='):
+            path = arg[len('--socket='):]
+        else:
+            args.append(arg)
+        i += 1
+    return client(path, args)
+
+class TestDaemon(unittest.TestCase):
+    def _request(self, argv, handler):
+        client, server = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            _send(client, 'r', json.dumps({
+                'argv': argv,
+                'cwd': os.getcwd(),
+                'encoding': 'utf-8',
+            }))
+            _serve_request(server, handler)
+            server.close()
+            frames = []
+            while True:
+                try:
+                    frames.append(_recv(client))
+                except EOFError:
+                    return frames
+        finally:
+            client.close()
+    def testRequest(self):
+        def handler(argv, cwd):
+            self.assertEquals(argv, ['--nologo', 'a.js'])
+            self.assertEquals(cwd, os.getcwd())
+            print 'output', u'\xe9'
+            print >>sys.stderr, 'error'
+            return 3
+        self.assertEquals(self._request(['--nologo', 'a.js'], handler), [
+            ('o', 'output'), ('o', ' '), ('o', '\xc3\xa9'), ('o', '\n'),
+            ('e', 'error'), ('e', '\n'),
+            ('x', '3'),
+        ])
+    def testExit(self):
+        def handler(argv, cwd):
+            sys.exit(argv[0])
+        self.assertEquals(self._request(['message'], handler), [
+            ('e', 'message\n'), ('x', '1'),
+        ])
+        def handler(argv, cwd):
+            sys.exit()
+        self.assertEquals(self._request([], handler), [('x', '0')])
+    def testSocketDir(self):
+        dir = tempfile.mkdtemp()
+        try:
+            socketdir = os.path.join(dir, 'jsl')
+            _makesocketdir(socketdir)
+            self.assertEquals(stat.S_IMODE(os.stat(socketdir).st_mode), 0700)
+            _makesocketdir(socketdir)
+            os.chmod(socketdir, 0777)
+            self.assertRaises(SocketError, _makesocketdir, socketdir)
+        finally:
+            os.chmod(socketdir, 0700)
+            os.rmdir(socketdir)
+            os.rmdir(dir)
+    def testClientOwner(self):
+        global _getuid
+        dir = tempfile.mkdtemp()
+        path = os.path.join(dir, 'jsl.sock')
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stderr = sys.stderr
+        getuid = _getuid
+        try:
+            server.bind(path)
+            server.listen(1)
+            # Another user's socket is not used.
+            sys.stderr = StringIO.StringIO()
+            _getuid = lambda: getuid() + 1
+            self.assertEquals(client(path, []), 2)
+            self.assert_('belongs to another user' in sys.stderr.getvalue())
+            self.assertEquals(client(os.path.join(dir, 'missing'), []), 2)
+        finally:
+            _getuid = getuid
+            sys.stderr = stderr
+            server.close()
+            os.remove(path)
+            os.rmdir(dir)
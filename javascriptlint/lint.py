@@ -1,12 +1,21 @@
 #!/usr/bin/env python
 # vim: ts=4 sw=4 expandtab
+import bisect
+import multiprocessing
+import multiprocessing.pool
 import os.path
 import re
+import shutil
+import tempfile
+import threading
+import time
 
+import cache
 import conf
 import fs
 import htmlparse
 import jsparse
+import timings
 import visitation
 import warnings
 import unittest
@@ -32,6 +41,14 @@ _globals = frozenset([
     'arguments', 'undefined'
 ])
 
+_content_type_re = re.compile('content-type', re.IGNORECASE)
+
+# The line breaks that unicode.splitlines() recognizes, like NodePositions.
+_linebreaks = re.compile(u'\r\n|[\n\r\x0b\x0c\x1c-\x1e\x85\u2028\u2029]')
+
+# Worker threads run the linter's own code on top of the parser's stack.
+_THREAD_STACK_SIZE = jsparse.PARSER_STACK_SIZE + 2 * 1024 * 1024
+
 def _find_function(node):
     while node and node.kind != tok.FUNCTION:
         node = node.parent
@@ -78,6 +95,22 @@ def _parse_control_comment(comment):
     parms = control_comment[len(keyword):].strip()
     return (comment, keyword, parms)
 
+class _SymbolTable:
+    """ Holds the bindings declared in a tree of scopes. Each binding is
+        assigned a slot, which indexes the parallel lists.
+    """
+    def __init__(self):
+        self.scopes = []
+        self.names = []
+        self.nodes = []
+        self.types = []
+    def add(self, scope, name, node, type_):
+        self.scopes.append(scope)
+        self.names.append(name)
+        self.nodes.append(node)
+        self.types.append(type_)
+        return len(self.nodes) - 1
+
 class Scope:
     """ Outer-level scopes will never be associated with a node.
         Inner-level scopes will always be associated with a node.
@@ -89,58 +122,131 @@ class Scope:
         self._references = []
         self._unused = []
         self._node = None
+        self._symbols = _SymbolTable()
+        # The inner scopes of the whole tree, and the outer scope's index of
+        # them (see find_scope).
+        self._inner_scopes = []
+        self._index = None
     def add_scope(self, node):
         assert not node is None
-        self._kids.append(Scope())
-        self._kids[-1]._parent = self
-        self._kids[-1]._node = node
-        return self._kids[-1]
+        scope = Scope()
+        scope._parent = self
+        scope._node = node
+        scope._symbols = self._symbols
+        scope._inner_scopes = self._inner_scopes
+        scope._inner_scopes.append(scope)
+        self._kids.append(scope)
+        return scope
     def add_declaration(self, name, node, type_):
         assert type_ in ('arg', 'function', 'var'), \
             'Unrecognized identifier type: %s' % type_
-        self._identifiers[name] = {
-            'node': node,
-            'type': type_
-        }
+        slot = self._identifiers.get(name)
+        if slot is None:
+            self._identifiers[name] = self._symbols.add(self, name, node, type_)
+        else:
+            self._symbols.nodes[slot] = node
+            self._symbols.types[slot] = type_
     def add_reference(self, name, node):
         self._references.append((name, node))
     def set_unused(self, name, node):
         self._unused.append((name, node))
     def get_identifier(self, name):
-        if name in self._identifiers:
-            return self._identifiers[name]['node']
-        else:
+        slot = self._identifiers.get(name)
+        if slot is None:
             return None
+        return self._symbols.nodes[slot]
     def get_identifier_type(self, name):
-        if name in self._identifiers:
-            return self._identifiers[name]['type']
-        else:
+        slot = self._identifiers.get(name)
+        if slot is None:
             return None
+        return self._symbols.types[slot]
     def get_identifiers(self):
         "returns a list of names"
         return self._identifiers.keys()
     def resolve_identifier(self, name):
-        if name in self._identifiers:
-            return self, self._identifiers[name]['node']
-        if self._parent:
-            return self._parent.resolve_identifier(name)
+        scope = self
+        while scope:
+            slot = scope._identifiers.get(name)
+            if slot is not None:
+                return scope, scope._symbols.nodes[slot]
+            scope = scope._parent
         return None
     def get_identifier_warnings(self):
         """ Returns a tuple of unreferenced and undeclared, where each is a list
             of (scope, name, node) tuples.
         """
-        unreferenced = {}
+        symbols = self._symbols
+        referenced = [False] * len(symbols.nodes)
+        declared = []
         undeclared = []
         obstructive = []
-        self._find_warnings(unreferenced, undeclared, obstructive, False)
-
-        # Convert "unreferenced" from a dictionary of:
-        #   { (scope, name): node }
-        # to a list of:
-        #   [ (scope, name, node) ]
-        # sorted by node position.
-        unreferenced = [(key[0], key[1], node) for key, node
-                        in unreferenced.items()]
+
+        # Map each name to the stack of slots that are visible from the scope
+        # being visited, innermost last, starting with this scope's parents.
+        visible = {}
+        parents = []
+        scope = self._parent
+        while scope:
+            parents.append(scope)
+            scope = scope._parent
+        for scope in reversed(parents):
+            for name, slot in scope._identifiers.items():
+                visible.setdefault(name, []).append(slot)
+
+        # Visit the scopes in order, using an explicit stack since they may be
+        # deeply nested. A scope's bindings are visible until it is left.
+        scopes = [(self, False, False)]
+        while scopes:
+            scope, is_in_with_scope, leaving = scopes.pop()
+            if leaving:
+                for name in scope._identifiers:
+                    visible[name].pop()
+                continue
+
+            if scope._node and scope._node.kind == tok.WITH:
+                is_in_with_scope = True
+
+            # Check for variables that hide an identifier in a parent scope.
+            for name, slot in scope._identifiers.items():
+                slots = visible.setdefault(name, [])
+                if slots:
+                    obstructive.append((scope, name, symbols.nodes[slot]))
+                slots.append(slot)
+                declared.append(slot)
+
+            # Mark all declared variables as referenced; add all undeclared
+            # variables to the "undeclared" list.
+            for name, node in scope._references:
+                slots = visible.get(name)
+                if slots:
+                    # Make sure this isn't an assignment.
+                    if node.parent.kind in (tok.ASSIGN, tok.INC, tok.DEC) and \
+                       node.node_index == 0 and \
+                       node.parent.parent.kind == tok.SEMI:
+                        continue
+                    referenced[slots[-1]] = True
+                else:
+                    # with statements cannot have undeclared identifiers.
+                    if not is_in_with_scope:
+                        undeclared.append((scope, name, node))
+
+            # Mark all variables that have been set as "unused".
+            for name, node in scope._unused:
+                slots = visible.get(name)
+                if slots:
+                    referenced[slots[-1]] = True
+                else:
+                    undeclared.append((scope, name, node))
+
+            scopes.append((scope, is_in_with_scope, True))
+            scopes.extend((child, is_in_with_scope, False)
+                          for child in reversed(scope._kids))
+
+        # Variables need to be reported by slot instead of by node, because
+        # function parameters share the same node.
+        unreferenced = [(symbols.scopes[slot], symbols.names[slot],
+                         symbols.nodes[slot])
+                        for slot in declared if not referenced[slot]]
         unreferenced.sort(key=lambda x: x[2].start_pos())
 
         return {
@@ -148,105 +254,112 @@ class Scope:
             'undeclared': undeclared,
             'obstructive': obstructive,
         }
-    def _find_warnings(self, unreferenced, undeclared, obstructive,
-                       is_in_with_scope):
-        """ unreferenced is a dictionary, such that:
-                (scope, name): node
-            }
-            undeclared is a list, such that: [
-                (scope, name, node)
-            ]
-            obstructive is a list, such that: [
-                (scope, name, node)
-            ]
-        """
-        if self._node and self._node.kind == tok.WITH:
-            is_in_with_scope = True
-
-        # Add all identifiers as unreferenced. Children scopes will remove
-        # them if they are referenced.  Variables need to be keyed by name
-        # instead of node, because function parameters share the same node.
-        for name, info in self._identifiers.items():
-            unreferenced[(self, name)] = info['node']
-
-        # Check for variables that hide an identifier in a parent scope.
-        if self._parent:
-            for name, info in self._identifiers.items():
-                if self._parent.resolve_identifier(name):
-                    obstructive.append((self, name, info['node']))
-
-        # Remove all declared variables from the "unreferenced" set; add all
-        # undeclared variables to the "undeclared" list.
-        for name, node in self._references:
-            resolved = self.resolve_identifier(name)
-            if resolved:
-                # Make sure this isn't an assignment.
-                if node.parent.kind in (tok.ASSIGN, tok.INC, tok.DEC) and \
-                   node.node_index == 0 and \
-                   node.parent.parent.kind == tok.SEMI:
-                    continue
-                unreferenced.pop((resolved[0], name), None)
-            else:
-                # with statements cannot have undeclared identifiers.
-                if not is_in_with_scope:
-                    undeclared.append((self, name, node))
-
-        # Remove all variables that have been set as "unused".
-        for name, node in self._unused:
-            resolved = self.resolve_identifier(name)
-            if resolved:
-                unreferenced.pop((resolved[0], name), None)
-            else:
-                undeclared.append((self, name, node))
-
-        for child in self._kids:
-            child._find_warnings(unreferenced, undeclared, obstructive,
-                                 is_in_with_scope)
     def find_scope(self, node):
-        for kid in self._kids:
-            scope = kid.find_scope(node)
+        """ Returns the innermost scope that contains the node. This must be
+            called on the outer scope.
+        """
+        assert not self._parent
+        if not self._index or self._index[0] != len(self._inner_scopes):
+            self._index = (len(self._inner_scopes),) + self._build_index()
+        count, keys, scopes = self._index
+
+        i = bisect.bisect_right(keys, (node.start_pos(), 0)) - 1
+        scope = i >= 0 and scopes[i] or self
+
+        # A node that starts in a scope also ends in it, unless it spans the
+        # end of the scope.
+        while scope._parent and node.end_pos() > scope._node.end_pos():
+            scope = scope._parent
+        return scope
+    def _build_index(self):
+        """ Returns a sorted list of keys and a list of the innermost scope
+            from each key until the next one. Keys are (pos, 0) for the start
+            of a scope and (pos, 1) for the position just past its end, since
+            scopes include both ends.
+        """
+        # Sort outer scopes before the inner scopes that start with them.
+        inner_scopes = list(self._inner_scopes)
+        inner_scopes.sort(key=lambda scope: scope._node.end_pos(), reverse=True)
+        inner_scopes.sort(key=lambda scope: scope._node.start_pos())
+
+        keys = []
+        scopes = []
+        open_scopes = []
+        for scope in inner_scopes + [None]:
+            # Close the scopes that end before this one starts.
+            while open_scopes and (scope is None or
+                  open_scopes[-1]._node.end_pos() < scope._node.start_pos()):
+                keys.append((open_scopes.pop()._node.end_pos(), 1))
+                scopes.append(open_scopes and open_scopes[-1] or self)
             if scope:
-                return scope
-
-        # Always add it to the outer scope.
-        if not self._parent:
-            assert not self._node
-            return self
-
-        # Conditionally add it to an inner scope.
-        assert self._node
-        if (node.start_pos() >= self._node.start_pos() and \
-            node.end_pos() <= self._node.end_pos()):
-            return self
+                keys.append((scope._node.start_pos(), 0))
+                scopes.append(scope)
+                open_scopes.append(scope)
+        return keys, scopes
 
 class _Script:
+    """ The state of a file in the lint cache. While the file is being linted,
+        this holds its scope tree. Once it is complete, only the names that
+        importers need are kept.
+    """
     def __init__(self):
         self._imports = set()
+        self._cached_globals = frozenset()
+        self._complete = False
+        self._importedglobals = None
         self.scope = Scope()
     def importscript(self, script):
         self._imports.add(script)
+        self._importedglobals = None
+    def setcomplete(self):
+        """ Marks the script as linted and releases its scope tree, along with
+            the parse nodes that it references.
+        """
+        if self.scope:
+            self._cached_globals = self.getglobals()
+            self.scope = None
+        self._importedglobals = None
+        self._complete = True
+    def getglobals(self):
+        """ Returns the names declared in this script's outer scope. """
+        if not self.scope:
+            return self._cached_globals
+        return self._cached_globals.union(self.scope.get_identifiers())
+    def loadglobals(self, names):
+        """ Declares names loaded from the result cache. """
+        self._cached_globals = frozenset(names)
     def hasglobal(self, name):
-        return not self._findglobal(name, set()) is None
-    def _findglobal(self, name, searched):
-        """ searched is a set of all searched scripts """
-        # Avoid recursion.
-        if self in searched:
-            return
-
-        # Check this scope.
-        if self.scope.get_identifier(name):
-            return self
-        searched.add(self)
-
-        # Search imported scopes.
-        for script in self._imports:
-            global_ = script._findglobal(name, searched)
-            if global_:
-                return global_
+        # This script's own declarations may still be changing.
+        if name in self._cached_globals or \
+           (self.scope and self.scope.get_identifier(name)):
+            return True
+        if self._importedglobals is not None:
+            return name in self._importedglobals
+        names, complete = self._collectglobals()
+        if complete:
+            self._importedglobals = names
+        return name in names
+    def _collectglobals(self):
+        """ Returns the names declared by the scripts that this script imports,
+            directly or indirectly, and whether all of them are complete.
+        """
+        names = set()
+        complete = True
+        searched = set([self])
+        stack = list(self._imports)
+        while stack:
+            script = stack.pop()
+            if script in searched:
+                continue
+            searched.add(script)
+            complete = complete and script._complete
+            names.update(script.getglobals())
+            stack.extend(script._imports)
+        return frozenset(names), complete
 
 def _findhtmlscripts(contents, default_version):
+    scripts = []
     starttag = None
-    nodepos = jsparse.NodePositions(contents)
     for tag in htmlparse.findscripttags(contents):
         if tag['type'] == 'start':
             # Ignore nested start tags.
@@ -255,56 +368,185 @@ def _findhtmlscripts(contents, default_version):
                 starttag = dict(tag, jsversion=jsversion)
                 src = tag['attr'].get('src')
                 if src:
-                    yield {
+                    scripts.append({
                         'type': 'external',
                         'jsversion': jsversion,
                         'src': src,
-                    }
+                    })
         elif tag['type'] == 'end':
             if not starttag:
                 continue
 
-            # htmlparse returns 1-based line numbers. Calculate the
-            # position of the script's contents.
-            tagpos = jsparse.NodePos(starttag['lineno']-1, starttag['offset'])
-            tagoffset = nodepos.to_offset(tagpos)
-            startoffset = tagoffset + starttag['len']
-            startpos = nodepos.from_offset(startoffset)
-            endpos = jsparse.NodePos(tag['lineno']-1, tag['offset'])
-            endoffset = nodepos.to_offset(endpos)
-            script = contents[startoffset:endoffset]
-
-            if not jsparse.isvalidversion(starttag['jsversion']) or \
-               jsparse.is_compilable_unit(script, starttag['jsversion']):
-                if script.strip():
-                    yield {
-                        'type': 'inline',
-                        'jsversion': starttag['jsversion'],
-                        'pos': startpos,
-                        'contents': script,
-                    }
-                starttag = None
+            startoffset = starttag['end']
+
+            # The script continues past an end tag that leaves it incomplete,
+            # such as one in a string. Once the first end tag turns out to be
+            # part of the script, it is scanned so that the end tags in
+            # strings, comments and regular expressions can be skipped
+            # without parsing the script again.
+            if jsparse.isvalidversion(starttag['jsversion']):
+                scanner = starttag.get('scanner')
+                if scanner and not scanner.canend(tag['offset']):
+                    continue
+                script = contents[startoffset:tag['offset']]
+                if not jsparse.is_compilable_unit(script, starttag['jsversion']):
+                    if not scanner:
+                        starttag['scanner'] = htmlparse.ScriptScanner(contents,
+                                                                      startoffset)
+                    continue
+            else:
+                script = contents[startoffset:tag['offset']]
+
+            if script.strip():
+                scripts.append({
+                    'type': 'inline',
+                    'jsversion': starttag['jsversion'],
+                    'offset': startoffset,
+                    'contents': script,
+                })
+            starttag = None
         else:
             assert False, 'Invalid internal tag type %s' % tag['type']
 
-def lint_files(paths, lint_error, conf=conf.Conf(), printpaths=True):
+    # Count the lines before each script instead of splitting the whole page.
+    line = 0
+    linestart = 0
+    offset = 0
+    for script in scripts:
+        if script['type'] != 'inline':
+            continue
+        for linebreak in _linebreaks.finditer(contents, offset,
+                                              script['offset']):
+            line += 1
+            linestart = linebreak.end()
+        offset = script.pop('offset')
+        script['pos'] = jsparse.NodePos(line, offset - linestart)
+    return scripts
+
+def lint_files(paths, lint_error, conf=conf.Conf(), printpaths=True, jobs=1,
+               result_cache=None, file_index=None, timings=None, threads=1):
+    """ Lints each of the paths, calling lint_error for each warning. If jobs
+        is greater than one, the files are linted by a pool of that many
+        processes and the results are replayed in the same order as a serial
+        run. If threads is greater than one, a pool of that many threads is
+        used instead; they share the caches and only run in parallel while
+        parsing. If result_cache is a cache.ResultCache, the results for files
+        that have not changed are replayed from the cache. If file_index is a
+        cache.FileIndex, files whose modification time and size match the
+        index are not read at all; it is saved when done. If timings is a
+        timings.Timings, the time spent in each phase and rule is added to it.
+        Timings cannot be combined with threads, because a thread's time would
+        include the time spent waiting for the other threads.
+    """
+    def printpath(normpath):
+        if printpaths:
+            print normpath
+
+    if jobs > 1 and threads > 1:
+        raise ValueError, 'jobs and threads cannot be combined'
+    if threads > 1 and timings:
+        raise ValueError, 'timings and threads cannot be combined'
+
+    if threads > 1:
+        # The thread stack size is read when each thread starts.
+        stack_size = threading.stack_size(_THREAD_STACK_SIZE)
+        try:
+            pool = multiprocessing.pool.ThreadPool(threads, _init_thread,
+                (conf, result_cache, file_index))
+        finally:
+            threading.stack_size(stack_size)
+        _lint_files_parallel(pool, paths, lint_error, printpath, file_index,
+                             None)
+    elif jobs > 1:
+        pool = multiprocessing.Pool(jobs, _init_worker,
+                                    (conf, result_cache, file_index, timings))
+        _lint_files_parallel(pool, paths, lint_error, printpath, file_index,
+                             timings)
+    else:
+        _lint_paths(paths, {}, lint_error, conf, printpath, result_cache,
+                    file_index, timings)
+    if result_cache:
+        result_cache.trim()
+    if file_index:
+        file_index.save()
+
+def _lint_paths(paths, lint_cache, lint_error, conf, printpath, result_cache,
+                file_index=None, timings=None):
     def lint_file(path, kind, jsversion):
+        if not timings:
+            return _lint_file(path, kind, jsversion)
+        # Time not spent in a more specific phase is charged to reading.
+        timings.push('read', fs.normpath(path))
+        try:
+            return _lint_file(path, kind, jsversion)
+        finally:
+            timings.pop()
+    def timed_lint_error(*args):
+        timings.push('reporting')
+        try:
+            return report_error(*args)
+        finally:
+            timings.pop()
+    def _lint_file(path, kind, jsversion):
         def import_script(import_path, jsversion):
+            if events is not None:
+                events.append(('import', import_path, jsversion))
             # The user can specify paths using backslashes (such as when
             # linting Windows scripts on a posix environment.
             import_path = import_path.replace('\\', os.sep)
             import_path = os.path.join(os.path.dirname(path), import_path)
             return lint_file(import_path, 'js', jsversion)
         def _lint_error(*args):
+            if events is not None:
+                events.append(('error',) + args)
             return lint_error(normpath, *args)
+        def _lint_undeclared(name, *args):
+            # Whether the identifier is undeclared depends on the imported
+            # scripts, so this is resolved again when replaying from cache.
+            if events is not None:
+                events.append(('undeclared', name) + args)
+            if not script_cache.hasglobal(name):
+                return lint_error(normpath, *args)
+
+        def replay(entry):
+            # Imported files are looked up again, so changes to their globals
+            # are reflected in this file's undeclared identifiers.
+            _replay_events(entry[0], script_cache, import_script,
+                           lambda *args: lint_error(normpath, *args))
+            script_cache.loadglobals(entry[1])
+            script_cache.setcomplete()
+            return script_cache
 
         normpath = fs.normpath(path)
         if normpath in lint_cache:
             return lint_cache[normpath]
-        if printpaths:
-            print normpath
+        printpath(normpath)
+        script_cache = lint_cache[normpath] = _Script()
+
+        events = None
+        variant = (kind, repr(jsversion))
+        if file_index:
+            fileinfo = file_index.stat(path)
+            entry = file_index.get(normpath, variant, fileinfo)
+            if entry:
+                return replay(entry)
         contents = fs.readfile(path)
-        lint_cache[normpath] = _Script()
+
+        if file_index:
+            digest = cache.makekey(contents)
+            entry = file_index.getbydigest(normpath, variant, fileinfo, digest)
+            if entry:
+                return replay(entry)
+            events = []
+        if result_cache:
+            key = cache.makekey(cache.linter_version(), conf.fingerprint(),
+                                kind, repr(jsversion), contents)
+            entry = result_cache.get(key)
+            if entry:
+                if file_index:
+                    file_index.put(normpath, variant, fileinfo, digest, entry)
+                return replay(entry)
+            events = []
 
         script_parts = []
         if kind == 'js':
@@ -318,7 +560,7 @@ def lint_files(paths, lint_error, conf=conf.Conf(), printpaths=True):
 
                 if script['type'] == 'external':
                     other = import_script(script['src'], script['jsversion'])
-                    lint_cache[normpath].importscript(other)
+                    script_cache.importscript(other)
                 elif script['type'] == 'inline':
                     script_parts.append((script['pos'], script['jsversion'],
                                          script['contents']))
@@ -328,10 +570,21 @@ def lint_files(paths, lint_error, conf=conf.Conf(), printpaths=True):
         else:
             assert False, 'Unsupported file kind: %s' % kind
 
-        _lint_script_parts(script_parts, lint_cache[normpath], _lint_error, conf, import_script)
-        return lint_cache[normpath]
+        _lint_script_parts(script_parts, script_cache, _lint_error, conf,
+                           import_script, _lint_undeclared, timings)
+        if events is not None:
+            entry = (events, list(script_cache.getglobals()))
+            if result_cache:
+                result_cache.put(key, entry)
+            if file_index:
+                file_index.put(normpath, variant, fileinfo, digest, entry)
+        script_cache.setcomplete()
+        return script_cache
+
+    if timings:
+        report_error = lint_error
+        lint_error = timed_lint_error
 
-    lint_cache = {}
     for path in paths:
         ext = os.path.splitext(path)[1]
         if ext.lower() in ['.htm', '.html']:
@@ -339,8 +592,103 @@ def lint_files(paths, lint_error, conf=conf.Conf(), printpaths=True):
         else:
             lint_file(path, 'js', None)
 
+def _replay_events(events, script_cache, import_callback, lint_error):
+    """ Replays the events recorded for a file in the result cache. """
+    for event in events:
+        if event[0] == 'error':
+            lint_error(*event[1:])
+        elif event[0] == 'import':
+            script_cache.importscript(import_callback(*event[1:]))
+        elif event[0] == 'undeclared':
+            if not script_cache.hasglobal(event[1]):
+                lint_error(*event[2:])
+        else:
+            assert False, 'Invalid internal event type %s' % event[0]
+
+# The state of a worker process or thread in a parallel run. Each worker keeps
+# its own lint cache across paths so that shared imports are only linted once
+# per worker.
+_worker = threading.local()
+
+def _init_worker(conf, result_cache, file_index, timings):
+    _worker.conf = conf
+    _worker.lint_cache = {}
+    _worker.result_cache = result_cache
+    _worker.file_index = file_index
+    _worker.send_index = True
+    _worker.timings = timings
+
+def _init_thread(conf, result_cache, file_index):
+    # Threads update the parent's file index directly.
+    _init_worker(conf, result_cache, file_index, None)
+    _worker.send_index = False
+
+def _lint_worker(path):
+    """ Lints a single path in a worker process and returns the list of
+        events, in order, that a serial run would have produced:
+            ('path', normpath)
+            ('error', normpath, line, col, errname, errdesc)
+            ('index', normpath, record)
+            ('timings', data)
+        Files that this worker linted for an earlier path are not repeated.
+    """
+    def lint_error(*args):
+        events.append(('error',) + args)
+    def printpath(normpath):
+        events.append(('path', normpath))
+
+    events = []
+    _lint_paths([path], _worker.lint_cache, lint_error, _worker.conf,
+                printpath, _worker.result_cache, _worker.file_index,
+                _worker.timings)
+    if _worker.file_index and _worker.send_index:
+        # Send the new records back so that the parent can save them.
+        for normpath, record in _worker.file_index.takeupdates():
+            events.append(('index', normpath, record))
+    if _worker.timings:
+        events.append(('timings', _worker.timings.takedata()))
+    return events
+
+def _lint_files_parallel(pool, paths, lint_error, printpath, file_index,
+                         timings):
+    # Results are consumed in path order. A file may be linted by more than
+    # one worker (for example, a script shared by several HTML pages), but
+    # only the first occurrence in path order is reported, which is the
+    # same file that a serial run would have linted first.
+    try:
+        linted = set()
+        for events in pool.imap(_lint_worker, paths):
+            owned = set()
+            for event in events:
+                if event[0] == 'path':
+                    normpath = event[1]
+                    if not normpath in linted:
+                        linted.add(normpath)
+                        owned.add(normpath)
+                        printpath(normpath)
+                elif event[0] == 'error':
+                    if event[1] in owned:
+                        lint_error(*event[1:])
+                elif event[0] == 'index':
+                    file_index.update(*event[1:])
+                elif event[0] == 'timings':
+                    timings.merge(event[1])
+                else:
+                    assert False, 'Invalid internal event type %s' % event[0]
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
 def _lint_script_part(scriptpos, jsversion, script, script_cache, conf,
-                      ignores, report_native, report_lint, import_callback):
+                      ignores, report_native, report_lint, import_callback,
+                      timings, parsed=None):
+    """ Lints one script. If parsed is not None, it is the result of
+        jsparse.parse_many for the script, which is used unless a control
+        comment changes the version.
+    """
     def parse_error(row, col, msg):
         if not msg in ('anon_no_return_value', 'no_return_value',
                        'redeclared_var', 'var_hides_arg'):
@@ -387,12 +735,21 @@ def _lint_script_part(scriptpos, jsversion, script, script_cache, conf,
     passes = []
 
     node_positions = jsparse.NodePositions(script, scriptpos)
-    possible_comments = jsparse.findpossiblecomments(script, node_positions)
 
     # Check control comments for the correct version. It may be this comment
     # isn't a valid comment (for example, it might be inside a string literal)
-    # After parsing, validate that it's legitimate.
+    # After parsing, validate that it's legitimate. The parser reports the
+    # real comments, so only scan for them beforehand if the script may
+    # contain a version.
     jsversionnode = None
+    if timings:
+        timings.push('comment scan')
+    if _content_type_re.search(script):
+        possible_comments = jsparse.findpossiblecomments(script, node_positions)
+    else:
+        possible_comments = []
+    if timings:
+        timings.pop()
     for comment in possible_comments:
         cc = _parse_control_comment(comment)
         if cc:
@@ -410,19 +767,50 @@ def _lint_script_part(scriptpos, jsversion, script, script_cache, conf,
                     version=jsversion.version)
         return
 
-    root = jsparse.parse(script, jsversion, parse_error, scriptpos)
+    if parsed and jsversionnode is None:
+        root, errors, comment_offsets = parsed
+        for line, col, msg in errors:
+            parse_error(line, col, msg)
+    else:
+        comment_offsets = []
+        if timings:
+            timings.push('parse')
+        root = jsparse.parse(script, jsversion, parse_error, scriptpos,
+                             comment_offsets)
+        if timings:
+            timings.pop()
     if not root:
         # Report errors and quit.
         for pos, msg in parse_errors:
             report_native(pos, msg)
         return
 
-    comments = jsparse.filtercomments(possible_comments, node_positions, root)
+    if timings:
+        timings.push('comment filter')
+    jsparse.setnumberatoms(root, node_positions)
+    comments = jsparse.makecomments(script, comment_offsets, node_positions)
 
-    if jsversionnode is not None and jsversionnode not in comments:
+    if jsversionnode is not None and \
+       not jsversionnode.start_pos() in [x.start_pos() for x in comments]:
         # TODO
         report(jsversionnode, 'incorrect_version')
 
+    # Look for nested C-style comments and convert their offsets together.
+    # Report at the actual location of the error. Add two characters for the
+    # opening two characters.
+    nested_comments = []
+    nested_offsets = []
+    for comment, (start, end, opcode) in zip(comments, comment_offsets):
+        if comment.opcode == 'c_comment':
+            nested_comment = comment.atom.find('/*')
+            if nested_comment < 0 and comment.atom.endswith('/'):
+                nested_comment = len(comment.atom) - 1
+            if nested_comment >= 0:
+                nested_comments.append(comment)
+                nested_offsets.append(start + 2 + nested_comment)
+    nested_positions = dict(zip(nested_comments,
+                                node_positions.from_offsets(nested_offsets)))
+
     start_ignore = None
     for comment in comments:
         cc = _parse_control_comment(comment)
@@ -459,16 +847,9 @@ def _lint_script_part(scriptpos, jsversion, script, script_cache, conf,
             elif keyword == 'pass':
                 passes.append(node)
         else:
-            if comment.opcode == 'c_comment':
-                # Look for nested C-style comments.
-                nested_comment = comment.atom.find('/*')
-                if nested_comment < 0 and comment.atom.endswith('/'):
-                    nested_comment = len(comment.atom) - 1
-                # Report at the actual error of the location. Add two
-                # characters for the opening two characters.
-                if nested_comment >= 0:
-                    pos = node_positions.from_offset(node_positions.to_offset(comment.start_pos()) + 2 + nested_comment)
-                    report(comment, 'nested_comment', pos=pos)
+            if comment in nested_positions:
+                report(comment, 'nested_comment',
+                       pos=nested_positions[comment])
             if comment.atom.lower().startswith('jsl:'):
                 report(comment, 'jsl_cc_not_understood')
             elif comment.atom.startswith('@'):
@@ -480,19 +861,16 @@ def _lint_script_part(scriptpos, jsversion, script, script_cache, conf,
     for pos, msg in parse_errors:
         report_native(pos, msg)
 
-    # Find all visitors and convert them into "onpush" callbacks that call "report"
-    visitors = {
-        'push': warnings.make_visitors()
-    }
-    for event in visitors:
-        for kind, callbacks in visitors[event].items():
-            visitors[event][kind] = [_getreporter(callback, report) for callback in callbacks]
-
-    # Push the scope/variable checks.
-    visitation.make_visitors(visitors, [_get_scope_checks(script_cache.scope, report)])
+    if timings:
+        timings.pop()
 
     # kickoff!
-    _lint_node(root, visitors)
+    if timings:
+        timings.push('visitor walk')
+    _lint_node(root, _LintContext(script_cache.scope, report, timings))
+    if timings:
+        timings.pop()
+        timings.push('scope analysis')
 
     for fallthru in fallthrus:
         report(fallthru, 'invalid_fallthru')
@@ -510,8 +888,11 @@ def _lint_script_part(scriptpos, jsversion, script, script_cache, conf,
     for name, node in unused_identifiers:
         unused_scope = script_cache.scope.find_scope(node)
         unused_scope.set_unused(name, node)
+    if timings:
+        timings.pop()
 
-def _lint_script_parts(script_parts, script_cache, lint_error, conf, import_callback):
+def _lint_script_parts(script_parts, script_cache, lint_error, conf,
+                       import_callback, lint_undeclared, timings=None):
     def report_lint(node, errname, pos=None, **errargs):
         errdesc = warnings.format_error(errname, **errargs)
         _report(pos or node.start_pos(), errname, errdesc, True)
@@ -520,34 +901,61 @@ def _lint_script_parts(script_parts, script_cache, lint_error, conf, import_call
         # TODO: Format the error.
         _report(pos, errname, errname, False)
 
+    def report_undeclared(node, name):
+        errdesc = warnings.format_error('undeclared_identifier', name=name)
+        pos = node.start_pos()
+        if _isreported(pos, 'undeclared_identifier', True):
+            lint_undeclared(name, pos.line, pos.col, 'undeclared_identifier',
+                            errdesc)
+
     def _report(pos, errname, errdesc, require_key):
+        if _isreported(pos, errname, require_key):
+            return lint_error(pos.line, pos.col, errname, errdesc)
+
+    def _isreported(pos, errname, require_key):
         try:
             if not conf[errname]:
-                return
+                return False
         except KeyError, err:
             if require_key:
                 raise
 
         for start, end in ignores:
             if pos >= start and pos <= end:
-                return
-
-        return lint_error(pos.line, pos.col, errname, errdesc)
-
-    for scriptpos, jsversion, script in script_parts:
+                return False
+
+        return True
+
+    # Parse the parts together, which is cheaper than parsing them one at a
+    # time. Parts with an invalid version are reported instead.
+    parsed = [None] * len(script_parts)
+    batch = [i for i, (scriptpos, jsversion, script) in enumerate(script_parts)
+             if jsparse.isvalidversion(jsversion)]
+    if timings:
+        timings.push('parse')
+    results = jsparse.parse_many([(script_parts[i][2], script_parts[i][1],
+                                   script_parts[i][0]) for i in batch],
+                                 comments=True)
+    if timings:
+        timings.pop()
+    for i, result in zip(batch, results):
+        parsed[i] = result
+
+    for (scriptpos, jsversion, script), parsed_part in zip(script_parts, parsed):
         ignores = []
         _lint_script_part(scriptpos, jsversion, script, script_cache, conf, ignores,
-                          report_native, report_lint, import_callback)
+                          report_native, report_lint, import_callback, timings,
+                          parsed_part)
 
+    if timings:
+        timings.push('scope analysis')
     scope = script_cache.scope
     identifier_warnings = scope.get_identifier_warnings()
+    declarations = frozenset(conf['declarations'])
     for decl_scope, name, node in identifier_warnings['undeclared']:
-        if name in conf['declarations']:
+        if name in declarations or name in _globals:
             continue
-        if name in _globals:
-            continue
-        if not script_cache.hasglobal(name):
-            report_lint(node, 'undeclared_identifier', name=name)
+        report_undeclared(node, name)
     for ref_scope, name, node in identifier_warnings['unreferenced']:
         # Ignore the outer scope.
         if ref_scope != scope:
@@ -562,25 +970,43 @@ def _lint_script_parts(script_parts, script_cache, lint_error, conf, import_call
                 assert False, 'Unrecognized identifier type: %s' % type_
     for ref_scope, name, node in identifier_warnings['obstructive']:
         report_lint(node, 'identifier_hides_another', name=name)
+    if timings:
+        timings.pop()
 
-def _getreporter(visitor, report):
-    def onpush(node):
+def _getreporter(visitor):
+    def onpush(ctx, node):
         try:
             ret = visitor(node)
             assert ret is None, 'visitor should raise an exception, not return a value'
         except warnings.LintWarning, warning:
-            # TODO: This is ugly hardcoding to improve the error positioning of
-            # "missing_semicolon" errors.
-            if visitor.warning in ('missing_semicolon', 'missing_semicolon_for_lambda'):
-                pos = warning.node.end_pos()
-            else:
-                pos = None
-            report(warning.node, visitor.warning, pos=pos, **warning.errargs)
+            _reportwarning(ctx, visitor, warning)
     return onpush
 
+def _gettimedreporter(visitor):
+    def onpush(ctx, node):
+        start = time.time()
+        try:
+            ret = visitor(node)
+            assert ret is None, 'visitor should raise an exception, not return a value'
+        except warnings.LintWarning, warning:
+            ctx.timings.addrule(visitor.warning, time.time() - start, True)
+            _reportwarning(ctx, visitor, warning)
+        else:
+            ctx.timings.addrule(visitor.warning, time.time() - start, False)
+    return onpush
+
+def _reportwarning(ctx, visitor, warning):
+    # TODO: This is ugly hardcoding to improve the error positioning of
+    # "missing_semicolon" errors.
+    if visitor.warning in ('missing_semicolon', 'missing_semicolon_for_lambda'):
+        pos = warning.node.end_pos()
+    else:
+        pos = None
+    ctx.report(warning.node, visitor.warning, pos=pos, **warning.errargs)
+
 def _warn_or_declare(scope, name, type_, node, report):
-    parent_scope, other = scope.resolve_identifier(name) or (None, None)
-    if other and parent_scope == scope:
+    other = scope.get_identifier(name)
+    if other:
         # Only warn about duplications in this scope.
         # Other scopes will be checked later.
         if other.kind == tok.FUNCTION and name in other.fn_args:
@@ -590,59 +1016,97 @@ def _warn_or_declare(scope, name, type_, node, report):
     else:
         scope.add_declaration(name, node, type_)
 
-def _get_scope_checks(scope, report):
-    scopes = [scope]
-
-    class scope_checks:
-        """ This is a non-standard visitation class to track scopes. The
-            docstring is unused since this class never throws lint errors.
-        """
-        @visitation.visit('push', tok.NAME)
-        def _name(self, node):
-            if node.node_index == 0 and node.parent.kind == tok.COLON and node.parent.parent.kind == tok.RC:
-                return # left side of object literal
-            if node.parent.kind == tok.VAR:
-                _warn_or_declare(scopes[-1], node.atom, 'var', node, report)
-                return
-            if node.parent.kind == tok.CATCH:
-                scopes[-1].add_declaration(node.atom, node, 'var')
-            scopes[-1].add_reference(node.atom, node)
-
-        @visitation.visit('push', tok.FUNCTION)
-        def _push_func(self, node):
-            if node.fn_name:
-                _warn_or_declare(scopes[-1], node.fn_name, 'function', node, report)
-            self._push_scope(node)
-            for var_name in node.fn_args:
-                scopes[-1].add_declaration(var_name, node, 'arg')
-
-        @visitation.visit('push', tok.LEXICALSCOPE, tok.WITH)
-        def _push_scope(self, node):
-            scopes.append(scopes[-1].add_scope(node))
-
-        @visitation.visit('pop', tok.FUNCTION, tok.LEXICALSCOPE, tok.WITH)
-        def _pop_scope(self, node):
-            scopes.pop()
-
-    return scope_checks
-
-
-def _lint_node(node, visitors):
-
-    for kind in (node.kind, (node.kind, node.opcode)):
-        if kind in visitors['push']:
-            for visitor in visitors['push'][kind]:
-                visitor(node)
-
-    for child in node.kids:
-        if child:
-            _lint_node(child, visitors)
+class _LintContext:
+    """ The state of linting a script part, which is passed to each visitor.
+    """
+    def __init__(self, scope, report, timings=None):
+        self.scopes = [scope]
+        self.report = report
+        self.timings = timings
+
+class _scope_checks:
+    """ This is a non-standard visitation class to track scopes. The
+        docstring is unused since this class never throws lint errors.
+    """
+    @visitation.visit('push', tok.NAME)
+    def _name(self, ctx, node):
+        if node.node_index == 0 and node.parent.kind == tok.COLON and node.parent.parent.kind == tok.RC:
+            return # left side of object literal
+        if node.parent.kind == tok.VAR:
+            _warn_or_declare(ctx.scopes[-1], node.atom, 'var', node, ctx.report)
+            return
+        if node.parent.kind == tok.CATCH:
+            ctx.scopes[-1].add_declaration(node.atom, node, 'var')
+        ctx.scopes[-1].add_reference(node.atom, node)
+
+    @visitation.visit('push', tok.FUNCTION)
+    def _push_func(self, ctx, node):
+        if node.fn_name:
+            _warn_or_declare(ctx.scopes[-1], node.fn_name, 'function', node, ctx.report)
+        self._push_scope(ctx, node)
+        for var_name in node.fn_args:
+            ctx.scopes[-1].add_declaration(var_name, node, 'arg')
+
+    @visitation.visit('push', tok.LEXICALSCOPE, tok.WITH)
+    def _push_scope(self, ctx, node):
+        ctx.scopes.append(ctx.scopes[-1].add_scope(node))
+
+    @visitation.visit('pop', tok.FUNCTION, tok.LEXICALSCOPE, tok.WITH)
+    def _pop_scope(self, ctx, node):
+        ctx.scopes.pop()
+
+def _make_dispatch_tables(getreporter):
+    # Convert the warnings into visitors that call "report", and then add the
+    # scope/variable checks.
+    visitors = {
+        'push': dict((kind, [getreporter(callback) for callback in callbacks])
+                     for kind, callbacks in warnings.make_visitors().items()),
+        'pop': {},
+    }
+    visitation.make_visitors(visitors, [_scope_checks])
+
+    kinds = tok.__dict__.values()
+    opcodes = op.__dict__.values()
+    return (
+        min(kinds), min(opcodes),
+        visitation.make_dispatch_table(visitors['push'], kinds, opcodes),
+        visitation.make_dispatch_table(visitors['pop'], kinds, opcodes),
+    )
+
+# Build the visitors once, since they are shared by all scripts. The timed
+# visitors are only built when they are first needed.
+_TOK_BASE, _OP_BASE, _push_visitors, _pop_visitors = \
+    _make_dispatch_tables(_getreporter)
+_timed_visitors = []
+
+def _lint_node(node, ctx):
+    # Walk the tree with an explicit stack so that deeply nested scripts do
+    # not exceed the recursion limit. Each entry is a node and, once its
+    # children have been pushed, the visitors to call when it is popped.
+    push_table, pop_table = _push_visitors, _pop_visitors
+    if ctx.timings:
+        if not _timed_visitors:
+            # Threads may build them at the same time, so replace the whole
+            # list rather than extending it.
+            _timed_visitors[:] = _make_dispatch_tables(_gettimedreporter)[2:]
+        push_table, pop_table = _timed_visitors
+    nodes = [(node, None)]
+    while nodes:
+        node, pop_visitors = nodes.pop()
+        if pop_visitors is not None:
+            for visitor in pop_visitors:
+                visitor(ctx, node)
+            continue
 
-    for kind in (node.kind, (node.kind, node.opcode)):
-        if kind in visitors['pop']:
-            for visitor in visitors['pop'][kind]:
-                visitor(node)
+        kind = node.kind - _TOK_BASE
+        opcode = node.opcode - _OP_BASE
+        for visitor in push_table[kind][opcode]:
+            visitor(ctx, node)
 
+        pop_visitors = pop_table[kind][opcode]
+        if pop_visitors:
+            nodes.append((node, pop_visitors))
+        nodes.extend((kid, None) for kid in reversed(node.kids) if kid)
 
 class TestLint(unittest.TestCase):
     def testFindScript(self):
@@ -665,6 +1129,24 @@ ok&amp;
             ('test.js', None),
             (None, "<!--\nvar s = '<script></script>';\n-->")
         ])
+    def testFindScriptAfterIncrement(self):
+        html = '<script>\nvar s = "</script>";\nvar x = 1;\nx++ / 2;</script>\n' \
+               '<script>\nvar y = z;\n</script>'
+        scripts = [x['contents']
+                   for x in _findhtmlscripts(html, util.JSVersion.default())]
+        self.assertEquals(scripts, [
+            '\nvar s = "</script>";\nvar x = 1;\nx++ / 2;',
+            '\nvar y = z;\n',
+        ])
+    def testFindScriptAfterProperty(self):
+        html = '<script>var s = "</script>"; var x = y.return / 2; u;</script>' \
+               '<script>u2</script>'
+        scripts = [x['contents']
+                   for x in _findhtmlscripts(html, util.JSVersion.default())]
+        self.assertEquals(scripts, [
+            'var s = "</script>"; var x = y.return / 2; u;',
+            'u2',
+        ])
     def testJSVersion(self):
         def parsetag(starttag, default_version=None):
             script, = _findhtmlscripts(starttag + '/**/</script>', \
@@ -711,3 +1193,223 @@ ok&amp;
         script = parsetag('<script type="" language="mocha">',
                               util.JSVersion('1.2', False))
         self.assertEquals(script['jsversion'], util.JSVersion.default())
+
+class TestScope(unittest.TestCase):
+    def _parse(self, script):
+        return jsparse.parse(script, util.JSVersion.default(),
+                             lambda *args: self.fail(args))
+    def testIdentifierWarnings(self):
+        root = self._parse('a = b; c(d); e = f;')
+        a, b, c, d, e, f = (root.kids[0].kids[0].kids[0],
+                            root.kids[0].kids[0].kids[1],
+                            root.kids[1].kids[0].kids[0],
+                            root.kids[1].kids[0].kids[1],
+                            root.kids[2].kids[0].kids[0],
+                            root.kids[2].kids[0].kids[1])
+        outer = Scope()
+        outer.add_declaration('x', a, 'var')
+        outer.add_declaration('y', b, 'var')
+        inner = outer.add_scope(c)
+        inner.add_declaration('x', c, 'function')
+        inner.add_declaration('z', d, 'arg')
+        inner.add_reference('x', b)
+        inner.add_reference('w', d)
+        inner.set_unused('v', f)
+        outer.add_reference('y', f)
+
+        self.assertEquals(inner.resolve_identifier('y'), (outer, b))
+        self.assertEquals(inner.resolve_identifier('x'), (inner, c))
+        self.assertEquals(outer.resolve_identifier('z'), None)
+        self.assertEquals(inner.get_identifier_type('z'), 'arg')
+
+        warnings = outer.get_identifier_warnings()
+        self.assertEquals(warnings['unreferenced'], [
+            (outer, 'x', a),
+            (inner, 'z', d),
+        ])
+        self.assertEquals(warnings['undeclared'], [
+            (inner, 'w', d),
+            (inner, 'v', f),
+        ])
+        self.assertEquals(warnings['obstructive'], [(inner, 'x', c)])
+
+        # Names in the parent scopes are still resolved.
+        warnings = inner.get_identifier_warnings()
+        self.assertEquals(warnings['unreferenced'], [(inner, 'z', d)])
+        self.assertEquals(warnings['obstructive'], [(inner, 'x', c)])
+
+    def testFindScope(self):
+        root = self._parse('function a() {\n'
+                           '  x; function b() { y; }\n'
+                           '  function c() { z; }\n'
+                           '}\n'
+                           'w;')
+        a = root.kids[0]
+        x, b, c = a.kids[0].kids
+        y, = b.kids[0].kids
+        z, = c.kids[0].kids
+        w = root.kids[1]
+
+        outer = Scope()
+        scope_a = outer.add_scope(a)
+        scope_b = scope_a.add_scope(b)
+        self.assertEquals(outer.find_scope(y), scope_b)
+        self.assertEquals(outer.find_scope(x), scope_a)
+
+        # The index must include scopes added after a lookup.
+        scope_c = scope_a.add_scope(c)
+        self.assertEquals(outer.find_scope(y), scope_b)
+        self.assertEquals(outer.find_scope(z), scope_c)
+        self.assertEquals(outer.find_scope(c), scope_c)
+        self.assertEquals(outer.find_scope(x), scope_a)
+        self.assertEquals(outer.find_scope(w), outer)
+        self.assertEquals(outer.find_scope(root), outer)
+
+class TestLintFiles(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        files = {
+            'shared.js': 'var shared = 1;\nundeclared_in_shared();\n',
+            'a.js': '/*jsl:import shared.js*/\nshared = a_undeclared\n',
+            'b.js': '/*jsl:import shared.js*/\nshared++;\nb_undeclared();\n',
+            'page.html': '<script src="shared.js"></script>\n' \
+                         '<script>shared = page_undeclared</script>\n',
+        }
+        for name, contents in files.items():
+            self._write(name, contents)
+    def tearDown(self):
+        shutil.rmtree(self._dir)
+    def _lint(self, names, jobs, result_cache=None, threads=1, timings_=None):
+        def lint_error(path, line, col, errname, errdesc):
+            results.append((os.path.basename(path), line, col, errname))
+        results = []
+        paths = [os.path.join(self._dir, name) for name in names]
+        lint_files(paths, lint_error, printpaths=False, jobs=jobs,
+                   result_cache=result_cache, threads=threads,
+                   timings=timings_)
+        return results
+    def _write(self, name, contents):
+        f = open(os.path.join(self._dir, name), 'w')
+        f.write(contents)
+        f.close()
+    def testParallel(self):
+        names = ['b.js', 'page.html', 'a.js', 'shared.js', 'b.js']
+        serial = self._lint(names, 1)
+        self.assert_(('shared.js', 1, 0, 'undeclared_identifier') in serial)
+        self.assert_(('page.html', 1, 17, 'undeclared_identifier') in serial)
+        self.assertEquals(self._lint(names, 2), serial)
+        self.assertEquals(self._lint(names, 4), serial)
+    def testThreads(self):
+        names = ['b.js', 'page.html', 'a.js', 'shared.js', 'b.js']
+        serial = self._lint(names, 1)
+        self.assertEquals(self._lint(names, 1, threads=2), serial)
+        self.assertEquals(self._lint(names, 1, threads=4), serial)
+        self.assertRaises(ValueError, self._lint, names, 2, threads=2)
+        self.assertRaises(ValueError, self._lint, names, 1, threads=2,
+                          timings_=timings.Timings())
+    def testImportCycle(self):
+        self._write('c1.js', '/*jsl:import c2.js*/\nvar c1 = c2 + c3 + c4;\n')
+        self._write('c2.js', '/*jsl:import c1.js*/\nvar c2 = c1 + c5;\n')
+        self._write('c3.js', '/*jsl:import c2.js*/\nvar c3 = c1 + c6;\n')
+        results = self._lint(['c1.js', 'c3.js'], 1)
+        self.assertEquals([(name, line, col) for name, line, col, errname
+                           in results if errname == 'undeclared_identifier'],
+                          [('c2.js', 1, 14), ('c1.js', 1, 14), ('c1.js', 1, 19),
+                           ('c3.js', 1, 14)])
+    def testResultCache(self):
+        def parse_many(scripts, **kwargs):
+            parsed.extend(script for script, jsversion, startpos in scripts)
+            return real_parse_many(scripts, **kwargs)
+        names = ['b.js', 'page.html', 'a.js']
+        serial = self._lint(names, 1)
+        result_cache = cache.ResultCache(os.path.join(self._dir, 'cache'))
+
+        parsed = []
+        real_parse_many = jsparse.parse_many
+        jsparse.parse_many = parse_many
+        try:
+            self.assertEquals(self._lint(names, 1, result_cache), serial)
+            self.assertEquals(len(parsed), 4)
+            del parsed[:]
+            self.assertEquals(self._lint(names, 1, result_cache), serial)
+            self.assertEquals(self._lint(names, 2, result_cache), serial)
+            self.assertEquals(parsed, [])
+
+            # Declaring a global in the shared script must be reflected in
+            # the cached results of the scripts that import it.
+            self._write('shared.js', 'var shared, a_undeclared;\n')
+            results = self._lint(names, 1, result_cache)
+            self.assertEquals(len(parsed), 1)
+            self.assert_(('a.js', 1, 9, 'undeclared_identifier') in serial)
+            self.assert_(not ('a.js', 1, 9, 'undeclared_identifier') in results)
+        finally:
+            jsparse.parse_many = real_parse_many
+
+class TestDeepNesting(unittest.TestCase):
+    """ Lints a corpus of pathologically nested scripts, which must not
+        exceed the recursion limit or overflow the C stack.
+    """
+    DEPTH = 1200
+
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+    def tearDown(self):
+        shutil.rmtree(self._dir)
+    def _lint(self, contents):
+        def lint_error(path, line, col, errname, errdesc):
+            results.append((line, errname))
+        results = []
+        path = os.path.join(self._dir, 'script.js')
+        f = open(path, 'w')
+        f.write(contents)
+        f.close()
+        lint_files([path], lint_error, printpaths=False)
+        return results
+    def testStatements(self):
+        depth = self.DEPTH
+        results = self._lint('function f(a) {\n' + 'if (a) {\n' * depth +
+                             'return 1;\n' + '}\n' * depth + '}\n')
+        self.assertEquals(results, [(0, 'no_return_value')])
+
+        results = self._lint('function f(a) {\n' +
+                             'if (a == 1) { return 1; } else\n' * depth +
+                             '{ return 0; }\n}\n')
+        self.assertEquals(results, [])
+
+        results = self._lint('function f(a) {\n' +
+                             'switch (a) { case 1:\n' * (depth / 2) +
+                             'return 1;\n' + '}\n' * (depth / 2) + '}\n')
+        self.assertEquals(results[-1], (depth / 2, 'missing_default_case'))
+
+        results = self._lint('var f;\n' + 'try {\n' * depth + 'f();\n' +
+                             '} finally { f(); }\n' * depth)
+        self.assertEquals(results, [])
+    def testFunctions(self):
+        depth = self.DEPTH
+        results = self._lint('function f(g) { g(); }\n' +
+                             'f(function () {\n' * depth +
+                             '});\n' * depth)
+        self.assertEquals(results, [])
+
+        results = self._lint(''.join(['function f%i(a) {\n' % i
+                                      for i in range(depth)]) +
+                             'return a + undeclared;\n' + '}\n' * depth)
+        self.assertEquals(results[0], (depth, 'undeclared_identifier'))
+    def testExpressions(self):
+        depth = self.DEPTH
+        for script in [
+            'var a = ' + '[\n' * depth + ']\n' * depth + ';\n',
+            'var a = ' + '{a:\n' * depth + '1' + '}\n' * depth + ';\n',
+            'var a = ' + '(\n' * depth + '1' + ')\n' * depth + ';\n',
+            'var a = 1;\nvar b = a\n' + '- a\n' * depth * 10 + ';\n',
+            'var a = 1;\nvar b = a ?\n' + '1 : a ?\n' * depth + '1 : 0;\n',
+            ]:
+            self.assertEquals(self._lint(script), [])
+    def testTooDeep(self):
+        # The parser reports an error instead of overflowing the stack.
+        depth = self.DEPTH * 10
+        results = self._lint('function f(g) { g(); }\n' +
+                             'f(function () {\n' * depth +
+                             '});\n' * depth)
+        self.assertEquals(len(results), 1)
+        self.assertEquals(results[0][1], 'over_recursed')
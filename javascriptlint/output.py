@@ -0,0 +1,140 @@
+# vim: ts=4 sw=4 expandtab
+""" Machine-readable output formats.
+
+Each writer streams one record per warning to a file-like object:
+    writer.start()
+    writer.write(path, line, col, errname, errdesc)
+    writer.finish()
+Lines and columns are zero-based, as passed to lint_error.
+"""
+import json
+import os
+import sys
+import unittest
+import urllib
+
+SARIF_SCHEMA = 'https://json.schemastore.org/sarif-2.1.0.json'
+
+class NDJSONWriter:
+    """ Writes one JSON object per line. """
+    def __init__(self, file):
+        self._file = file
+    def start(self):
+        pass
+    def write(self, path, line, col, errname, errdesc):
+        self._file.write(json.dumps({
+            'file': _decodepath(path),
+            'line': line+1,
+            'col': col,
+            'errname': errname,
+            'description': errdesc,
+        }, sort_keys=True) + '\n')
+    def finish(self):
+        pass
+
+class SARIFWriter:
+    """ Writes a SARIF 2.1.0 log with a single run. The results are written
+        as they are reported, so the log is never held in memory.
+    """
+    def __init__(self, file):
+        self._file = file
+        self._separator = ''
+    def start(self):
+        # Leave the results array open.
+        tool = {
+            'driver': {
+                'name': 'JavaScript Lint',
+                'informationUri': 'http://www.JavaScriptLint.com',
+            },
+        }
+        self._file.write('{"$schema": %s, "version": "2.1.0", '
+                         '"runs": [{"tool": %s, "results": [\n' %
+                         (json.dumps(SARIF_SCHEMA),
+                          json.dumps(tool, sort_keys=True)))
+        self._separator = ''
+    def write(self, path, line, col, errname, errdesc):
+        self._file.write(self._separator + json.dumps({
+            'ruleId': errname,
+            'level': 'warning',
+            'message': {
+                'text': errdesc,
+            },
+            'locations': [{
+                'physicalLocation': {
+                    'artifactLocation': {
+                        'uri': _pathtouri(path),
+                    },
+                    'region': {
+                        'startLine': line+1,
+                        'startColumn': col+1,
+                    },
+                },
+            }],
+        }, sort_keys=True))
+        self._separator = ',\n'
+    def finish(self):
+        self._file.write('\n]}]}\n')
+
+writers = {
+    'ndjson': NDJSONWriter,
+    'sarif': SARIFWriter,
+}
+
+def _decodepath(path):
+    """ Returns path as unicode. Bytes that are not valid in the file system
+        encoding or in UTF-8 are replaced.
+    """
+    if isinstance(path, unicode):
+        return path
+    try:
+        return path.decode(sys.getfilesystemencoding() or 'utf-8')
+    except UnicodeDecodeError:
+        return path.decode('utf-8', 'replace')
+
+def _pathtouri(path):
+    if isinstance(path, unicode):
+        path = path.encode('utf-8')
+    if not os.path.isabs(path):
+        return urllib.pathname2url(path)
+    return 'file://' + urllib.pathname2url(path)
+
+class TestOutput(unittest.TestCase):
+    class _File:
+        def __init__(self):
+            self.chunks = []
+        def write(self, s):
+            self.chunks.append(s)
+    def _write(self, writer_class, warnings):
+        file = self._File()
+        writer = writer_class(file)
+        writer.start()
+        for warning in warnings:
+            writer.write(*warning)
+        writer.finish()
+        return ''.join(file.chunks)
+    def testNDJSON(self):
+        output = self._write(NDJSONWriter, [
+            ('/a "b".js', 0, 4, 'name', 'desc'),
+            (u'/\xe9.js', 2, 0, 'other', u'\xe9'),
+            ('/caf\xe9.js', 3, 0, 'other', 'desc'),
+        ])
+        lines = output.split('\n')
+        self.assertEquals(lines[3:], [''])
+        self.assertEquals(json.loads(lines[0]), {
+            'file': '/a "b".js', 'line': 1, 'col': 4,
+            'errname': 'name', 'description': 'desc',
+        })
+        self.assertEquals(json.loads(lines[1])['file'], u'/\xe9.js')
+        self.assert_(json.loads(lines[2])['file'] in
+                     (u'/caf\xe9.js', u'/caf\ufffd.js'))
+    def testSARIF(self):
+        for warnings in ([], [('/a b.js', 0, 4, 'name', 'desc')] * 2):
+            log = json.loads(self._write(SARIFWriter, warnings))
+            self.assertEquals(log['version'], '2.1.0')
+            results = log['runs'][0]['results']
+            self.assertEquals(len(results), len(warnings))
+        self.assertEquals(results[0]['ruleId'], 'name')
+        self.assertEquals(results[0]['message'], {'text': 'desc'})
+        location = results[0]['locations'][0]['physicalLocation']
+        self.assertEquals(location['artifactLocation']['uri'], 'file:///a%20b.js')
+        self.assertEquals(location['region'], {'startLine': 1, 'startColumn': 5})
@@ -0,0 +1,196 @@
+/* vim: ts=4 sw=4 expandtab
+ */
+#include <Python.h>
+#include "structmember.h"
+
+#include "node.h"
+#include "nodepos.h"
+
+static int
+Node_traverse(NodeObject* self, visitproc visit, void* arg)
+{
+    Py_VISIT(self->kind);
+    Py_VISIT(self->opcode);
+    Py_VISIT(self->atom);
+    Py_VISIT(self->dval);
+    Py_VISIT(self->fn_name);
+    Py_VISIT(self->fn_args);
+    Py_VISIT(self->end_comma);
+    Py_VISIT(self->no_semi);
+    Py_VISIT(self->kids);
+    Py_VISIT(self->parent);
+    Py_VISIT(self->node_index);
+    Py_VISIT(self->start_pos);
+    Py_VISIT(self->end_pos);
+    return 0;
+}
+
+static int
+Node_clear(NodeObject* self)
+{
+    Py_CLEAR(self->kind);
+    Py_CLEAR(self->opcode);
+    Py_CLEAR(self->atom);
+    Py_CLEAR(self->dval);
+    Py_CLEAR(self->fn_name);
+    Py_CLEAR(self->fn_args);
+    Py_CLEAR(self->end_comma);
+    Py_CLEAR(self->no_semi);
+    Py_CLEAR(self->kids);
+    Py_CLEAR(self->parent);
+    Py_CLEAR(self->node_index);
+    Py_CLEAR(self->start_pos);
+    Py_CLEAR(self->end_pos);
+    return 0;
+}
+
+static void
+Node_dealloc(NodeObject* self)
+{
+    PyObject_GC_UnTrack(self);
+    Py_TRASHCAN_SAFE_BEGIN(self)
+    Node_clear(self);
+    Py_TYPE(self)->tp_free((PyObject*)self);
+    Py_TRASHCAN_SAFE_END(self)
+}
+
+static PyObject*
+Node_start_pos(NodeObject* self)
+{
+    if (!self->start_pos) {
+        self->start_pos = NodePos_FromLineCol(self->start_line, self->start_col);
+        if (!self->start_pos)
+            return NULL;
+    }
+    Py_INCREF(self->start_pos);
+    return self->start_pos;
+}
+
+static PyObject*
+Node_end_pos(NodeObject* self)
+{
+    if (!self->end_pos) {
+        self->end_pos = NodePos_FromLineCol(self->end_line, self->end_col);
+        if (!self->end_pos)
+            return NULL;
+    }
+    Py_INCREF(self->end_pos);
+    return self->end_pos;
+}
+
+/* The position fields are exposed through accessors so that changing them
+ * discards the cached NodePos objects.
+ */
+static PyObject*
+Node_getint(NodeObject* self, void* closure)
+{
+    return PyInt_FromLong(*(int*)((char*)self + (Py_ssize_t)closure));
+}
+
+static int
+Node_setint(NodeObject* self, PyObject* value, void* closure)
+{
+    long l;
+
+    if (value == NULL) {
+        PyErr_SetString(PyExc_TypeError, "cannot delete a node position");
+        return -1;
+    }
+    l = PyInt_AsLong(value);
+    if (l == -1 && PyErr_Occurred())
+        return -1;
+    *(int*)((char*)self + (Py_ssize_t)closure) = (int)l;
+    Py_CLEAR(self->start_pos);
+    Py_CLEAR(self->end_pos);
+    return 0;
+}
+
+static PyGetSetDef
+Node_getset[] = {
+    {"_start_line", (getter)Node_getint, (setter)Node_setint,
+     "zero-based start line", (void*)offsetof(NodeObject, start_line)},
+    {"_start_col", (getter)Node_getint, (setter)Node_setint,
+     "zero-based start column", (void*)offsetof(NodeObject, start_col)},
+    {"_end_line", (getter)Node_getint, (setter)Node_setint,
+     "zero-based end line", (void*)offsetof(NodeObject, end_line)},
+    {"_end_col", (getter)Node_getint, (setter)Node_setint,
+     "zero-based end column", (void*)offsetof(NodeObject, end_col)},
+    {NULL} /* Sentinel */
+};
+
+static PyMemberDef
+Node_members[] = {
+    {"kind", T_OBJECT_EX, offsetof(NodeObject, kind), 0, "token type"},
+    {"opcode", T_OBJECT_EX, offsetof(NodeObject, opcode), 0, "opcode"},
+    {"atom", T_OBJECT_EX, offsetof(NodeObject, atom), 0, "name or string value"},
+    {"dval", T_OBJECT_EX, offsetof(NodeObject, dval), 0, "numeric value"},
+    {"fn_name", T_OBJECT_EX, offsetof(NodeObject, fn_name), 0, "function name"},
+    {"fn_args", T_OBJECT_EX, offsetof(NodeObject, fn_args), 0, "function arguments"},
+    {"end_comma", T_OBJECT_EX, offsetof(NodeObject, end_comma), 0, "whether an array ends with a comma"},
+    {"no_semi", T_OBJECT_EX, offsetof(NodeObject, no_semi), 0, "whether a statement lacks a semicolon"},
+    {"kids", T_OBJECT_EX, offsetof(NodeObject, kids), 0, "child nodes"},
+    {"parent", T_OBJECT_EX, offsetof(NodeObject, parent), 0, "parent node"},
+    {"node_index", T_OBJECT_EX, offsetof(NodeObject, node_index), 0, "index in the parent's kids"},
+    {NULL} /* Sentinel */
+};
+
+static PyMethodDef
+Node_methods[] = {
+    {"start_pos", (PyCFunction)Node_start_pos, METH_NOARGS,
+     "Returns the NodePos of the first character."},
+    {"end_pos", (PyCFunction)Node_end_pos, METH_NOARGS,
+     "Returns the NodePos of the last character."},
+    {NULL} /* Sentinel */
+};
+
+PyTypeObject NodeType = {
+    PyObject_HEAD_INIT(NULL)
+    0,                         /*ob_size*/
+    "pyspidermonkey.Node",     /*tp_name*/
+    sizeof(NodeObject),        /*tp_basicsize*/
+    0,                         /*tp_itemsize*/
+    (destructor)Node_dealloc,  /*tp_dealloc*/
+    0,                         /*tp_print*/
+    0,                         /*tp_getattr*/
+    0,                         /*tp_setattr*/
+    0,                         /*tp_compare*/
+    0,                         /*tp_repr*/
+    0,                         /*tp_as_number*/
+    0,                         /*tp_as_sequence*/
+    0,                         /*tp_as_mapping*/
+    0,                         /*tp_hash */
+    0,                         /*tp_call*/
+    0,                         /*tp_str*/
+    0,                         /*tp_getattro*/
+    0,                         /*tp_setattro*/
+    0,                         /*tp_as_buffer*/
+    Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE | Py_TPFLAGS_HAVE_GC, /*tp_flags*/
+    "A parse node with a fixed set of fields.", /* tp_doc */
+    (traverseproc)Node_traverse, /* tp_traverse */
+    (inquiry)Node_clear,       /* tp_clear */
+    0,                         /* tp_richcompare */
+    0,                         /* tp_weaklistoffset */
+    0,                         /* tp_iter */
+    0,                         /* tp_iternext */
+    Node_methods,              /* tp_methods */
+    Node_members,              /* tp_members */
+    Node_getset,               /* tp_getset */
+    0,                         /* tp_base */
+    0,                         /* tp_dict */
+    0,                         /* tp_descr_get */
+    0,                         /* tp_descr_set */
+    0,                         /* tp_dictoffset */
+    0,                         /* tp_init */
+    0,                         /* tp_alloc */
+    PyType_GenericNew,         /* tp_new */
+};
+
+void
+RegisterNodeType(PyObject* module)
+{
+    if (PyType_Ready(&NodeType) < 0)
+        return;
+
+    Py_INCREF(&NodeType);
+    PyModule_AddObject(module, "Node", (PyObject*)&NodeType);
+}
@@ -0,0 +1,39 @@
+/* vim: ts=4 sw=4 expandtab
+ */
+#ifndef NODE_H
+#define NODE_H
+
+/* A parse node. Fields that are only present on some kinds of nodes are NULL
+ * when absent and raise AttributeError when read.
+ */
+typedef struct {
+    PyObject_HEAD
+    PyObject* kind;
+    PyObject* opcode;
+    int start_line;
+    int start_col;
+    int end_line;
+    int end_col;
+    PyObject* atom;
+    PyObject* dval;
+    PyObject* fn_name;
+    PyObject* fn_args;
+    PyObject* end_comma;
+    PyObject* no_semi;
+    PyObject* kids;
+    PyObject* parent;
+    PyObject* node_index;
+
+    /* NodePos objects, created on demand */
+    PyObject* start_pos;
+    PyObject* end_pos;
+} NodeObject;
+
+extern PyTypeObject NodeType;
+
+#define Node_Check(op) PyObject_TypeCheck(op, &NodeType)
+
+void
+RegisterNodeType(PyObject* module);
+
+#endif
@@ -115,3 +115,17 @@ RegisterNodePosType(PyObject* module)
     PyModule_AddObject(module, "NodePos", (PyObject*)&NodePosType);
 }
 
+
+PyObject*
+NodePos_FromLineCol(int line, int col)
+{
+    NodePosObject* self;
+
+    self = (NodePosObject*)NodePosType.tp_alloc(&NodePosType, 0);
+    if (self == NULL)
+        return NULL;
+
+    self->line = line;
+    self->col = col;
+    return (PyObject*)self;
+}
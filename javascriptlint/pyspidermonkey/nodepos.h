@@ -6,5 +6,8 @@
 void
 RegisterNodePosType(PyObject* module);
 
+PyObject*
+NodePos_FromLineCol(int line, int col);
+
 #endif
 
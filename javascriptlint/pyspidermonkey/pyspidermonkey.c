@@ -10,11 +10,13 @@
 #include <jsdbgapi.h>
 #include <jsfun.h>
 #include <jsinterp.h>
+#include <jslock.h>
 #include <jsparse.h>
 #include <jsscan.h>
 #include <jsscope.h>
 #include <jsstr.h>
 
+#include "node.h"
 #include "nodepos.h"
 
 #define ARRAY_COUNT(a) (sizeof(a) / sizeof(a[0]))
@@ -46,19 +48,91 @@ JS_STATIC_ASSERT(ARRAY_COUNT(error_names) == JSErr_Limit);
 #define TOK_TO_NUM(tok) (tok+1000)
 #define OPCODE_TO_NUM(op) (op+2000)
 
-static jschar*
-tojschar(const char* buf) {
-    return (jschar*)buf;
+/* The parser is recursive. Limit the stack it may use so that deeply nested
+ * scripts are reported as "too much recursion" instead of crashing. Threads
+ * that parse scripts need a stack at least this large.
+ */
+#define PARSER_STACK_SIZE (6L * 1024L * 1024L)
+
+/* Shared node kinds and opcodes, so that nodes don't each allocate them. */
+static PyObject* token_nums[TOK_LIMIT];
+static PyObject* opcode_nums[JSOP_LIMIT];
+
+/* Comment kinds, which match the opcodes of comment nodes. */
+static PyObject* c_comment;
+static PyObject* cpp_comment;
+
+/* The characters of a script as UTF-16, which is what the parser reads. */
+typedef struct ScriptChars {
+    PyObject* unicode;
+    const jschar* chars;
+    size_t length;
+    jschar* buffer;
+} ScriptChars;
+
+/* Gets the characters of a unicode object, or of a string in the default
+ * encoding. On narrow builds, the parser reads the unicode object's own
+ * buffer. On wide builds, characters outside the BMP must become surrogate
+ * pairs, so the characters are converted once into a new buffer.
+ *
+ * Returns 0 with an exception set on failure. Otherwise, the characters must
+ * be released with release_script_chars.
+ */
+static int
+get_script_chars(PyObject* script, ScriptChars* chars)
+{
+    const Py_UNICODE* u;
+    Py_ssize_t size;
+#ifdef Py_UNICODE_WIDE
+    Py_ssize_t i;
+    size_t length;
+#endif
+
+    memset(chars, 0, sizeof(*chars));
+    chars->unicode = PyUnicode_FromObject(script);
+    if (!chars->unicode)
+        return 0;
+    u = PyUnicode_AS_UNICODE(chars->unicode);
+    size = PyUnicode_GET_SIZE(chars->unicode);
+
+#ifdef Py_UNICODE_WIDE
+    length = size;
+    for (i = 0; i < size; i++) {
+        if (u[i] > 0xFFFF)
+            length++;
+    }
+    chars->buffer = PyMem_New(jschar, length);
+    if (!chars->buffer) {
+        Py_CLEAR(chars->unicode);
+        PyErr_NoMemory();
+        return 0;
+    }
+    length = 0;
+    for (i = 0; i < size; i++) {
+        if (u[i] > 0xFFFF) {
+            chars->buffer[length++] = 0xD800 | ((u[i] - 0x10000) >> 10);
+            chars->buffer[length++] = 0xDC00 | ((u[i] - 0x10000) & 0x3FF);
+        }
+        else {
+            chars->buffer[length++] = (jschar)u[i];
+        }
+    }
+    chars->chars = chars->buffer;
+    chars->length = length;
+#else
+    JS_STATIC_ASSERT(sizeof(Py_UNICODE) == sizeof(jschar));
+    chars->chars = (const jschar*)u;
+    chars->length = size;
+#endif
+    return 1;
 }
 
-static int
-tojscharlen(int buflen) {
-    /* The buffer length shouldn't be an odd number, buf if it is, the buffer
-       will be truncated to exclude it.
-     */
-    JS_STATIC_ASSERT(sizeof(char) == 1);
-    JS_STATIC_ASSERT(sizeof(jschar) == 2);
-    return buflen / 2;
+static void
+release_script_chars(ScriptChars* chars)
+{
+    PyMem_Free(chars->buffer);
+    chars->buffer = NULL;
+    Py_CLEAR(chars->unicode);
 }
 
 /** MODULE INITIALIZATION
@@ -86,6 +160,9 @@ static PyMethodDef module_methods[] = {
      {NULL, NULL, 0, NULL}        /* Sentinel */
 };
 
+static void
+RegisterParserContextType(PyObject* module);
+
 PyMODINIT_FUNC
 initpyspidermonkey(void) {
     PyObject* module;
@@ -111,6 +188,9 @@ initpyspidermonkey(void) {
     for (i = 0; i < ARRAY_COUNT(tokens); i++) {
         if (PyObject_SetAttrString(tok, tokens[i], PyLong_FromLong(TOK_TO_NUM(i))) == -1)
             return;
+        token_nums[i] = PyInt_FromLong(TOK_TO_NUM(i));
+        if (!token_nums[i])
+            return;
     }
 
     /* set up opcodes */
@@ -126,9 +206,24 @@ initpyspidermonkey(void) {
             opcode += 5;
         if (PyObject_SetAttrString(op, opcode, PyLong_FromLong(OPCODE_TO_NUM(i))) == -1)
             return;
+        opcode_nums[i] = PyInt_FromLong(OPCODE_TO_NUM(i));
+        if (!opcode_nums[i])
+            return;
     }
 
+    c_comment = PyString_InternFromString("c_comment");
+    if (!c_comment)
+        return;
+    cpp_comment = PyString_InternFromString("cpp_comment");
+    if (!cpp_comment)
+        return;
+
+    if (PyModule_AddIntConstant(module, "PARSER_STACK_SIZE", PARSER_STACK_SIZE) == -1)
+        return;
+
+    RegisterNodeType(module);
     RegisterNodePosType(module);
+    RegisterParserContextType(module);
 }
 
 PyMODINIT_FUNC
@@ -140,11 +235,43 @@ initpyspidermonkey_d(void) {
 /** MODULE IMPLEMENTATION
  */
 
+typedef struct ScannedComment {
+    JSBool multiline;
+    ptrdiff_t begin;
+    ptrdiff_t end;
+} ScannedComment;
+
+typedef struct ReportedError {
+    long int line;
+    long int col;
+    uintN number;
+} ReportedError;
+
+/* The parser runs without the GIL, so nothing may call into Python until it
+ * returns. Errors and comments are collected in C arrays, which are allocated
+ * with malloc, and passed on afterwards. Errors are passed to error_callback
+ * or, if it is NULL, appended to error_list.
+ */
 typedef struct JSContextData {
-    PyObject* node_class;
+    PyTypeObject* node_class;
     PyObject* error_callback;
+    PyObject* error_list;
     long int first_lineno;
     long int first_index;
+
+    ReportedError* errors;
+    size_t error_count;
+    size_t error_size;
+
+    /* If comments is a list, the comments found by the scanner are kept in
+     * scanned and appended to it after parsing.
+     */
+    PyObject* comments;
+    ScannedComment* scanned;
+    size_t scanned_count;
+    size_t scanned_size;
+
+    JSBool alloc_failed;
 } JSContextData;
 
 static long int
@@ -170,21 +297,85 @@ to_pyjsl_pos(JSContextData* data, JSTokenPtr ptr) {
     return newptr;
 }
 
+/* Makes room for one more item in an array allocated with malloc. Returns
+ * JS_FALSE if it cannot be grown. This is safe to call without the GIL.
+ */
+static JSBool
+grow_array(void** items, size_t count, size_t* size, size_t item_size)
+{
+    void* grown;
+    size_t new_size;
+
+    if (count < *size)
+        return JS_TRUE;
+
+    new_size = *size ? *size * 2 : 64;
+    grown = realloc(*items, new_size * item_size);
+    if (!grown)
+        return JS_FALSE;
+    *items = grown;
+    *size = new_size;
+    return JS_TRUE;
+}
+
 static void
 error_reporter(JSContext* cx, const char* message, JSErrorReport* report)
 {
     JSContextData* data = JS_GetContextPrivate(cx);
-    long int line = to_pyjsl_lineno(data, report->lineno);
-    long int col = -1;
+    ReportedError* error;
+
+    if (!data || data->alloc_failed)
+        return;
 
+    if (!grow_array((void**)&data->errors, data->error_count,
+                    &data->error_size, sizeof(ReportedError))) {
+        data->alloc_failed = JS_TRUE;
+        return;
+    }
+
+    error = &data->errors[data->error_count++];
+    error->line = to_pyjsl_lineno(data, report->lineno);
+    error->col = -1;
+    error->number = report->errorNumber;
     if (report->uclinebuf) {
-        col = report->uctokenptr - report->uclinebuf;
-        col = to_pyjsl_index(data, report->lineno, col);
+        error->col = report->uctokenptr - report->uclinebuf;
+        error->col = to_pyjsl_index(data, report->lineno, error->col);
     }
+}
 
-    // TODO: Check return value
-    (void)PyObject_CallFunction(data->error_callback, "lls",
-        line, col, error_names[report->errorNumber]);
+/* Passes the errors reported while parsing to the error callback or appends
+ * them to the error list as (line, col, name) tuples, in order. Returns 0 with
+ * an exception set on failure.
+ */
+static int
+pass_errors(JSContextData* data)
+{
+    size_t i;
+    PyObject* result;
+    ReportedError* error;
+
+    for (i = 0; i < data->error_count; i++) {
+        error = &data->errors[i];
+        if (data->error_callback) {
+            result = PyObject_CallFunction(data->error_callback, "lls",
+                error->line, error->col, error_names[error->number]);
+            if (!result)
+                return 0;
+            Py_DECREF(result);
+        }
+        else {
+            result = Py_BuildValue("lls", error->line, error->col,
+                                   error_names[error->number]);
+            if (!result)
+                return 0;
+            if (PyList_Append(data->error_list, result) == -1) {
+                Py_DECREF(result);
+                return 0;
+            }
+            Py_DECREF(result);
+        }
+    }
+    return 1;
 }
 
 static PyObject*
@@ -209,59 +400,85 @@ atom_to_string(JSAtom* atom) {
     return jsstring_to_py(ATOM_TO_STRING(atom));
 }
 
-/* returns 0 on success and -1 on failure */
-static PyObject*
-jsnode_to_pynode(JSContext* context, JSParseNode* jsnode) {
-    JSContextData* data = JS_GetContextPrivate(context);
-    PyObject* pynode = NULL;
-    PyObject* kids = NULL;
-    JSTokenPtr tokenptr;
-
-    /* TODO: make sure no tuple item already exists */
+/* Returns the number of kids of a parse node. */
+static int
+count_kids(JSParseNode* jsnode) {
+    switch (jsnode->pn_arity) {
+    case PN_LIST:
+        return jsnode->pn_count;
+    case PN_TERNARY:
+        return 3;
+    case PN_BINARY:
+        return 2;
+    case PN_FUNC:
+    case PN_UNARY:
+    case PN_NAME:
+        return 1;
+    default:
+        return 0;
+    }
+}
 
-    if (!jsnode) {
-        Py_INCREF(Py_None);
-        return Py_None;
+/* Returns a kid of a parse node that is not a list. */
+static JSParseNode*
+get_kid(JSParseNode* jsnode, int i) {
+    switch (jsnode->pn_arity) {
+    case PN_FUNC:
+        return jsnode->pn_body;
+    case PN_TERNARY:
+        return i == 0 ? jsnode->pn_kid1 : i == 1 ? jsnode->pn_kid2 : jsnode->pn_kid3;
+    case PN_BINARY:
+        return i == 0 ? jsnode->pn_left : jsnode->pn_right;
+    case PN_UNARY:
+        return jsnode->pn_kid;
+    case PN_NAME:
+        return jsnode->pn_expr;
+    default:
+        return NULL;
     }
+}
 
-    /* pass in a dictionary of options */
-    pynode = PyInstance_New(data->node_class, NULL, NULL);
+/* Creates a node without its kids. Its kids tuple is allocated but empty.
+ * Returns a new reference, or NULL with an exception set.
+ */
+static NodeObject*
+create_pynode(JSContext* context, JSParseNode* jsnode) {
+    JSContextData* data = JS_GetContextPrivate(context);
+    NodeObject* pynode = NULL;
+    JSTokenPtr tokenptr;
+
+    pynode = (NodeObject*)data->node_class->tp_alloc(data->node_class, 0);
     if (!pynode)
         goto fail;
 
     Py_INCREF(Py_None);
-    if (PyObject_SetAttrString(pynode, "parent", Py_None) == -1)
-        goto fail;
+    pynode->parent = Py_None;
     Py_INCREF(Py_None);
-    if (PyObject_SetAttrString(pynode, "node_index", Py_None) == -1)
-        goto fail;
-    if (PyObject_SetAttrString(pynode, "kind", Py_BuildValue("i", TOK_TO_NUM(jsnode->pn_type))) == -1)
-        goto fail;
+    pynode->node_index = Py_None;
+    pynode->kind = token_nums[jsnode->pn_type];
+    Py_INCREF(pynode->kind);
+    pynode->opcode = opcode_nums[jsnode->pn_op];
+    Py_INCREF(pynode->opcode);
 
     /* pass the position */
     tokenptr = to_pyjsl_pos(data, jsnode->pn_pos.begin);
-    if (PyObject_SetAttrString(pynode, "_start_line", Py_BuildValue("i", tokenptr.lineno)) == -1)
-        goto fail;
-    if (PyObject_SetAttrString(pynode, "_start_col", Py_BuildValue("i", tokenptr.index)) == -1)
-        goto fail;
+    pynode->start_line = tokenptr.lineno;
+    pynode->start_col = tokenptr.index;
     tokenptr = to_pyjsl_pos(data, jsnode->pn_pos.end);
-    if (PyObject_SetAttrString(pynode, "_end_line", Py_BuildValue("i", tokenptr.lineno)) == -1)
-        goto fail;
-    if (PyObject_SetAttrString(pynode, "_end_col", Py_BuildValue("i", tokenptr.index)) == -1)
-        goto fail;
+    pynode->end_line = tokenptr.lineno;
+    pynode->end_col = tokenptr.index;
 
     if ((jsnode->pn_type == TOK_NAME || jsnode->pn_type == TOK_DOT ||
         jsnode->pn_type == TOK_STRING) && ATOM_IS_STRING(jsnode->pn_atom)) {
         /* Convert the atom to a string. */
-        if (PyObject_SetAttrString(pynode, "atom", atom_to_string(jsnode->pn_atom)) == -1)
+        pynode->atom = atom_to_string(jsnode->pn_atom);
+        if (!pynode->atom)
             goto fail;
     }
 
-    if (PyObject_SetAttrString(pynode, "opcode", Py_BuildValue("i", OPCODE_TO_NUM(jsnode->pn_op))) == -1)
-        goto fail;
-
     if (jsnode->pn_type == TOK_NUMBER) {
-        if (PyObject_SetAttrString(pynode, "dval", Py_BuildValue("d", jsnode->pn_dval)) == -1)
+        pynode->dval = PyFloat_FromDouble(jsnode->pn_dval);
+        if (!pynode->dval)
             goto fail;
     }
 
@@ -270,27 +487,31 @@ jsnode_to_pynode(JSContext* context, JSParseNode* jsnode) {
         JSFunction* function = (JSFunction *) JS_GetPrivate(context, object);
         JSScope* scope = OBJ_SCOPE(object);
         JSScopeProperty* scope_property;
-        PyObject* fn_name;
         PyObject* fn_args;
         uint32 i;
         JSPropertyDescArray props = {0, NULL};
 
         /* get the function name */
         if (function->atom) {
-            fn_name = atom_to_string(function->atom);
+            pynode->fn_name = atom_to_string(function->atom);
+            if (!pynode->fn_name)
+                goto fail;
         }
         else {
             Py_INCREF(Py_None);
-            fn_name = Py_None;
+            pynode->fn_name = Py_None;
         }
-        if (PyObject_SetAttrString(pynode, "fn_name", fn_name) == -1)
-            goto fail;
 
         /* get the function arguments */
         if (!JS_GetPropertyDescArray(context, object, &props))
             props.length = 0;
 
         fn_args = PyTuple_New(function->nargs);
+        if (!fn_args) {
+            JS_PutPropertyDescArray(context, &props);
+            goto fail;
+        }
+        pynode->fn_args = fn_args;
         for (i = 0; i < props.length; i++) {
             PyObject* name;
             if ((props.array[i].flags & JSPD_ARGUMENT) == 0)
@@ -298,6 +519,7 @@ jsnode_to_pynode(JSContext* context, JSParseNode* jsnode) {
             name = jsstring_to_py(JSVAL_TO_STRING(props.array[i].id));
             PyTuple_SET_ITEM(fn_args, props.array[i].slot, name);
         }
+        JS_PutPropertyDescArray(context, &props);
 
         /* Duplicate parameters are not included in the desc array. Go back and add them in. */
         for (scope_property = SCOPE_LAST_PROP(scope);
@@ -313,91 +535,128 @@ jsnode_to_pynode(JSContext* context, JSParseNode* jsnode) {
             name = atom_to_string(JSID_TO_ATOM(scope_property->id));
             PyTuple_SET_ITEM(fn_args, (uint16)scope_property->shortid, name);
         }
-        if (PyObject_SetAttrString(pynode, "fn_args", fn_args) == -1)
-            goto fail;
     }
     else if (jsnode->pn_type == TOK_RB) {
-        PyObject* end_comma = PyBool_FromLong(jsnode->pn_extra & PNX_ENDCOMMA);
-        if (PyObject_SetAttrString(pynode, "end_comma", end_comma) == -1)
-            goto fail;
+        pynode->end_comma = PyBool_FromLong(jsnode->pn_extra & PNX_ENDCOMMA);
     }
 
-    if (PyObject_SetAttrString(pynode, "no_semi", PyBool_FromLong(jsnode->pn_no_semi)) == -1)
-        goto fail;
+    pynode->no_semi = PyBool_FromLong(jsnode->pn_no_semi);
 
-    switch (jsnode->pn_arity) {
-    case PN_FUNC:
-        kids = PyTuple_New(1);
-        PyTuple_SET_ITEM(kids, 0, jsnode_to_pynode(context, jsnode->pn_body));
-        break;
-
-    case PN_LIST: {
-        JSParseNode* p;
-        int i;
-        kids = PyTuple_New(jsnode->pn_count);
-        for (i = 0, p = jsnode->pn_head; p; p = p->pn_next, i++) {
-            PyTuple_SET_ITEM(kids, i, jsnode_to_pynode(context, p));
-        }
-    }
-    break;
+    pynode->kids = PyTuple_New(count_kids(jsnode));
+    if (!pynode->kids)
+        goto fail;
 
-    case PN_TERNARY:
-        kids = PyTuple_New(3);
-        PyTuple_SET_ITEM(kids, 0, jsnode_to_pynode(context, jsnode->pn_kid1));
-        PyTuple_SET_ITEM(kids, 1, jsnode_to_pynode(context, jsnode->pn_kid2));
-        PyTuple_SET_ITEM(kids, 2, jsnode_to_pynode(context, jsnode->pn_kid3));
-        break;
+    return pynode;
 
-    case PN_BINARY:
-        kids = PyTuple_New(2);
-        PyTuple_SET_ITEM(kids, 0, jsnode_to_pynode(context, jsnode->pn_left));
-        PyTuple_SET_ITEM(kids, 1, jsnode_to_pynode(context, jsnode->pn_right));
-        break;
+fail:
+    Py_XDECREF(pynode);
+    return NULL;
+}
 
-    case PN_UNARY:
-        kids = PyTuple_New(1);
-        PyTuple_SET_ITEM(kids, 0, jsnode_to_pynode(context, jsnode->pn_kid));
-        break;
+/* Converts the tree using an explicit stack so that deeply nested scripts do
+ * not overflow the C stack. Returns a new reference, or NULL with an
+ * exception set.
+ */
+static PyObject*
+jsnode_to_pynode(JSContext* context, JSParseNode* jsnode) {
+    typedef struct {
+        JSParseNode* jsnode;
+        NodeObject* pynode;
+        JSParseNode* next_list_kid;
+        int index;
+    } Frame;
 
-    case PN_NAME:
-        kids = PyTuple_New(1);
-        PyTuple_SET_ITEM(kids, 0, jsnode_to_pynode(context, jsnode->pn_expr));
-        break;
+    Frame* stack = NULL;
+    Frame* frame;
+    int depth = 0;
+    int capacity = 0;
+    NodeObject* root;
 
-    case PN_NULLARY:
-        kids = PyTuple_New(0);
-        break;
+    if (!jsnode) {
+        Py_INCREF(Py_None);
+        return Py_None;
     }
 
-    if (!kids)
-        goto fail;
+    root = create_pynode(context, jsnode);
+    if (!root)
+        return NULL;
 
-    if (PyObject_SetAttrString(pynode, "kids", kids) == -1)
+    capacity = 64;
+    stack = PyMem_New(Frame, capacity);
+    if (!stack) {
+        PyErr_NoMemory();
         goto fail;
+    }
+    stack[0].jsnode = jsnode;
+    stack[0].pynode = root;
+    stack[0].next_list_kid = jsnode->pn_arity == PN_LIST ? jsnode->pn_head : NULL;
+    stack[0].index = 0;
+    depth = 1;
+
+    while (depth) {
+        JSParseNode* kid;
+        NodeObject* pykid;
+        int index;
+
+        frame = &stack[depth-1];
+        if (frame->index == PyTuple_GET_SIZE(frame->pynode->kids)) {
+            depth--;
+            continue;
+        }
 
-    {
-        int i;
-        for (i = 0; i < PyTuple_GET_SIZE(kids); i++) {
-            PyObject* kid = PyTuple_GET_ITEM(kids, i);
-            if (!kid)
+        index = frame->index++;
+        if (frame->jsnode->pn_arity == PN_LIST) {
+            kid = frame->next_list_kid;
+            if (!kid) {
+                PyErr_SetString(PyExc_StandardError, "list node is too short");
                 goto fail;
-            if (kid == Py_None)
-                continue;
+            }
+            frame->next_list_kid = kid->pn_next;
+        }
+        else {
+            kid = get_kid(frame->jsnode, index);
+        }
 
-            Py_INCREF(pynode);
-            if (PyObject_SetAttrString(kid, "parent", pynode) == -1)
-                goto fail;
-            if (PyObject_SetAttrString(kid, "node_index", Py_BuildValue("i", i)) == -1)
+        if (!kid) {
+            Py_INCREF(Py_None);
+            PyTuple_SET_ITEM(frame->pynode->kids, index, Py_None);
+            continue;
+        }
+
+        pykid = create_pynode(context, kid);
+        if (!pykid)
+            goto fail;
+        PyTuple_SET_ITEM(frame->pynode->kids, index, (PyObject*)pykid);
+
+        /* The kid was just created, so its parent and index are None. */
+        Py_DECREF(pykid->parent);
+        Py_INCREF(frame->pynode);
+        pykid->parent = (PyObject*)frame->pynode;
+        Py_DECREF(pykid->node_index);
+        pykid->node_index = PyInt_FromLong(index);
+        if (!pykid->node_index)
+            goto fail;
+
+        if (depth == capacity) {
+            capacity *= 2;
+            if (!PyMem_Resize(stack, Frame, capacity)) {
+                PyErr_NoMemory();
                 goto fail;
+            }
         }
+        frame = &stack[depth++];
+        frame->jsnode = kid;
+        frame->pynode = pykid;
+        frame->next_list_kid = kid->pn_arity == PN_LIST ? kid->pn_head : NULL;
+        frame->index = 0;
     }
 
-    return pynode;
+    PyMem_Free(stack);
+    return (PyObject*)root;
 
 fail:
-    if (pynode) {
-        Py_XDECREF(pynode);
-    }
+    PyMem_Free(stack);
+    Py_DECREF(root);
     return NULL;
 }
 
@@ -445,11 +704,198 @@ static const char* create_jscontext(const char* strversion, PyObject* is_e4x,
 }
 
 
+static void
+set_stack_limit(JSContext* context)
+{
+    int stack_dummy;
+#if JS_STACK_GROWTH_DIRECTION > 0
+    JS_SetThreadStackLimit(context, (jsuword)&stack_dummy + PARSER_STACK_SIZE);
+#else
+    JS_SetThreadStackLimit(context, (jsuword)&stack_dummy - PARSER_STACK_SIZE);
+#endif
+}
+
+static int
+check_node_class(PyTypeObject* node_class)
+{
+    if (!PyType_Check((PyObject*)node_class) || !PyType_IsSubtype(node_class, &NodeType)) {
+        PyErr_SetString(PyExc_ValueError, "\"node_class\" must be a subclass of Node");
+        return 0;
+    }
+    return 1;
+}
+
+static void
+comment_handler(JSTokenStream* ts, JSBool multiline, ptrdiff_t begin,
+                ptrdiff_t end, void* closure)
+{
+    JSContextData* data = closure;
+    ScannedComment* scanned;
+
+    if (data->alloc_failed)
+        return;
+
+    if (!grow_array((void**)&data->scanned, data->scanned_count,
+                    &data->scanned_size, sizeof(ScannedComment))) {
+        data->alloc_failed = JS_TRUE;
+        return;
+    }
+
+    scanned = &data->scanned[data->scanned_count++];
+    scanned->multiline = multiline;
+    scanned->begin = begin;
+    scanned->end = end;
+}
+
+/* Appends the scanned comments to the list of comments as (start, end, kind)
+ * tuples. The offsets are converted from the UTF-16 buffer to the script,
+ * which, on wide builds, counts surrogate pairs as one character. Returns 0
+ * with an exception set on failure.
+ */
+static int
+append_comments(JSContextData* data, const jschar* chars, size_t length)
+{
+    size_t i;
+    ptrdiff_t offsets[2];
+    ptrdiff_t scanned = 0;
+    ptrdiff_t skipped = 0;
+    PyObject* comment;
+    int j;
+
+    for (i = 0; i < data->scanned_count; i++) {
+        offsets[0] = data->scanned[i].begin;
+        offsets[1] = data->scanned[i].end;
+
+        /* The comments are in order, so the buffer is only scanned once. */
+        for (j = 0; j < 2; j++) {
+            for (; scanned < offsets[j]; scanned++) {
+#ifdef Py_UNICODE_WIDE
+                if (chars[scanned] >= 0xDC00 && chars[scanned] <= 0xDFFF &&
+                    scanned > 0 &&
+                    chars[scanned-1] >= 0xD800 && chars[scanned-1] <= 0xDBFF)
+                    skipped++;
+#endif
+            }
+            offsets[j] -= skipped;
+        }
+
+        comment = Py_BuildValue("nnO", offsets[0], offsets[1],
+                                data->scanned[i].multiline ? c_comment : cpp_comment);
+        if (!comment)
+            return 0;
+        if (PyList_Append(data->comments, comment) == -1) {
+            Py_DECREF(comment);
+            return 0;
+        }
+        Py_DECREF(comment);
+    }
+    return 1;
+}
+
+/* Builds SpiderMonkey's own tree for the script. This does not touch any
+ * Python objects, so it is called without the GIL.
+ *
+ * Returns NULL on success. Otherwise, it returns an error.
+ */
+static const char*
+build_jstree(JSContext* context, JSObject* global, JSContextData* ctx_data,
+             const jschar* chars, size_t length, JSTokenStream** token_stream,
+             JSParseNode** jsnode)
+{
+    set_stack_limit(context);
+
+    *token_stream = js_NewBufferTokenStream(context, chars, length);
+    if (!*token_stream)
+        return "cannot create token stream";
+    if (ctx_data->comments) {
+        (*token_stream)->commentHandler = comment_handler;
+        (*token_stream)->commentHandlerData = ctx_data;
+    }
+
+    *jsnode = js_ParseTokenStream(context, global, *token_stream);
+    if (!*jsnode) {
+        if (!JS_ReportPendingException(context))
+            return "parse error in file";
+    }
+    return NULL;
+}
+
+/* Parses the script with an existing context. The token stream and the parse
+ * nodes are allocated from the context's temporary pool, which is released
+ * before returning so that the context can be used again. The GIL is released
+ * while the script is parsed, and the tree is converted to Python nodes after
+ * it is taken again.
+ *
+ * Returns NULL on success. Otherwise, it returns an error. If the error is
+ * blank, an exception will be set.
+ */
+static const char*
+parse_script(JSContext* context, JSObject* global, JSContextData* ctx_data,
+             const ScriptChars* script, PyObject** pynode)
+{
+    JSTokenStream* token_stream = NULL;
+    JSParseNode* jsnode = NULL;
+    void* mark;
+    const char* error;
+
+    JS_SetContextPrivate(context, ctx_data);
+    mark = JS_ARENA_MARK(&context->tempPool);
+
+    Py_BEGIN_ALLOW_THREADS
+    error = build_jstree(context, global, ctx_data, script->chars,
+                         script->length, &token_stream, &jsnode);
+    Py_END_ALLOW_THREADS
+
+    if (ctx_data->alloc_failed) {
+        PyErr_NoMemory();
+        error = "";
+        goto cleanup;
+    }
+    if (!pass_errors(ctx_data)) {
+        error = "";
+        goto cleanup;
+    }
+    if (error)
+        goto cleanup;
+
+    /* Function objects are only referenced through atoms in the parse tree.
+     * Keep them alive in case the conversion triggers a collection.
+     */
+    JS_KEEP_ATOMS(context->runtime);
+    *pynode = jsnode_to_pynode(context, jsnode);
+    JS_UNKEEP_ATOMS(context->runtime);
+    if (!*pynode) {
+        error = "";
+        goto cleanup;
+    }
+
+    if (ctx_data->comments &&
+        !append_comments(ctx_data, script->chars, script->length)) {
+        Py_CLEAR(*pynode);
+        error = "";
+        goto cleanup;
+    }
+
+    error = NULL;
+
+cleanup:
+    free(ctx_data->errors);
+    ctx_data->errors = NULL;
+    free(ctx_data->scanned);
+    ctx_data->scanned = NULL;
+    if (token_stream)
+        js_CloseTokenStream(context, token_stream);
+    JS_ARENA_RELEASE(&context->tempPool, mark);
+    JS_ClearPendingException(context);
+    JS_SetContextPrivate(context, NULL);
+    return error;
+}
+
 static PyObject*
 module_parse(PyObject *self, PyObject *args) {
     struct {
-        char* scriptbuf;
-        int scriptbuflen;
+        PyObject* script;
+        ScriptChars chars;
         const char* jsversion;
         PyObject* is_e4x;
         PyObject* pynode;
@@ -457,8 +903,6 @@ module_parse(PyObject *self, PyObject *args) {
         JSRuntime* runtime;
         JSContext* context;
         JSObject* global;
-        JSTokenStream* token_stream;
-        JSParseNode* jsnode;
 
         JSContextData ctx_data;
     } m;
@@ -468,58 +912,38 @@ module_parse(PyObject *self, PyObject *args) {
     error = "encountered an unknown error";
 
     /* validate arguments */
-    if (!PyArg_ParseTuple(args, "es#sO!OOll", "utf16", &m.scriptbuf,
-        &m.scriptbuflen, &m.jsversion, &PyBool_Type, &m.is_e4x,
+    if (!PyArg_ParseTuple(args, "OsO!OOll", &m.script,
+        &m.jsversion, &PyBool_Type, &m.is_e4x,
         &m.ctx_data.node_class, &m.ctx_data.error_callback,
         &m.ctx_data.first_lineno, &m.ctx_data.first_index)) {
         return NULL;
     }
 
-    if (!PyCallable_Check(m.ctx_data.node_class)) {
-        PyErr_SetString(PyExc_ValueError, "\"node_class\" must be callable");
+    if (!check_node_class(m.ctx_data.node_class))
         return NULL;
-    }
 
     if (!PyCallable_Check(m.ctx_data.error_callback)) {
         PyErr_SetString(PyExc_ValueError, "\"error\" must be callable");
         return NULL;
     }
 
-    error = create_jscontext(m.jsversion, m.is_e4x, &m.ctx_data,
+    if (!get_script_chars(m.script, &m.chars))
+        return NULL;
+
+    error = create_jscontext(m.jsversion, m.is_e4x, NULL,
                              &m.runtime, &m.context, &m.global);
     if (error)
         goto cleanup;
 
-    m.token_stream = js_NewBufferTokenStream(m.context, tojschar(m.scriptbuf),
-                                             tojscharlen(m.scriptbuflen));
-    if (!m.token_stream) {
-        error = "cannot create token stream";
-        goto cleanup;
-    }
-
-    m.jsnode = js_ParseTokenStream(m.context, m.global, m.token_stream);
-    if (!m.jsnode) {
-        if (!JS_ReportPendingException(m.context)) {
-            error = "parse error in file";
-            goto cleanup;
-        }
-    }
-
-    m.pynode = jsnode_to_pynode(m.context, m.jsnode);
-    if (!m.pynode) {
-        error = "";
-        goto cleanup;
-    }
-
-    error = NULL;
+    error = parse_script(m.context, m.global, &m.ctx_data, &m.chars,
+                         &m.pynode);
 
 cleanup:
     if (m.context)
         JS_DestroyContext(m.context);
     if (m.runtime)
         JS_DestroyRuntime(m.runtime);
-    if (m.scriptbuf)
-        PyMem_Free(m.scriptbuf);
+    release_script_chars(&m.chars);
 
     if (error) {
         if (*error) {
@@ -530,11 +954,26 @@ cleanup:
     return m.pynode;
 }
 
+static JSBool
+check_compilable_unit(JSContext* context, JSObject* global,
+                      const ScriptChars* script)
+{
+    JSBool is_compilable;
+
+    Py_BEGIN_ALLOW_THREADS
+    set_stack_limit(context);
+    is_compilable = JS_UCBufferIsCompilableUnit(context, global,
+                                                script->chars, script->length);
+    JS_ClearPendingException(context);
+    Py_END_ALLOW_THREADS
+    return is_compilable;
+}
+
 static PyObject*
 is_compilable_unit(PyObject *self, PyObject *args) {
     struct {
-        char* scriptbuf;
-        int scriptbuflen;
+        PyObject* script;
+        ScriptChars chars;
         const char* jsversion;
         PyObject* is_e4x;
         JSRuntime* runtime;
@@ -547,19 +986,20 @@ is_compilable_unit(PyObject *self, PyObject *args) {
     memset(&m, 0, sizeof(m));
     error = "encountered an unknown error";
 
-    if (!PyArg_ParseTuple(args, "es#sO!", "utf16", &m.scriptbuf,
-        &m.scriptbuflen, &m.jsversion, &PyBool_Type, &m.is_e4x)) {
+    if (!PyArg_ParseTuple(args, "OsO!", &m.script, &m.jsversion,
+        &PyBool_Type, &m.is_e4x)) {
         return NULL;
     }
 
+    if (!get_script_chars(m.script, &m.chars))
+        return NULL;
+
     error = create_jscontext(m.jsversion, m.is_e4x, NULL,
                              &m.runtime, &m.context, &m.global);
     if (error)
         goto cleanup;
 
-    m.is_compilable = JS_UCBufferIsCompilableUnit(m.context, m.global,
-                                                  tojschar(m.scriptbuf),
-                                                  tojscharlen(m.scriptbuflen));
+    m.is_compilable = check_compilable_unit(m.context, m.global, &m.chars);
     error = NULL;
 
 cleanup:
@@ -567,8 +1007,7 @@ cleanup:
         JS_DestroyContext(m.context);
     if (m.runtime)
         JS_DestroyRuntime(m.runtime);
-    if (m.scriptbuf)
-        PyMem_Free(m.scriptbuf);
+    release_script_chars(&m.chars);
 
     if (error) {
         if (*error)
@@ -594,3 +1033,353 @@ is_valid_version(PyObject *self, PyObject *args) {
         Py_RETURN_FALSE;
 }
 
+
+
+/** PARSER CONTEXT
+ *
+ * Creating a runtime, a context and a global object with its standard classes
+ * costs far more than parsing a typical script. A ParserContext keeps them for
+ * a single version and E4X setting so that they can be reused across parses.
+ */
+
+typedef struct {
+    PyObject_HEAD
+    JSRuntime* runtime;
+    JSContext* context;
+    JSObject* global;
+
+    /* Set while a thread is parsing without the GIL. */
+    int busy;
+} ParserContextObject;
+
+static void
+ParserContext_dealloc(ParserContextObject* self)
+{
+    if (self->context)
+        JS_DestroyContext(self->context);
+    if (self->runtime)
+        JS_DestroyRuntime(self->runtime);
+    self->ob_type->tp_free((PyObject*)self);
+}
+
+static int
+ParserContext_init(ParserContextObject* self, PyObject* args, PyObject* kwds)
+{
+    static char* kwlist[] = {"version", "is_e4x", NULL};
+    const char* jsversion;
+    PyObject* is_e4x;
+    const char* error;
+
+    if (self->runtime) {
+        PyErr_SetString(PyExc_StandardError, "context is already initialized");
+        return -1;
+    }
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "sO!", kwlist, &jsversion,
+                                     &PyBool_Type, &is_e4x))
+        return -1;
+
+    error = create_jscontext(jsversion, is_e4x, NULL,
+                             &self->runtime, &self->context, &self->global);
+    if (error) {
+        if (*error)
+            PyErr_SetString(PyExc_StandardError, error);
+        return -1;
+    }
+    return 0;
+}
+
+static int
+ParserContext_check(ParserContextObject* self)
+{
+    if (!self->global) {
+        PyErr_SetString(PyExc_StandardError, "context is not initialized");
+        return 0;
+    }
+    return 1;
+}
+
+/* Marks the context as busy before the GIL is released. Returns 0 with an
+ * exception set if another thread is using it.
+ */
+static int
+ParserContext_acquire(ParserContextObject* self)
+{
+    if (self->busy) {
+        PyErr_SetString(PyExc_StandardError, "context is in use by another thread");
+        return 0;
+    }
+    self->busy = 1;
+    return 1;
+}
+
+static PyObject*
+ParserContext_parse(ParserContextObject* self, PyObject* args)
+{
+    PyObject* script;
+    ScriptChars chars;
+    JSContextData ctx_data;
+    PyObject* pynode = NULL;
+    const char* error;
+
+    if (!ParserContext_check(self))
+        return NULL;
+
+    memset(&ctx_data, 0, sizeof(ctx_data));
+    if (!PyArg_ParseTuple(args, "OOOll|O!", &script,
+        &ctx_data.node_class, &ctx_data.error_callback,
+        &ctx_data.first_lineno, &ctx_data.first_index,
+        &PyList_Type, &ctx_data.comments)) {
+        return NULL;
+    }
+
+    if (!check_node_class(ctx_data.node_class))
+        return NULL;
+
+    if (!PyCallable_Check(ctx_data.error_callback)) {
+        PyErr_SetString(PyExc_ValueError, "\"error\" must be callable");
+        return NULL;
+    }
+
+    if (!get_script_chars(script, &chars))
+        return NULL;
+
+    if (!ParserContext_acquire(self)) {
+        release_script_chars(&chars);
+        return NULL;
+    }
+    error = parse_script(self->context, self->global, &ctx_data, &chars,
+                         &pynode);
+    release_script_chars(&chars);
+
+    /* Collect the function objects and atoms from this parse once enough
+     * garbage has accumulated.
+     */
+    JS_MaybeGC(self->context);
+    self->busy = 0;
+
+    if (error) {
+        if (*error)
+            PyErr_SetString(PyExc_StandardError, error);
+        return NULL;
+    }
+    return pynode;
+}
+
+/* Parses one (script, first_lineno, first_index) tuple for parse_many and
+ * returns a new (root, errors, comments) tuple, or NULL with an exception set.
+ * The context must already be acquired.
+ */
+static PyObject*
+ParserContext_parse_item(ParserContextObject* self, PyObject* item,
+                         PyTypeObject* node_class, int want_comments)
+{
+    PyObject* script;
+    ScriptChars chars;
+    JSContextData ctx_data;
+    PyObject* pynode = NULL;
+    PyObject* errors = NULL;
+    PyObject* comments = NULL;
+    const char* error;
+
+    if (!PyTuple_Check(item)) {
+        PyErr_SetString(PyExc_TypeError,
+                        "each script must be a (script, line, col) tuple");
+        return NULL;
+    }
+
+    memset(&ctx_data, 0, sizeof(ctx_data));
+    if (!PyArg_ParseTuple(item, "Oll", &script,
+        &ctx_data.first_lineno, &ctx_data.first_index)) {
+        return NULL;
+    }
+
+    if (!get_script_chars(script, &chars))
+        return NULL;
+
+    errors = PyList_New(0);
+    if (!errors)
+        goto fail;
+    if (want_comments) {
+        comments = PyList_New(0);
+        if (!comments)
+            goto fail;
+    }
+    else {
+        Py_INCREF(Py_None);
+        comments = Py_None;
+    }
+
+    ctx_data.node_class = node_class;
+    ctx_data.error_list = errors;
+    ctx_data.comments = want_comments ? comments : NULL;
+    error = parse_script(self->context, self->global, &ctx_data, &chars,
+                         &pynode);
+    release_script_chars(&chars);
+    JS_MaybeGC(self->context);
+
+    if (error) {
+        if (*error)
+            PyErr_SetString(PyExc_StandardError, error);
+        goto fail;
+    }
+    return Py_BuildValue("NNN", pynode, errors, comments);
+
+fail:
+    release_script_chars(&chars);
+    Py_XDECREF(errors);
+    Py_XDECREF(comments);
+    return NULL;
+}
+
+static PyObject*
+ParserContext_parse_many(ParserContextObject* self, PyObject* args)
+{
+    PyObject* scripts;
+    PyTypeObject* node_class;
+    PyObject* want_comments = Py_False;
+    PyObject* items;
+    PyObject* results;
+    PyObject* result;
+    Py_ssize_t i;
+
+    if (!ParserContext_check(self))
+        return NULL;
+
+    if (!PyArg_ParseTuple(args, "OO|O!", &scripts, &node_class,
+                          &PyBool_Type, &want_comments))
+        return NULL;
+
+    if (!check_node_class(node_class))
+        return NULL;
+
+    items = PySequence_Fast(scripts, "\"scripts\" must be a sequence");
+    if (!items)
+        return NULL;
+
+    results = PyList_New(PySequence_Fast_GET_SIZE(items));
+    if (!results) {
+        Py_DECREF(items);
+        return NULL;
+    }
+
+    if (!ParserContext_acquire(self)) {
+        Py_DECREF(results);
+        Py_DECREF(items);
+        return NULL;
+    }
+    for (i = 0; i < PySequence_Fast_GET_SIZE(items); i++) {
+        result = ParserContext_parse_item(self, PySequence_Fast_GET_ITEM(items, i),
+                                          node_class, want_comments == Py_True);
+        if (!result) {
+            Py_CLEAR(results);
+            break;
+        }
+        PyList_SET_ITEM(results, i, result);
+    }
+    self->busy = 0;
+
+    Py_DECREF(items);
+    return results;
+}
+
+static PyObject*
+ParserContext_is_compilable_unit(ParserContextObject* self, PyObject* args)
+{
+    PyObject* script;
+    ScriptChars chars;
+    JSBool is_compilable;
+
+    if (!ParserContext_check(self))
+        return NULL;
+
+    if (!PyArg_ParseTuple(args, "O", &script))
+        return NULL;
+
+    if (!get_script_chars(script, &chars))
+        return NULL;
+
+    if (!ParserContext_acquire(self)) {
+        release_script_chars(&chars);
+        return NULL;
+    }
+    is_compilable = check_compilable_unit(self->context, self->global, &chars);
+    release_script_chars(&chars);
+    JS_MaybeGC(self->context);
+    self->busy = 0;
+
+    if (is_compilable)
+        Py_RETURN_TRUE;
+    else
+        Py_RETURN_FALSE;
+}
+
+static PyMethodDef
+ParserContext_methods[] = {
+    {"parse", (PyCFunction)ParserContext_parse, METH_VARARGS,
+     "Parses \"script\" and returns a tree of \"node_class\". If \"comments\" "
+     "is a list, appends the (start, end, kind) of each comment to it."},
+    {"parse_many", (PyCFunction)ParserContext_parse_many, METH_VARARGS,
+     "Parses each (script, line, col) in \"scripts\" and returns a list of "
+     "(root, errors, comments). Each error is a (line, col, name) tuple. If "
+     "\"comments\" is True, comments is a list of (start, end, kind); "
+     "otherwise it is None."},
+    {"is_compilable_unit", (PyCFunction)ParserContext_is_compilable_unit,
+     METH_VARARGS,
+     "Returns True if \"script\" is a compilable unit."},
+    {NULL}  /* Sentinel */
+};
+
+static PyTypeObject
+ParserContextType = {
+    PyObject_HEAD_INIT(NULL)
+    0,                                  /*ob_size*/
+    "pyspidermonkey.ParserContext",     /*tp_name*/
+    sizeof(ParserContextObject),        /*tp_basicsize*/
+    0,                                  /*tp_itemsize*/
+    (destructor)ParserContext_dealloc,  /*tp_dealloc*/
+    0,                                  /*tp_print*/
+    0,                                  /*tp_getattr*/
+    0,                                  /*tp_setattr*/
+    0,                                  /*tp_compare*/
+    0,                                  /*tp_repr*/
+    0,                                  /*tp_as_number*/
+    0,                                  /*tp_as_sequence*/
+    0,                                  /*tp_as_mapping*/
+    0,                                  /*tp_hash */
+    0,                                  /*tp_call*/
+    0,                                  /*tp_str*/
+    0,                                  /*tp_getattro*/
+    0,                                  /*tp_setattro*/
+    0,                                  /*tp_as_buffer*/
+    Py_TPFLAGS_DEFAULT,                 /*tp_flags*/
+    "Parses scripts for one version, reusing the runtime between parses.", /* tp_doc */
+    0,                                  /* tp_traverse */
+    0,                                  /* tp_clear */
+    0,                                  /* tp_richcompare */
+    0,                                  /* tp_weaklistoffset */
+    0,                                  /* tp_iter */
+    0,                                  /* tp_iternext */
+    ParserContext_methods,              /* tp_methods */
+    0,                                  /* tp_members */
+    0,                                  /* tp_getset */
+    0,                                  /* tp_base */
+    0,                                  /* tp_dict */
+    0,                                  /* tp_descr_get */
+    0,                                  /* tp_descr_set */
+    0,                                  /* tp_dictoffset */
+    (initproc)ParserContext_init,       /* tp_init */
+    0,                                  /* tp_alloc */
+    0,                                  /* tp_new */
+};
+
+static void
+RegisterParserContextType(PyObject* module)
+{
+    ParserContextType.tp_new = PyType_GenericNew;
+    if (PyType_Ready(&ParserContextType) < 0)
+        return;
+
+    Py_INCREF(&ParserContextType);
+    PyModule_AddObject(module, "ParserContext", (PyObject*)&ParserContextType);
+}
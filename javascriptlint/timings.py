@@ -0,0 +1,186 @@
+# vim: ts=4 sw=4 expandtab
+""" Collects the time spent in each phase of linting each file, and in each
+warning rule.
+
+Phases nest: starting a phase pauses the one that is running, so each
+second is charged to exactly one file and phase. Rule times are also counted
+in the "visitor walk" phase.
+"""
+import time
+import unittest
+
+PHASES = ('read', 'comment scan', 'parse', 'comment filter', 'visitor walk',
+          'scope analysis', 'reporting')
+_HEADINGS = ('read', 'scan', 'parse', 'filter', 'visitors', 'scope', 'report')
+
+class Timings:
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._files = {}
+        self._rules = {}
+        self._stack = []
+        self._last = None
+
+    def push(self, phase, path=None):
+        """ Starts a phase for path, or for the current file if path is None.
+        """
+        self._charge()
+        if path is None:
+            path = self._stack[-1][0]
+        self._stack.append((path, phase))
+
+    def pop(self):
+        """ Ends the current phase and resumes the one that it interrupted. """
+        self._charge()
+        self._stack.pop()
+
+    def addrule(self, rule, seconds, warned):
+        """ Records one call to the visitor for rule. """
+        try:
+            entry = self._rules[rule]
+        except KeyError:
+            entry = self._rules[rule] = [0.0, 0, 0]
+        entry[0] += seconds
+        entry[1] += 1
+        if warned:
+            entry[2] += 1
+
+    def takedata(self):
+        """ Returns and forgets the times collected so far, in a form that can
+            be passed to merge(). The current phase keeps running.
+        """
+        self._charge()
+        data = self._files, self._rules
+        self._files = {}
+        self._rules = {}
+        return data
+
+    def merge(self, data):
+        """ Adds the times returned by another instance's takedata(). """
+        files, rules = data
+        for path, phases in files.items():
+            for phase, seconds in phases.items():
+                self._addphase(path, phase, seconds)
+        for rule, (seconds, calls, warnings) in rules.items():
+            entry = self._rules.setdefault(rule, [0.0, 0, 0])
+            entry[0] += seconds
+            entry[1] += calls
+            entry[2] += warnings
+
+    def getreport(self):
+        """ Returns the times as a dictionary that can be saved as JSON. The
+            files and rules are sorted from the most to the least expensive.
+        """
+        self._charge()
+        files = []
+        for path, phases in self._files.items():
+            files.append({
+                'path': path,
+                'seconds': sum(phases.values()),
+                'phases': dict((phase, phases.get(phase, 0.0))
+                               for phase in PHASES),
+            })
+        files.sort(key=lambda file: (-file['seconds'], file['path']))
+
+        rules = []
+        for rule, (seconds, calls, warnings) in self._rules.items():
+            rules.append({
+                'rule': rule,
+                'seconds': seconds,
+                'calls': calls,
+                'warnings': warnings,
+            })
+        rules.sort(key=lambda rule: (-rule['seconds'], rule['rule']))
+
+        totals = dict((phase, sum(file['phases'][phase] for file in files))
+                      for phase in PHASES)
+        return {
+            'seconds': sum(totals.values()),
+            'phases': totals,
+            'files': files,
+            'rules': rules,
+        }
+
+    def _charge(self):
+        now = self._clock()
+        if self._stack:
+            path, phase = self._stack[-1]
+            self._addphase(path, phase, now - self._last)
+        self._last = now
+
+    def _addphase(self, path, phase, seconds):
+        try:
+            phases = self._files[path]
+        except KeyError:
+            phases = self._files[path] = {}
+        phases[phase] = phases.get(phase, 0.0) + seconds
+
+def format_report(report):
+    """ Formats the result of Timings.getreport() as text. """
+    lines = []
+    headings = ('total',) + _HEADINGS
+    lines.append('%s  %s' % (''.join('%9s' % heading for heading in headings),
+                             'file'))
+    rows = [('(all files)', report['seconds'], report['phases'])]
+    rows.extend((file['path'], file['seconds'], file['phases'])
+                for file in report['files'])
+    for path, seconds, phases in rows:
+        lines.append('%s  %s' % (''.join('%9.3f' % value for value in
+                                         [seconds] + [phases[phase] for
+                                                      phase in PHASES]),
+                                 path))
+    if report['rules']:
+        lines.append('')
+        lines.append('%9s%9s%9s  %s' % ('seconds', 'calls', 'warnings', 'rule'))
+        for rule in report['rules']:
+            lines.append('%9.3f%9i%9i  %s' % (rule['seconds'], rule['calls'],
+                                              rule['warnings'], rule['rule']))
+    return '\n'.join(lines) + '\n'
+
+class TestTimings(unittest.TestCase):
+    def testPhases(self):
+        now = [0]
+        timings = Timings(lambda: now[0])
+        timings.push('read', 'a.js')
+        now[0] += 1
+        timings.push('parse')
+        now[0] += 2
+        timings.push('read', 'b.js')
+        now[0] += 4
+        timings.pop()
+        now[0] += 8
+        timings.pop()
+        now[0] += 16
+        timings.pop()
+        now[0] += 32
+        timings.addrule('rule_a', 1, False)
+        timings.addrule('rule_b', 2, True)
+        timings.addrule('rule_a', 3, True)
+
+        report = timings.getreport()
+        self.assertEquals(report['seconds'], 31)
+        self.assertEquals([(file['path'], file['seconds'],
+                            file['phases']['read'], file['phases']['parse'])
+                           for file in report['files']],
+                          [('a.js', 27, 17, 10), ('b.js', 4, 4, 0)])
+        self.assertEquals(report['rules'], [
+            {'rule': 'rule_a', 'seconds': 4, 'calls': 2, 'warnings': 1},
+            {'rule': 'rule_b', 'seconds': 2, 'calls': 1, 'warnings': 1},
+        ])
+        self.assert_('rule_a' in format_report(report))
+
+    def testMerge(self):
+        now = [0]
+        worker = Timings(lambda: now[0])
+        worker.push('parse', 'a.js')
+        now[0] += 1
+        worker.addrule('rule', 1, True)
+        data = worker.takedata()
+        self.assertEquals(worker.getreport()['seconds'], 0)
+
+        timings = Timings(lambda: now[0])
+        timings.merge(data)
+        timings.merge(data)
+        report = timings.getreport()
+        self.assertEquals(report['phases']['parse'], 2)
+        self.assertEquals(report['rules'][0]['calls'], 2)
@@ -2,6 +2,7 @@
 """ This is an abstract module for visiting specific nodes. This is useed to
 traverse the tree to generate warnings.
 """
+import unittest
 
 def visit(event, *args):
     """ This decorator is used to indicate which nodes the function should
@@ -50,3 +51,37 @@ def make_visitors(visitors, klasses):
                     event_visitors[node_kind] = [func]
     return visitors
 
+
+def make_dispatch_table(visitors, kinds, opcodes):
+    """ Converts the visitors for one event, in the format returned by
+    make_visitors, into a table that can be indexed by integer kind and opcode:
+        table[kind - min(kinds)][opcode - min(opcodes)] = (func1, func2)
+    Functions registered for the kind come before those registered for the
+    (kind, opcode) pair. Entries without any functions are empty tuples.
+    """
+    kind_base, opcode_base = min(kinds), min(opcodes)
+    opcode_count = max(opcodes) - opcode_base + 1
+    table = [None] * (max(kinds) - kind_base + 1)
+    for kind in kinds:
+        kind_funcs = tuple(visitors.get(kind, ()))
+        row = [kind_funcs] * opcode_count
+        for opcode in opcodes:
+            opcode_funcs = visitors.get((kind, opcode))
+            if opcode_funcs:
+                row[opcode - opcode_base] = kind_funcs + tuple(opcode_funcs)
+        table[kind - kind_base] = row
+    return table
+
+class TestDispatchTable(unittest.TestCase):
+    def test(self):
+        visitors = {
+            1: ['a', 'b'],
+            (1, 11): ['c'],
+            (2, 10): ['d'],
+        }
+        table = make_dispatch_table(visitors, [1, 2, 3], [10, 11])
+        self.assertEquals(table, [
+            [('a', 'b'), ('a', 'b', 'c')],
+            [('d',), ()],
+            [(), ()],
+        ])
@@ -134,12 +134,41 @@ def _get_exit_points(node):
         * None, indicating a code path with no specific exit point.
         * a node of type tok.BREAK, tok.RETURN, tok.THROW.
     """
+    # The results are stored on the nodes so that the many rules that ask
+    # about overlapping statements only analyze each statement once per tree.
+    try:
+        return node.exit_points
+    except AttributeError:
+        pass
+
+    # Statements may be nested too deeply to recurse. Instead, each generator
+    # yields the statements that it needs the exit points of and receives them
+    # in return. Its final yield is its own set of exit points.
+    nodes = [node]
+    generators = [_gen_exit_points(node)]
+    value = None
+    while True:
+        value = generators[-1].send(value)
+        if isinstance(value, frozenset):
+            nodes.pop().exit_points = value
+            generators.pop()
+            if not generators:
+                return value
+        else:
+            try:
+                value = value.exit_points
+            except AttributeError:
+                nodes.append(value)
+                generators.append(_gen_exit_points(value))
+                value = None
+
+def _gen_exit_points(node):
     if node.kind == tok.LC:
         exit_points = set([None])
         for kid in node.kids:
             if kid:
                 # Merge in the kid's exit points.
-                kid_exit_points = _get_exit_points(kid)
+                kid_exit_points = yield kid
                 exit_points |= kid_exit_points
 
                 # Stop if the kid always exits.
@@ -149,9 +178,9 @@ def _get_exit_points(node):
     elif node.kind == tok.IF:
         # Only if both branches have an exit point
         cond_, if_, else_ = node.kids
-        exit_points = _get_exit_points(if_)
+        exit_points = set((yield if_))
         if else_:
-            exit_points |= _get_exit_points(else_)
+            exit_points |= yield else_
         else:
             exit_points.add(None)
     elif node.kind == tok.SWITCH:
@@ -163,7 +192,7 @@ def _get_exit_points(node):
         switch_var, switch_stmts = node.kids
         for node in switch_stmts.kids:
             case_val, case_stmt = node.kids
-            case_exit_points = _get_exit_points(case_stmt)
+            case_exit_points = yield case_stmt
             switch_has_default = switch_has_default or node.kind == tok.DEFAULT
             switch_has_final_fallthru = None in case_exit_points
             exit_points |= case_exit_points
@@ -187,7 +216,7 @@ def _get_exit_points(node):
     elif node.kind == tok.BREAK:
         exit_points = set([node])
     elif node.kind == tok.WITH:
-        exit_points = _get_exit_points(node.kids[-1])
+        exit_points = yield node.kids[-1]
     elif node.kind == tok.RETURN:
         exit_points = set([node])
     elif node.kind == tok.THROW:
@@ -195,7 +224,7 @@ def _get_exit_points(node):
     elif node.kind == tok.TRY:
         try_, catch_, finally_ = node.kids
 
-        exit_points = _get_exit_points(try_)
+        exit_points = set((yield try_))
 
         if catch_:
             assert catch_.kind == tok.RESERVED
@@ -206,10 +235,10 @@ def _get_exit_points(node):
             ignored, ignored, catch_ = catch_.kids
             assert catch_.kind == tok.LC
 
-            exit_points |= _get_exit_points(catch_)
+            exit_points |= yield catch_
 
         if finally_:
-            finally_exit_points = _get_exit_points(finally_)
+            finally_exit_points = set((yield finally_))
             if None in finally_exit_points:
                 # The finally statement does not add a missing exit point.
                 finally_exit_points.remove(None)
@@ -224,7 +253,7 @@ def _get_exit_points(node):
     else:
         exit_points = set([None])
 
-    return exit_points
+    yield frozenset(exit_points)
 
 @lookfor((tok.EQOP, op.EQ))
 def comparison_type_conv(node):
@@ -0,0 +1 @@
+#define XP_UNIX
@@ -319,6 +319,17 @@ static PRLock *freelist_lock;
         PR_Lock(freelist_lock);                                               \
     JS_END_MACRO
 #define RELEASE_DTOA_LOCK() PR_Unlock(freelist_lock)
+#elif defined(XP_UNIX)
+/*
+ * Each runtime is only used by one thread at a time, but the freelist and
+ * p5s are shared by all of them. Every use of them is made while holding
+ * the freelist lock, so a plain mutex is enough.
+ */
+#include <pthread.h>
+#undef MULTIPLE_THREADS
+static pthread_mutex_t freelist_lock = PTHREAD_MUTEX_INITIALIZER;
+#define ACQUIRE_DTOA_LOCK()   pthread_mutex_lock(&freelist_lock)
+#define RELEASE_DTOA_LOCK()   pthread_mutex_unlock(&freelist_lock)
 #else
 #undef MULTIPLE_THREADS
 #define ACQUIRE_DTOA_LOCK()   /*nothing*/
@@ -460,6 +460,17 @@ GetChar(JSTokenStream *ts)
     return c;
 }
 
+/*
+ * Returns the offset in userbuf of the next character that GetChar will
+ * return. This is only meaningful for buffer token streams.
+ */
+static ptrdiff_t
+GetCharOffset(JSTokenStream *ts)
+{
+    return PTRDIFF(ts->userbuf.ptr, ts->userbuf.base, jschar) - ts->linelen +
+           PTRDIFF(ts->linebuf.ptr, ts->linebuf.base, jschar) - ts->ungetpos;
+}
+
 static void
 UngetChar(JSTokenStream *ts, int32 c)
 {
@@ -1078,6 +1089,7 @@ js_GetToken(JSContext *cx, JSTokenStream *ts)
     JSAtom *atom;
     JSBool hadUnicodeEscape;
     const struct keyword *kw;
+    ptrdiff_t commentBegin;
 
 #define INIT_TOKENBUF()     (ts->tokenbuf.ptr = ts->tokenbuf.base)
 #define TOKENBUF_LENGTH()   PTRDIFF(ts->tokenbuf.ptr, ts->tokenbuf.base, jschar)
@@ -1268,6 +1280,7 @@ js_GetToken(JSContext *cx, JSTokenStream *ts)
 #endif /* JS_HAS_XML_SUPPORT */
 
 retry:
+    commentBegin = -1;
     do {
         c = GetChar(ts);
         if (c == '\n') {
@@ -1781,6 +1794,7 @@ retry:
 
       case '/':
         if (MatchChar(ts, '/')) {
+            commentBegin = GetCharOffset(ts) - 2;
             /*
              * Hack for source filters such as the Mozilla XUL preprocessor:
              * "//@line 123\n" sets the number of the *next* line after the
@@ -1859,11 +1873,16 @@ skipline:
                     continue;
             }
             UngetChar(ts, c);
+            if (commentBegin >= 0 && ts->commentHandler) {
+                ts->commentHandler(ts, JS_FALSE, commentBegin,
+                                   GetCharOffset(ts), ts->commentHandlerData);
+            }
             ts->cursor = (ts->cursor - 1) & NTOKENS_MASK;
             goto retry;
         }
 
         if (MatchChar(ts, '*')) {
+            commentBegin = GetCharOffset(ts) - 2;
             while ((c = GetChar(ts)) != EOF &&
                    !(c == '*' && MatchChar(ts, '/'))) {
                 /* Ignore all characters until comment close. */
@@ -1874,6 +1893,10 @@ skipline:
                                             JSMSG_UNTERMINATED_COMMENT);
                 goto error;
             }
+            if (ts->commentHandler) {
+                ts->commentHandler(ts, JS_TRUE, commentBegin,
+                                   GetCharOffset(ts), ts->commentHandlerData);
+            }
             ts->cursor = (ts->cursor - 1) & NTOKENS_MASK;
             goto retry;
         }
@@ -228,6 +228,16 @@ typedef struct JSTokenBuf {
 #define NTOKENS         4               /* 1 current + 2 lookahead, rounded */
 #define NTOKENS_MASK    (NTOKENS-1)     /* to power of 2 to avoid divmod by 3 */
 
+/*
+ * Called for each comment in a buffer token stream with the offsets of the
+ * comment's first character and of the character following it, counted in
+ * jschars from the start of the buffer. HTML comments are not reported.
+ */
+typedef void
+(* JS_DLL_CALLBACK JSCommentHandler)(JSTokenStream *ts, JSBool multiline,
+                                     ptrdiff_t begin, ptrdiff_t end,
+                                     void *closure);
+
 struct JSTokenStream {
     JSToken             tokens[NTOKENS];/* circular token buffer */
     uintN               cursor;         /* index of last parsed token */
@@ -249,6 +259,8 @@ struct JSTokenStream {
     void                *listenerTSData;/* listener data for this TokenStream */
     jschar              *saveEOL;       /* save next end of line in userbuf, to
                                            optimize for very long lines */
+    JSCommentHandler    commentHandler; /* callback for comments, or null */
+    void                *commentHandlerData; /* commentHandler closure */
 };
 
 #define CURRENT_TOKEN(ts)       ((ts)->tokens[(ts)->cursor])